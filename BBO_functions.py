@@ -1,9 +1,16 @@
 from PyQt6 import QtCore
 from pylablib.devices import Newport
 from pylablib.devices.Newport.base import NewportBackendError, NewportError
+import logging
 import time
 import numpy as np
-import redpitaya_scpi as scpi
+import acquisition_backends
+import pulse_metrics
+import redpitaya_session
+import redpitaya_streaming
+import trace_archive
+
+logger = logging.getLogger(__name__)
 
 
 class WorkerBBO(QtCore.QObject):
@@ -15,15 +22,18 @@ class WorkerBBO(QtCore.QObject):
     update_motorSteps = QtCore.pyqtSignal(int)
     update_textBox = QtCore.pyqtSignal(str)
     extraction_signal_detected_worker = QtCore.pyqtSignal()
+    update_pulseMetrics = QtCore.pyqtSignal(dict)
 
-    def __init__(self, wlm, rp, stage, axis, addr, steps, velocity, wait):
+    def __init__(self, wlm, backend, stage, axis, addr, steps, velocity, wait, integration_time, metric="mean",
+                 archive=None):
         """Class that handles the logic of the UV autoscan. Needs to be an extra
         class so it can run as a QThread.
         WLM, RedPitaya and Picomotor need to be connected before this class can run.
 
         Args:
             wlm (WavelengthMeter):Device to measure the wavelength
-            rp (RedPitaya): Device to measure the UV power (UV diode)
+            backend (AcquisitionBackend): Reads the UV diode (input 1) and the extraction
+                signal (input 2), see acquisition_backends
             stage (Picomotor8742): Picomotor to change the angle of the BBO crystal
             axis (int): Port of the picomotor (1 to 4, usually 1)
             addr (int): Device number of the daisy-chained controllers (1 or 2)
@@ -31,10 +41,19 @@ class WorkerBBO(QtCore.QObject):
             velocity (float): Speed [steps/s] of the picomotor
             wait (float): Wait time [s] after the move of the picomotor before
                 the uv power gets measured.
+            integration_time (float): Time window [s] of one UV power reading
+            metric (str, optional): UV power value that is maximized, see pulse_metrics.optimizer_metrics.
+                The pulse metrics need traces at full sample rate. Defaults to "mean".
+            archive (TraceArchive, optional): If given, the raw UV diode traces are stored
+                with wavelength and motor position. Defaults to None.
         """
         super().__init__()
         self.wlm = wlm
-        self.rp = rp
+        self.backend = backend
+        self.integration_time = integration_time
+        self.metric = metric
+        self.archive = archive
+        self.last_trace = None
         self.stage = stage
         self.axis = axis
         self.addr = addr
@@ -49,31 +68,82 @@ class WorkerBBO(QtCore.QObject):
         self.delta_wl_start = np.round(self.wlm.GetWavelength(1), 6)
         self.threshold_power = 0
         self.start_pos = self.old_pos
+        self.extraction_level = -0.4  # Trigger level [V] of the extraction signal (input 2)
+
+    def arm_extraction_trigger(self):
+        """Watches the extraction signal for its falling edge. With the SCPI backends the event
+        is latched by the RedPitaya trigger, so it can't fall between two readings."""
+        self.backend.arm_event(2, self.extraction_level, edge="NE")
+
+    def disarm_extraction_trigger(self):
+        """Disarms the extraction trigger, so the RedPitaya keeps acquiring for the next user.
+        Called when the worker stops; a lost connection is only logged."""
+        try:
+            self.backend.disarm_event()
+        except Exception as e:
+            logger.warning(f"Could not disarm the extraction trigger: {e}")
+
+    def read_uv_power(self):
+        """Returns the UV power and whether an extraction signal was detected since the last
+        reading (one round trip to the RedPitaya with the SCPI backends). With a pulse metric or
+        an archive the raw trace is read and kept in ``last_trace``."""
+        if self.metric == "mean" and self.archive is None:
+            uv_power, extraction_detected = self.backend.read_power(1, self.integration_time)
+            return np.round(uv_power, 4), extraction_detected
+
+        self.last_trace, extraction_detected = self.backend.read_with_event(
+            1, self.backend.samples_for(self.integration_time))
+        if self.metric == "mean":
+            uv_power = np.mean(self.last_trace)
+        else:
+            uv_power = pulse_metrics.optimizer_value(self.analyze_pulses(self.last_trace), self.metric)
+        return np.round(uv_power, 4), extraction_detected
+
+    def analyze_pulses(self, trace):
+        """Emits the pulse metrics of a UV diode trace and returns them."""
+        metrics = pulse_metrics.analyze_trace(trace, sample_rate=self.backend.sample_rate)
+        self.update_pulseMetrics.emit(metrics)
+        logger.debug(pulse_metrics.summary(metrics))
+        return metrics
+
+    def archive_trace(self, wavelength, position):
+        """Queues the last raw trace for the archive (if any)."""
+        if self.archive is not None and self.last_trace is not None:
+            self.archive.append(self.last_trace, wavelength=wavelength, position=position)
 
     def measure_UV_power(self):
         """Measures the UV Photodiode voltage and sends a signal to the GUI after each measurement
         """
         self.keep_running = True
         self.status_measurement.emit(True)
+        self.arm_extraction_trigger()
 
-        while self.keep_running:
-            self.rp.tx_txt('ACQ:SOUR1:DATA:STA:N? 1,3000')
-            buff = list(map(float, self.rp.rx_txt().strip('{}\n\r').replace("  ", "").split(',')))
-            self.update_diodeVoltage.emit(np.round(np.mean(buff), 4))
-            time.sleep(0.1)
-
-            # ÄNDERUNG FÜR STRAHLZEIT:
-            self.rp.tx_txt('ACQ:SOUR2:DATA:STA:N? 1,100')
-            buff = list(map(float, self.rp.rx_txt().strip('{}\n\r').replace("  ", "").split(',')))
-            # self.update_textBox.emit(f"Spannung Input 2: {np.round(np.mean(buff), 4)}")
-            if np.round(np.mean(buff), 4) < -0.4:
-                self.extraction_signal_detected_worker.emit()
-                self.update_textBox.emit("Extraktion!")
-                time.sleep(0.5)
-            time.sleep(0.1)
-        self.status_measurement.emit(False)
-        self.cleanup()
-        self.finished.emit()
+        try:
+            while self.keep_running:
+                # The extraction state comes with the UV reading (one round trip), i.e. 0.1 s before
+                # the separate query after time.sleep(0.1) used to ask for it. The trigger latches the
+                # event, so an extraction during the sleeps is reported with the next reading.
+                uv_power, extraction_detected = self.read_uv_power()
+                # The fired trigger stops the acquisition, rearm at once so the next
+                # readings don't come from the frozen buffer:
+                if extraction_detected:
+                    self.arm_extraction_trigger()
+                self.update_diodeVoltage.emit(uv_power)
+                if self.archive is not None:
+                    self.archive_trace(self.wlm.GetWavelength(1), self.old_pos)
+                time.sleep(0.1)
+
+                # ÄNDERUNG FÜR STRAHLZEIT:
+                if extraction_detected:
+                    self.extraction_signal_detected_worker.emit()
+                    self.update_textBox.emit("Extraktion!")
+                    time.sleep(0.5)
+                time.sleep(0.1)
+        finally:
+            self.disarm_extraction_trigger()
+            self.status_measurement.emit(False)
+            self.cleanup()
+            self.finished.emit()
 
     def autoscan(self):
         """
@@ -99,16 +169,10 @@ class WorkerBBO(QtCore.QObject):
 
         Internal Methods:
         -----------------
-        - `measure_uv_power()`: Measures and returns the current UV power.
         - `update_position_and_measure()`: Updates and returns the current picomotor position.
         - `correct_position_if_needed(wl, uv_power, new_pos)`: Corrects the picomotor position
         if UV power is below the threshold.
         """
-        def measure_uv_power():
-            self.rp.tx_txt('ACQ:SOUR1:DATA:STA:N? 1,3000')
-            buff = list(map(float, self.rp.rx_txt().strip('{}\n\r').replace("  ", "").split(',')))
-            return np.round(np.mean(buff), 4)
-
         def update_position_and_measure():
             new_pos = self.stage.get_position(axis=self.axis, addr=self.addr)
             self.update_motorSteps.emit(new_pos)
@@ -128,6 +192,7 @@ class WorkerBBO(QtCore.QObject):
         self.status.emit(True)
 
         self.stage.setup_velocity(axis=self.axis, addr=self.addr, speed=self.velocity)
+        self.arm_extraction_trigger()
 
         try:
             while self.keep_running:
@@ -136,7 +201,9 @@ class WorkerBBO(QtCore.QObject):
                 self.stage.move_by(axis=self.axis, addr=self.addr, steps=direction)
                 time.sleep(float(self.steps / self.velocity) + self.wait)
 
-                uv_power = measure_uv_power()
+                uv_power, extraction_detected = self.read_uv_power()
+                if extraction_detected:
+                    self.arm_extraction_trigger()  # Rearm at once, the fired trigger stops the acquisition
                 self.update_diodeVoltage.emit(uv_power)
                 new_pos = update_position_and_measure()
 
@@ -146,6 +213,7 @@ class WorkerBBO(QtCore.QObject):
                 self.old_power, self.old_pos = uv_power, new_pos
 
                 wl = np.round(self.wlm.GetWavelength(1), 6)
+                self.archive_trace(wl, new_pos)
                 self.iterator_steps += 1
 
                 if self.iterator_steps > 20:
@@ -155,10 +223,7 @@ class WorkerBBO(QtCore.QObject):
                 new_pos = correct_position_if_needed(wl, uv_power, new_pos)  # Rettungsalgorithmus
 
                 # ÄNDERUNG FÜR STRAHLZEIT:
-                self.rp.tx_txt('ACQ:SOUR2:DATA:STA:N? 1,100')
-                buff = list(map(float, self.rp.rx_txt().strip('{}\n\r').replace("  ", "").split(',')))
-                # self.update_textBox.emit(f"Spannung Input 2: {np.round(np.mean(buff), 4)}")
-                if np.round(np.mean(buff), 4) < -0.4:
+                if extraction_detected:
                     self.extraction_signal_detected_worker.emit()
                     time.sleep(0.5)
 
@@ -166,6 +231,7 @@ class WorkerBBO(QtCore.QObject):
         except Newport.base.NewportBackendError as e:
             self.update_textBox.emit(f"USB connection to Newport motors lost: {e}")
         finally:
+            self.disarm_extraction_trigger()
             self.update_textBox.emit("UV Autoscan stopped")
             self.status.emit(False)
             self.cleanup()
@@ -193,15 +259,17 @@ class WorkerBBO_Double(QtCore.QObject):
     update_diodeVoltage = QtCore.pyqtSignal(float)
     update_motorStepsFront = QtCore.pyqtSignal(int)
     update_motorStepsBack = QtCore.pyqtSignal(int)
+    update_pulseMetrics = QtCore.pyqtSignal(dict)
 
-    def __init__(self, wlm, rp, stage, axis, addrFront, addrBack, steps, velocity, wait):
+    def __init__(self, wlm, backend, stage, axis, addrFront, addrBack, steps, velocity, wait, integration_time,
+                 metric="mean"):
         """Class that handles the logic of the UV autoscan. Needs to be an extra
         class so it can run as a QThread.
         WLM, RedPitaya and Picomotor need to be connected before this class can run.
 
         Args:
             wlm (WavelengthMeter):Device to measure the wavelength
-            rp (RedPitaya): Device to measure the UV power (UV diode)
+            backend (AcquisitionBackend): Reads the UV diode (input 1), see acquisition_backends
             stage (Picomotor8742): Picomotor to change the angle of the BBO crystal
             axis (int): Port of the picomotor (1 to 4, usually 1)
             addrFront (int): Device number of the daisy-chained controllers (1 or 2)
@@ -209,10 +277,15 @@ class WorkerBBO_Double(QtCore.QObject):
             velocity (float): Speed [steps/s] of the picomotor
             wait (float): Wait time [s] after the move of the picomotor before
                 the uv power gets measured.
+            integration_time (float): Time window [s] of one UV power reading
+            metric (str, optional): UV power value that is maximized, see pulse_metrics.optimizer_metrics.
+                Defaults to "mean".
         """
         super().__init__()
         self.wlm = wlm
-        self.rp = rp
+        self.backend = backend
+        self.integration_time = integration_time
+        self.metric = metric
         self.stage = stage
         self.axis = axis
         self.addrFront = addrFront
@@ -245,9 +318,12 @@ class WorkerBBO_Double(QtCore.QObject):
         """
 
         def measure_uv_power():
-            self.rp.tx_txt('ACQ:SOUR1:DATA:STA:N? 1,3000')
-            buff = list(map(float, self.rp.rx_txt().strip('{}\n\r').replace("  ", "").split(',')))
-            return np.round(np.mean(buff), 4)
+            if self.metric == "mean":
+                return np.round(self.backend.read_mean(1, self.integration_time), 4)
+            trace = self.backend.read(1, self.backend.samples_for(self.integration_time))
+            metrics = pulse_metrics.analyze_trace(trace, sample_rate=self.backend.sample_rate)
+            self.update_pulseMetrics.emit(metrics)
+            return np.round(pulse_metrics.optimizer_value(metrics, self.metric), 4)
 
         def update_position_and_measure(addr):
             new_pos = self.stage.get_position(axis=self.axis, addr=addr)
@@ -366,6 +442,8 @@ class BBO(QtCore.QObject):
     stepsUpdatedBack = QtCore.pyqtSignal(int)
     update_textBox = QtCore.pyqtSignal(str)
     extraction_signal_detected = QtCore.pyqtSignal()
+    pulseMetricsUpdated = QtCore.pyqtSignal(dict)
+    pulse_presets_status = QtCore.pyqtSignal(bool)
 
     def __init__(self, axis, addrFront, addrBack):
         """This class controls the picomotor which controls the angle
@@ -385,6 +463,30 @@ class BBO(QtCore.QObject):
         self._connect_button_is_checked = False
         self._connect_rp_button_is_checked = False
 
+        # Time window [s] of one UV power reading (3000 samples at 125 MS/s):
+        self.uv_integration_time = 3000 / 125e6
+        self.stream = None
+
+        # Acquisition backend of the UV diode and the extraction signal, see acquisition_backends.make_backend
+        # ("scpi_ascii", "scpi_binary", "pyrpl" or "fake"; "pyrpl" replaces the SCPI server):
+        self.acquisition_config = {"backend": "scpi_ascii"}
+        self.backend = None
+        # Value of the UV power readings that the autoscan maximizes: "mean" (averaged by the RedPitaya)
+        # or a pulse metric at full sample rate ("mean_peak", "mean_integral"), see pulse_metrics.
+        # Set it before connecting the RedPitaya (the acquisition is set up at connect):
+        self.uv_metric = "mean"
+        self.archive = None
+
+        # PWM bursts that are sent to the laser control, uploaded to the RedPitaya at connect
+        # (not available with the pyrpl backend, which replaces the SCPI server):
+        self.pulse_presets_available = True
+        self.pulse_presets = {
+            "next_laserstep": dict(chan=1, func="pwm", volt=0.5, freq=1, offset=0.5, dcyc=0.0005,
+                                   burst=True, ncyc=1, nor=1),
+            "laser_busy": dict(chan=2, func="pwm", volt=0.5, freq=1, offset=0.5, dcyc=0.0005,
+                               burst=True, ncyc=1, nor=1),
+        }
+
     def connect_piezos(self):
         """Connects|Disconnects the picomotor depending on the state of the GUI button.
         """
@@ -414,21 +516,133 @@ class BBO(QtCore.QObject):
         """
         try:
             if not self._connect_rp_button_is_checked:
-                self.rp = scpi.scpi(ip)
-                self.rp.tx_txt('ACQ:RST')
-                self.rp.acq_set(1)
-                self.rp.tx_txt('ACQ:DATA:FORMAT ASCII')
-                self.rp.tx_txt('ACQ:DATA:UNITS VOLTS')
-                self.rp.tx_txt('ACQ:START')
+                if self.acquisition_config["backend"] == "pyrpl":
+                    # PyRPL loads its own FPGA image: no SCPI session, no generator presets
+                    self.backend = acquisition_backends.make_backend(self.acquisition_config, host=ip)
+                    self.setup_acquisition()
+                    self.pulse_presets_available = False
+                    self.pulse_presets_status.emit(False)
+                    self.update_textBox.emit("RedPitaya connected (PyRPL), pulse signals not available")
+                else:
+                    # The session serializes the access of the worker threads and the GUI thread:
+                    self.rp = redpitaya_session.RedPitayaSession(ip)
+                    self.rp.tx_txt('ACQ:RST')
+                    self.backend = acquisition_backends.make_backend(self.acquisition_config, client=self.rp,
+                                                                     host=ip)
+                    self.setup_acquisition()
+
+                    for name, settings in self.pulse_presets.items():
+                        self.rp.define_preset(name, **settings)
+                        self.rp.load_preset(name)
 
                 self._connect_rp_button_is_checked = True
             else:
-                del self.rp
+                self.stop_red_pitaya_stream()
+                self.report_red_pitaya_statistics()
+                # The backend (and the session) are missing if the connect failed halfway:
+                if self.backend is not None:
+                    self.backend.close()
+                    self.backend = None
+                if hasattr(self, "rp"):
+                    self.rp.close()
+                    del self.rp
+                if not self.pulse_presets_available:
+                    self.pulse_presets_available = True
+                    self.pulse_presets_status.emit(True)
                 self._connect_rp_button_is_checked = False
         except BrokenPipeError as e:
             self.update_textBox.emit(f"Error: {e}")
             self._connect_rp_button_is_checked = True
 
+    def start_red_pitaya_stream(self, seconds=60):
+        """Streams both RedPitaya inputs gap-free into a ring buffer. The UV measurement and
+        the autoscan started afterwards read from the stream instead of the RedPitaya.
+
+        Args:
+            seconds (float, optional): Length [s] of the ring buffer. Defaults to 60.
+        """
+        try:
+            self.rp.tx_txt('ACQ:START')  # Continuous acquisition, no trigger armed
+            dec = int(self.rp.get_setting('ACQ:DEC'))
+            capacity = int(seconds * 125e6 / dec)
+            binary = self.acquisition_config["backend"] == "scpi_binary"
+            self.stream = redpitaya_streaming.RedPitayaStream(self.rp, chans=(1, 2), capacity=capacity,
+                                                              binary=binary).start()
+            self.update_textBox.emit(f"RedPitaya streaming started ({seconds} s ring buffer)")
+        except AttributeError:
+            self.update_textBox.emit("RedPitaya not connected!")
+
+    def stop_red_pitaya_stream(self):
+        """Stops the RedPitaya stream (if running) and reports lost samples."""
+        if self.stream is None:
+            return
+        self.stream.stop()
+        self.update_textBox.emit(f"RedPitaya streaming stopped: {self.stream.buffer.total} samples, "
+                                 f"{self.stream.overruns} overruns")
+        self.stream = None
+
+    def setup_acquisition(self):
+        """Power reading mode for the mean metric: the RedPitaya averages over the integration time,
+        so only a few samples are transferred per reading. The pulse metrics and the trace archive
+        need raw traces at the full sample rate."""
+        if self.backend is None:
+            return
+        if self.uv_metric == "mean" and self.archive is None:
+            self.backend.setup(self.uv_integration_time)
+        else:
+            self.backend.setup(dec=1)
+
+    def start_trace_archive(self, path, every=1):
+        """Stores the raw UV diode traces of the UV measurement and the autoscan started
+        afterwards in a compressed archive, see trace_archive. While archiving, the RedPitaya
+        acquires raw traces at the full sample rate.
+
+        Args:
+            path (str): Folder of the archive (an existing archive is continued).
+            every (int, optional): Only every Nth trace is stored. Defaults to 1.
+        """
+        self.stop_trace_archive()
+        try:
+            self.archive = trace_archive.TraceArchive(path, every=every)
+            self.update_textBox.emit(f"Archiving UV traces to {path}")
+        except OSError as e:
+            self.update_textBox.emit(f"Error: {e}")
+        self.setup_acquisition()
+
+    def stop_trace_archive(self):
+        """Writes the remaining traces of the archive (if any) and reports dropped traces."""
+        if self.archive is None:
+            return
+        self.archive.close()
+        self.update_textBox.emit(f"UV trace archive closed: {self.archive.written} traces written, "
+                                 f"{self.archive.dropped} dropped")
+        self.archive = None
+        self.setup_acquisition()
+
+    def acquisition_backend(self):
+        """Backend for a new worker: the stream while it runs, otherwise the configured one."""
+        if self.stream is not None:
+            return acquisition_backends.make_backend({"backend": "stream"}, stream=self.stream)
+        if self.backend is None:
+            raise AttributeError("RedPitaya not connected!")
+        return self.backend
+
+    def report_red_pitaya_statistics(self):
+        """Writes the contention statistics of the RedPitaya session (queue depth
+        and wait times of the requests) to the text box."""
+        if not self.pulse_presets_available:
+            return  # PyRPL, no SCPI session
+        try:
+            stats = self.rp.statistics()
+        except AttributeError:
+            self.update_textBox.emit("RedPitaya not connected!")
+            return
+        if stats["completed"]:
+            self.update_textBox.emit(
+                f"RedPitaya: {stats['completed']} requests, max. queue depth {stats['max_queue_depth']}, "
+                f"wait p50/p99/max {stats['p50_wait'] * 1e3:.2f}/{stats['p99_wait'] * 1e3:.2f}/"
+                f"{stats['max_wait'] * 1e3:.2f} ms")
+
     def move_by(self, steps, move_front_bbo=False):
         """Moves the picomotor in one direction.
 
@@ -484,9 +698,11 @@ class BBO(QtCore.QObject):
         try:
             # Initiate QThread and WorkerLBO class:
             self.threadBBO = QtCore.QThread()
-            self.workerBBO = WorkerBBO(wlm=wlm, rp=self.rp, stage=self.stage,
+            self.workerBBO = WorkerBBO(wlm=wlm, backend=self.acquisition_backend(), stage=self.stage,
                                        axis=self.axis, addr=self.addrBack, steps=self.autoscan_steps,
-                                       velocity=self.autoscan_velocity, wait=self.autoscan_wait)
+                                       velocity=self.autoscan_velocity, wait=self.autoscan_wait,
+                                       integration_time=self.uv_integration_time, metric=self.uv_metric,
+                                       archive=self.archive)
             self.workerBBO.moveToThread(self.threadBBO)
 
             # Connect different methods to the signals of the thread:
@@ -495,6 +711,7 @@ class BBO(QtCore.QObject):
             self.workerBBO.update_diodeVoltage.connect(self.voltageUpdated.emit)
             self.workerBBO.update_textBox.connect(self.update_textBox.emit)
             self.workerBBO.extraction_signal_detected_worker.connect(self.extraction_signal_detected.emit)  # ÄNDERUNG VON STRAHLZEIT
+            self.workerBBO.update_pulseMetrics.connect(self.pulseMetricsUpdated.emit)
             self.workerBBO.finished.connect(self.threadBBO.quit)
             self.workerBBO.finished.connect(self.workerBBO.deleteLater)
             self.threadBBO.finished.connect(self.threadBBO.deleteLater)
@@ -509,6 +726,7 @@ class BBO(QtCore.QObject):
         """
         self.update_textBox.emit("Stop UV Measurement")
         self.workerBBO.stop()
+        self.report_red_pitaya_statistics()
 
     def start_autoscan(self, wlm):
         """Starts the QThread (the WorkerBBO class) where the UV autoscan will operate.
@@ -517,9 +735,11 @@ class BBO(QtCore.QObject):
         try:
             # Initiate QThread and WorkerLBO class:
             self.threadBBO = QtCore.QThread()
-            self.workerBBO = WorkerBBO(wlm=wlm, rp=self.rp, stage=self.stage,
+            self.workerBBO = WorkerBBO(wlm=wlm, backend=self.acquisition_backend(), stage=self.stage,
                                        axis=self.axis, addr=self.addrBack, steps=self.autoscan_steps,
-                                       velocity=self.autoscan_velocity, wait=self.autoscan_wait)
+                                       velocity=self.autoscan_velocity, wait=self.autoscan_wait,
+                                       integration_time=self.uv_integration_time, metric=self.uv_metric,
+                                       archive=self.archive)
             # self.workerBBO = WorkerBBO(wlm=wlm, rp=self.rp, stage=self.stage,
             #                           axis=self.axis, addr=self.addrFront, steps=self.autoscan_steps,
             #                           velocity=self.autoscan_velocity, wait=self.autoscan_wait)
@@ -532,6 +752,7 @@ class BBO(QtCore.QObject):
             self.workerBBO.update_motorSteps.connect(self.stepsUpdatedBack.emit)
             self.workerBBO.update_textBox.connect(self.update_textBox.emit)
             self.workerBBO.extraction_signal_detected_worker.connect(self.extraction_signal_detected.emit)  # ÄNDERUNG VON STRAHLZEIT
+            self.workerBBO.update_pulseMetrics.connect(self.pulseMetricsUpdated.emit)
             self.workerBBO.finished.connect(self.threadBBO.quit)
             self.workerBBO.finished.connect(self.workerBBO.deleteLater)
             self.threadBBO.finished.connect(self.threadBBO.deleteLater)
@@ -546,6 +767,7 @@ class BBO(QtCore.QObject):
         """
         self.update_textBox.emit("Stop Autoscan")
         self.workerBBO.stop()
+        self.report_red_pitaya_statistics()
 
     def start_autoscan_double(self, wlm):
         """Starts the QThread (the WorkerBBO class) where the UV autoscan will operate.
@@ -554,10 +776,11 @@ class BBO(QtCore.QObject):
         try:
             # Initiate QThread and WorkerLBO class:
             self.threadBBO2 = QtCore.QThread()
-            self.workerBBO2 = WorkerBBO_Double(wlm=wlm, rp=self.rp, stage=self.stage,
+            self.workerBBO2 = WorkerBBO_Double(wlm=wlm, backend=self.acquisition_backend(), stage=self.stage,
                                                axis=self.axis, addrFront=self.addrFront, addrBack=self.addrBack,
                                                steps=self.autoscan_steps_double, velocity=self.autoscan_velocity_double,
-                                               wait=self.autoscan_wait_double)
+                                               wait=self.autoscan_wait_double, integration_time=self.uv_integration_time,
+                                               metric=self.uv_metric)
             self.workerBBO2.moveToThread(self.threadBBO2)
 
             # Connect different methods to the signals of the thread:
@@ -566,6 +789,7 @@ class BBO(QtCore.QObject):
             self.workerBBO2.update_diodeVoltage.connect(self.voltageUpdated.emit)
             self.workerBBO2.update_motorStepsFront.connect(self.stepsUpdatedFront.emit)
             self.workerBBO2.update_motorStepsBack.connect(self.stepsUpdatedBack.emit)
+            self.workerBBO2.update_pulseMetrics.connect(self.pulseMetricsUpdated.emit)
             self.workerBBO2.finished.connect(self.threadBBO2.quit)
             self.workerBBO2.finished.connect(self.workerBBO2.deleteLater)
             self.threadBBO2.finished.connect(self.threadBBO2.deleteLater)
@@ -583,52 +807,37 @@ class BBO(QtCore.QObject):
 
     # Ab hier neue Funktionen für die Strahlzeit 2025:
 
+    def set_pulse_preset(self, name, **settings):
+        """Changes the settings of a pulse preset and uploads it if the RedPitaya is connected.
+
+        Args:
+            name (str): "next_laserstep" (output 1) or "laser_busy" (output 2)
+            settings: Generator settings to change (see redpitaya_scpi.scpi.sour_set)
+        """
+        self.pulse_presets[name].update(settings)
+        if self._connect_rp_button_is_checked and self.pulse_presets_available:
+            self.rp.define_preset(name, **self.pulse_presets[name])
+            self.rp.load_preset(name)
+
     def generate_signal(self, output=1):
         """Generiert ein Signal am Ouput 1 des RedPitaya.
         """
-        wave_form = 'pwm'
-        freq = 1
-        ampl = 0.5
-        offset = 0.5
-        duty = 0.0005
-
+        if not self.pulse_presets_available:
+            self.update_textBox.emit("Pulse signals not available with PyRPL")
+            return
         if not self.debug:
-            self.rp.tx_txt('SOUR1:FUNC ' + str(wave_form).upper())
-            self.rp.tx_txt('SOUR1:FREQ:FIX ' + str(freq))
-            self.rp.tx_txt('SOUR1:VOLT ' + str(ampl))
-            self.rp.tx_txt('SOUR1:VOLT:OFFS ' + str(offset))
-            self.rp.tx_txt('SOUR1:DCYC ' + str(duty))
-            self.rp.tx_txt('SOUR1:BURS:STAT BURST')                # activate Burst mode
-            self.rp.tx_txt('SOUR1:BURS:NCYC 1')                    # Signal periods in a Burst pulse
-            self.rp.tx_txt('SOUR1:BURS:NOR 1')                # Total number of bursts (set to 65536 for INF pulses)
-            # rp.tx_txt('SOUR1:BURS:INT:PER 5000')             # Burst period (time between two bursts (signal + delay in microseconds))
-
-            self.rp.tx_txt('OUTPUT1:STATE ON')
-            self.rp.tx_txt('SOUR1:TRig:INT')
+            # The preset is already on the generator, firing it is a single trigger command:
+            self.rp.fire_preset("next_laserstep")
 
         self.update_textBox.emit("Next Laserstep Signal sent")
 
     def generate_signal2(self, output=2):
         """Generiert ein Signal am Ouput 2 des RedPitaya.
         """
-        wave_form = 'pwm'
-        freq = 1
-        ampl = 0.5
-        offset = 0.5
-        duty = 0.0005
-
+        if not self.pulse_presets_available:
+            self.update_textBox.emit("Pulse signals not available with PyRPL")
+            return
         if not self.debug:
-            self.rp.tx_txt('SOUR2:FUNC ' + str(wave_form).upper())
-            self.rp.tx_txt('SOUR2:FREQ:FIX ' + str(freq))
-            self.rp.tx_txt('SOUR2:VOLT ' + str(ampl))
-            self.rp.tx_txt('SOUR2:VOLT:OFFS ' + str(offset))
-            self.rp.tx_txt('SOUR2:DCYC ' + str(duty))
-            self.rp.tx_txt('SOUR2:BURS:STAT BURST')                # activate Burst mode
-            self.rp.tx_txt('SOUR2:BURS:NCYC 1')                    # Signal periods in a Burst pulse
-            self.rp.tx_txt('SOUR2:BURS:NOR 1')                # Total number of bursts (set to 65536 for INF pulses)
-            # rp.tx_txt('SOUR2:BURS:INT:PER 5000')             # Burst period (time between two bursts (signal + delay in microseconds))
-
-            self.rp.tx_txt('OUTPUT2:STATE ON')
-            self.rp.tx_txt('SOUR2:TRig:INT')
+            self.rp.fire_preset("laser_busy")
 
         self.update_textBox.emit("Laser Busy Signal sent")
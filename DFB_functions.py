@@ -1,11 +1,85 @@
 from toptica.lasersdk.dlcpro.v2_0_3 import DLCpro, NetworkConnection, DeviceNotFoundError
 from toptica.lasersdk.client import UnavailableError
 from toptica.lasersdk.decop import DecopError
+import threading
 import numpy as np
-from PyQt6 import QtCore, QtTest
+from PyQt6 import QtCore
+import dlc_mirror
+import loop_timing
+import wavelength_estimator
+import wavelength_history
+
+
+class WorkerDFB(QtCore.QObject):
+    """Runs the wavelength stabilisation of a DFB in its own QThread.
+
+    The control steps (DFB.control_wavelength) are scheduled on the clock of the DFB
+    (DFB.clock, real time or a simulation clock) every DFB.dt seconds, independent of the
+    load of the GUI thread. Latency, jitter, duration and overruns of the steps are recorded
+    in ``timing`` (loop_timing.LoopTiming), in seconds of that clock.
+    """
+    finished = QtCore.pyqtSignal()
+    update_timing = QtCore.pyqtSignal(dict)
+
+    def __init__(self, dfb, wlm, checkBox, report_interval=1.0):
+        """
+        Args:
+            dfb (DFB): DFB whose wavelength is stabilised
+            wlm (WavelengthMeter): WLM to measure the wavelength
+            checkBox (bool): Signal the next laser step when the wavelength settled
+            report_interval (float, optional): Interval [s] of the update_timing signal. Defaults to 1.
+        """
+        super().__init__()
+        self.dfb = dfb
+        self.wlm = wlm
+        self.checkBox = checkBox
+        self.report_interval = report_interval
+        self.clock = dfb.clock
+        self.timing = loop_timing.LoopTiming(dfb.dt)
+        self._stop = threading.Event()
+
+    def stabilise(self):
+        """Loop of the control steps until stop() is called."""
+        clock = self.clock
+        try:
+            due = clock.monotonic()
+            next_report = due + self.report_interval
+            while not self._stop.wait(max(due - clock.monotonic(), 0) / clock.speed):
+                started = clock.monotonic()
+                self.dfb.control_wavelength(wlm=self.wlm, checkBox=self.checkBox)
+                due = self.timing.record(due, started, clock.monotonic())
+                if started >= next_report:
+                    next_report = started + self.report_interval
+                    self.update_timing.emit(self.timing.as_dict())
+        finally:
+            self.update_timing.emit(self.timing.as_dict())
+            self.finished.emit()  # Needed to exit the QThread
+
+    def stop(self):
+        """Ends the loop after the current control step."""
+        self._stop.set()
+
+    @property
+    def running(self):
+        return not self._stop.is_set()
 
 
 class DFB(QtCore.QObject):
+    # Parameters of the DLC pro that are mirrored (see dlc_mirror):
+    mirrored_parameters = [
+        "laser1.dl.tc.temp_set",
+        "laser1.dl.tc.temp_act",
+        "laser1.dl.cc.current_act",
+        "laser1.wide_scan.scan_begin",
+        "laser1.wide_scan.scan_end",
+        "laser1.wide_scan.speed",
+        "laser1.wide_scan.state",
+        "laser1.wide_scan.progress",
+        "laser1.wide_scan.remaining_time",
+    ]
+    widescan_parameters = {"laser1.dl.tc.temp_act", "laser1.wide_scan.state", "laser1.wide_scan.progress",
+                           "laser1.wide_scan.remaining_time"}
+
     widescan_status = QtCore.pyqtSignal(bool)
     widescan_finished = QtCore.pyqtSignal()
     update_values = QtCore.pyqtSignal(tuple)
@@ -13,6 +87,7 @@ class DFB(QtCore.QObject):
     update_actTemp = QtCore.pyqtSignal(float)
     update_textBox = QtCore.pyqtSignal(str)
     update_wl_current = QtCore.pyqtSignal(tuple)
+    update_stabil_timing = QtCore.pyqtSignal(dict)
     wl_stabil_status = QtCore.pyqtSignal(bool)
     update_target_wavelength = QtCore.pyqtSignal(float)
     send_signal_laserBusy = QtCore.pyqtSignal()
@@ -25,21 +100,43 @@ class DFB(QtCore.QObject):
     def __init__(self):
         super().__init__()
         self.debug = False
+        # Zeitbasis der Regelung (time(), monotonic(), speed), z.B. DFB_simulation.SimulationClock:
+        self.clock = loop_timing.system_clock
 
         self._connect_button_is_checked = False
         self.current_set_current = None
+        # Erzeugt den DLC pro zur IP-Adresse (z.B. DFB_simulation.SimulatedDLCpro für Tests ohne Laser):
+        self.dlc_factory = lambda ip: DLCpro(NetworkConnection(ip))
+        # Lokale Kopie der DLC-Parameter (Subscriptions), wird vom mirror_timer gepollt:
+        self.mirror = None
+        self.mirror_interval = 50  # ms
+        self.widescan_active = False
 
         self.counter_laser_steps = 0
         self.counter_extractions = 0
 
         self.target_wavelength = 0.0
-        self.wl_history = []
+        # Settle test of the stabilisation: window of the last 5 measurements (see set_settle_window)
+        self.wl_history = wavelength_history.WavelengthHistory(capacity=4096, samples=5)
+        self.wl_threshold = 0.00005   # Max. Differenz zwischen Target & wl
+        self.std_threshold = 0.00005  # Max. Schwankung über Zeit
+        # "kalman": eingependelt, wenn die Schätzung mit 2 sigma innerhalb wl_threshold liegt,
+        # "history": Abweichung und Standardabweichung der wl_history
+        self.settle_criterion = "kalman"
+
+        # Kalman-Filter der Wellenlänge, die PID-Regelung arbeitet mit seiner Schätzung:
+        self.estimator = wavelength_estimator.WavelengthEstimator()
+        self.max_estimate_age = 1.0  # Ohne neue WLM-Werte [s] wird nicht mehr geregelt
 
         # PID-Parameter
         self.Kp = 0.5
         self.Ki = 0.1
         self.Kd = 0.01
-        self.dt = 0.1  # Abtastzeit (100 ms)
+        self.dt = 0.1  # Abtastzeit (100 ms), Periode der Regelschritte im WorkerDFB
+        self.temp_settle_time = 1.0  # Nach einem Temperaturschritt [s] wird nicht am Strom geregelt
+        self.workerDFB = None
+        # Zustand der Regelung: Regelschritte (WorkerDFB-Thread) und Zielwechsel (GUI) nacheinander
+        self.control_lock = threading.RLock()
 
         # Regelgrößen
         self.integral = 0
@@ -64,26 +161,66 @@ class DFB(QtCore.QObject):
         else:
             if not self._connect_button_is_checked:
                 try:
-                    self.dlc = DLCpro(NetworkConnection(ip))
+                    self.dlc = self.dlc_factory(ip)
                     self.dlc.open()
-                    self.update_textBox.emit("DFB connected")
-                    self.update_values.emit(self.read_actual_dfb_values())
-                    self._connect_button_is_checked = True
                 except DeviceNotFoundError:
                     self.update_textBox.emit("DFB not found")
                     self._connect_button_is_checked = True
+                    return
+                try:
+                    self.start_mirror()
+                except (DecopError, UnavailableError) as e:
+                    # Subscriptions oder erstes Auslesen fehlgeschlagen: Verbindung wieder schließen
+                    self.stop_mirror()
+                    self.dlc.close()
+                    self.update_textBox.emit(f"DFB parameters could not be read, connection closed: {e}")
+                    self._connect_button_is_checked = True
+                    return
+                self.update_textBox.emit("DFB connected")
+                self.update_values.emit(self.read_actual_dfb_values())
+                self._connect_button_is_checked = True
             else:
+                self.stop_mirror()
                 self.dlc.close()
                 self.update_textBox.emit("DFB connection closed")
                 self._connect_button_is_checked = False
 
+    def start_mirror(self):
+        """Subscribes to the mirrored parameters of the DLC pro and polls their updates
+        with a QTimer (every mirror_interval ms) in the GUI thread.
+        """
+        self.mirror = dlc_mirror.DlcParameterMirror(self.dlc, self.mirrored_parameters).start()
+        self.mirror.add_handler(self.on_parameters_changed)
+        self.mirror_timer = QtCore.QTimer()
+        self.mirror_timer.timeout.connect(self.poll_mirror)
+        self.mirror_timer.start(self.mirror_interval)
+
+    def stop_mirror(self):
+        if self.mirror is not None:
+            self.mirror_timer.stop()
+            self.mirror.stop()
+            self.mirror = None
+
+    def poll_mirror(self):
+        try:
+            self.mirror.poll()
+        except UnavailableError as e:
+            self.update_textBox.emit(f"DFB session was closed: {e}")
+            self.stop_mirror()
+
+    def on_parameters_changed(self, changed):
+        """Called by the mirror with the names of the parameters that changed."""
+        if self.widescan_active and changed & self.widescan_parameters:
+            self.update_wideScan_progress()
+
     def read_actual_dfb_values(self):
-        """Reads out the set temperature and the WideScan parameters 'Start temp.', 'End temp.' and 'Scan speed'."""
+        """Reads out the set temperature and the WideScan parameters 'Start temp.', 'End temp.' and 'Scan speed'
+        (from the mirror, without asking the DLC pro)."""
         try:
-            self.set_temp = self.dlc.laser1.dl.tc.temp_set.get()
-            self.start_temp = self.dlc.laser1.wide_scan.scan_begin.get()
-            self.end_temp = self.dlc.laser1.wide_scan.scan_end.get()
-            self.scan_speed = self.dlc.laser1.wide_scan.speed.get()
+            self.set_temp = self.mirror.get("laser1.dl.tc.temp_set")
+            self.start_temp = self.mirror.get("laser1.wide_scan.scan_begin")
+            self.end_temp = self.mirror.get("laser1.wide_scan.scan_end")
+            self.scan_speed = self.mirror.get("laser1.wide_scan.speed")
             return self.set_temp, self.start_temp, self.end_temp, self.scan_speed
         except AttributeError as e:
             self.update_textBox.emit(f"DFB is not yet connected: {e}")
@@ -99,7 +236,7 @@ class DFB(QtCore.QObject):
             float: Temperature of the DFB diode [°C]
         """
         try:
-            act_temp = self.dlc.laser1.dl.tc.temp_act.get()
+            act_temp = self.mirror.get("laser1.dl.tc.temp_act")
             return np.round(act_temp, 3)
         except AttributeError as e:
             self.update_textBox.emit(f"DFB is not yet connected: {e}")
@@ -111,7 +248,7 @@ class DFB(QtCore.QObject):
             set_temp (float): Desired set temperature [°C]
         """
         try:
-            self.dlc.laser1.dl.tc.temp_set.set(np.round(set_temp, 2))
+            self.mirror.set("laser1.dl.tc.temp_set", np.round(set_temp, 2))
         except AttributeError as e:
             self.update_textBox.emit(f"DFB is not yet connected: {e}")
 
@@ -125,9 +262,9 @@ class DFB(QtCore.QObject):
             scan_speed (float): WideScan speed [K/s]
         """
         try:
-            self.dlc.laser1.wide_scan.scan_begin.set(start_temp)
-            self.dlc.laser1.wide_scan.scan_end.set(end_temp)
-            self.dlc.laser1.wide_scan.speed.set(scan_speed)
+            self.mirror.set("laser1.wide_scan.scan_begin", start_temp)
+            self.mirror.set("laser1.wide_scan.scan_end", end_temp)
+            self.mirror.set("laser1.wide_scan.speed", scan_speed)
         except AttributeError as e:
             self.update_textBox.emit(f"DFB is not yet connected: {e}")
         except ValueError as e:
@@ -138,18 +275,17 @@ class DFB(QtCore.QObject):
             self.update_values.emit(self.read_actual_dfb_values())
 
     def start_wideScan(self):
-        """Creates a QTimer and starts the WideScan. The QTimer is
-        connected to a method that updates the GUI with the WideScan
-        progress.
+        """Starts the WideScan. The GUI is updated with the WideScan progress
+        whenever the DLC pro sends new values (see on_parameters_changed).
         """
         try:
             # TODO: Absicherung durch if/else damit man nur WideScan starten
             # kann falls ASE-Filter verbunden sind
-            self.widescan_loopTimer = QtCore.QTimer()
-            self.widescan_loopTimer.timeout.connect(self.update_wideScan_progress)
-            self.dlc.laser1.wide_scan.start()
+            with self.mirror.lock:
+                self.dlc.laser1.wide_scan.start()
+            self.mirror.refresh("laser1.wide_scan.state")  # Nicht mit dem alten Zustand (0) als beendet werten
+            self.widescan_active = True
             self.widescan_status.emit(True)
-            self.widescan_loopTimer.start()
         except AttributeError as e:
             self.update_textBox.emit(f"DFB is not yet connected: {e}")
         except DecopError:
@@ -162,7 +298,8 @@ class DFB(QtCore.QObject):
         """
         try:
             temp = np.round(self.get_actual_temperature(), 1)
-            self.dlc.laser1.wide_scan.stop()
+            with self.mirror.lock:
+                self.dlc.laser1.wide_scan.stop()
             self.change_dfb_setTemp(temp)
             self.update_values.emit(self.read_actual_dfb_values())
             # self.widescan_status.emit(False)
@@ -180,7 +317,7 @@ class DFB(QtCore.QObject):
                 3 - waiting for stop condition to be reached
         """
         try:
-            state = self.dlc.laser1.wide_scan.state.get()
+            state = self.mirror.get("laser1.wide_scan.state")
             return state
         except AttributeError as e:
             self.update_textBox.emit(f"DFB is not yet connected: {e}")
@@ -192,8 +329,8 @@ class DFB(QtCore.QObject):
             int: Progress of the WideScan [%] and remaining time [s]
         """
         try:
-            progress = self.dlc.laser1.wide_scan.progress.get()
-            remaining_time = self.dlc.laser1.wide_scan.remaining_time.get()
+            progress = self.mirror.get("laser1.wide_scan.progress")
+            remaining_time = self.mirror.get("laser1.wide_scan.remaining_time")
             return progress, remaining_time
         except AttributeError as e:
             self.update_textBox.emit(f"DFB is not yet connected: {e}")
@@ -202,7 +339,7 @@ class DFB(QtCore.QObject):
         """Gets the progress of the WideScan and the current
         temperature and sends signals to update the GUI with these values.
 
-        When the WideScan is finished, stops the QTimer.
+        When the WideScan is finished, the updates stop.
         """
         progress, remaining_time = self.get_wideScan_progress()
         act_temp = self.get_actual_temperature()
@@ -213,7 +350,7 @@ class DFB(QtCore.QObject):
         if self.get_wideScan_state() in {0, 3}:
             self.widescan_finished.emit()
             self.widescan_status.emit(False)
-            self.widescan_loopTimer.stop()
+            self.widescan_active = False
             self.update_values.emit(self.read_actual_dfb_values())
 
     # Ab hier werden neue Funktionen für die Strahlzeit 2025 implementiert:
@@ -225,7 +362,7 @@ class DFB(QtCore.QObject):
             float: Injection current of the DFB diode [mA]
         """
         try:
-            act_current = self.dlc.laser1.dl.cc.current_act.get()
+            act_current = self.mirror.get("laser1.dl.cc.current_act")
             return np.round(act_current, 3)
         except AttributeError as e:
             self.update_textBox.emit(f"DFB is not yet connected: {e}")
@@ -237,7 +374,7 @@ class DFB(QtCore.QObject):
             set_current (float): Gewünschter Set-Strom [mA]
         """
         try:
-            self.dlc.laser1.dl.cc.current_set.set(np.round(set_current, 5))
+            self.mirror.set("laser1.dl.cc.current_set", np.round(set_current, 5))
         except AttributeError as e:
             self.update_textBox.emit(f"DFB ist nicht verbunden: {e}")
         except ValueError as e:
@@ -246,30 +383,54 @@ class DFB(QtCore.QObject):
             self.update_textBox.emit(f"Fehler beim Setzen des Stroms: {e}")
 
     def control_wavelength(self, wlm, checkBox):
-        """PID-Regelung für die Wellenlängenstabilisierung."""
+        """PID-Regelung für die Wellenlängenstabilisierung.
+        Geregelt wird auf die Schätzung des Kalman-Filters (self.estimator) zum aktuellen Zeitpunkt,
+        neue WLM-Werte und die Befehle an den DFB fließen in die Schätzung ein.
+        Ein Regelschritt, wird vom WorkerDFB im eigenen Thread aufgerufen."""
+        with self.control_lock:
+            self._control_step(wlm, checkBox)
+
+    def _control_step(self, wlm, checkBox):
         try:
-            wl = np.round(wlm.GetWavelength(1), 6)  # Aktuelle Wellenlänge messen
-            error = self.target_wavelength - wl  # Regelabweichung berechnen
-
-            self.wl_history.append(wl)
-            if len(self.wl_history) > 5:  # Maximal 5 Werte speichern
-                self.wl_history.pop(0)
-            # Standardabweichung der letzten 5 Werte berechnen
-            if len(self.wl_history) >= 5:
-                wl_std = np.std(self.wl_history)
-
-            # Bedingung für stabile Wellenlänge
-                wl_threshold = 0.00005  # Max. Differenz zwischen Target & wl
-                std_threshold = 0.00005  # Max. Schwankung über Zeit
-
-                # Ausgabe, wenn Laserwellenlänge eingependelt ist:
-                if not self.wavelength_ready and (abs(error) <= wl_threshold) and (wl_std <= std_threshold):
-                    self.update_textBox.emit("Wellenlänge eingependelt!")
-                    if checkBox:
-                        self.send_signal_nextLaserstep.emit()
-                    self.wavelength_ready = True
+            # Modensprung/mehrmodig (ModeHopDetector des WLM): nicht regeln, bis das Spektrum wieder gut ist
+            if getattr(wlm, "spectrum_bad", False):
+                if not self.spectrum_paused:
+                    self.spectrum_paused = True
+                    self.update_textBox.emit("Spektrum nicht einmodig, Stabilisierung pausiert!")
+                return
+            if self.spectrum_paused:
+                self.spectrum_paused = False
+                self.estimator.reset()  # Die Wellenlänge kann gesprungen sein
+                self.last_control = None
+                self.update_textBox.emit("Spektrum wieder einmodig, Stabilisierung läuft weiter")
+
+            wavelengths, timestamps = wlm.read_wavelengths([1])  # Aktuelle Wellenlänge messen
+            wl, measured = np.round(wavelengths[0], 6), timestamps[0]
+            if measured != self.last_measurement and (self.debug or 1028 < wl < 1032):
+                self.last_measurement = measured
+                self.wl_history.append(wl, measured)
+                self.estimator.update(wl, measured)
+
+            now = self.clock.time()
+            wl_estimate, drift, wl_std = self.estimator.predict(now)
+            if np.isnan(wl_estimate) or now - self.estimator.timestamp > self.max_estimate_age:
+                return  # Keine (aktuellen) gültigen Messwerte
+            error = self.target_wavelength - wl_estimate  # Regelabweichung berechnen
+
+            # Ausgabe, wenn Laserwellenlänge eingependelt ist:
+            if self.settle_criterion == "kalman":
+                settled = self.estimator.settled(self.target_wavelength, self.wl_threshold, now)
+            else:
+                settled = self.wl_history.settled(self.target_wavelength, self.wl_threshold, self.std_threshold)
+            if not self.wavelength_ready and settled:
+                self.update_textBox.emit("Wellenlänge eingependelt!")
+                if checkBox:
+                    self.send_signal_nextLaserstep.emit()
+                self.wavelength_ready = True
 
             # PID-Berechnung
+            if self.clock.monotonic() < self.temp_hold_until:
+                return  # Temperaturschritt wirkt noch
             if not self.temp_step:
                 self.temp_step = True
                 if abs(error) > 0.001:
@@ -282,37 +443,52 @@ class DFB(QtCore.QObject):
                     new_temp = np.round(current_temperature + temperature_step, 2)
                     if not self.debug:
                         self.change_dfb_setTemp(set_temp=new_temp)
+                    self.estimator.command_temperature(new_temp - current_temperature)
                     self.update_textBox.emit(f"Neue Temp: {new_temp}")
-                    QtTest.QTest.qWait(1000)
+                    # Statt zu warten (qWait) werden die nächsten Regelschritte ausgelassen:
+                    self.temp_hold_until = self.clock.monotonic() + self.temp_settle_time
+                    self.last_control = None
                     if self.debug:
                         self.update_textBox.emit("DEBUG: Wellenlänge stabil")
                         self.generate_signal()
                     return
 
-            if self.debug or ((1028 < wl < 1032) and (wl != self.old_wl)):
-                self.integral += error * self.dt
-                derivative = (error - self.prev_error) / self.dt
-                correction = self.Kp * error + self.Ki * self.integral + self.Kd * derivative
+            # Tatsächliche Zeit seit dem letzten Regelschritt statt fester Abtastzeit:
+            dt = now - self.last_control if self.last_control is not None else self.dt
+            self.last_control = now
+            self.integral += error * dt
+            derivative = -drift  # Ableitung der Regelabweichung aus der geschätzten Drift
+            correction = self.Kp * error + self.Ki * self.integral + self.Kd * derivative
 
-                new_current = np.round(self.current_set_current + correction, 5)  # Anpassung des Stroms
-                new_current = np.clip(new_current, 110, 130)
-                if not self.debug:
-                    self.change_dfb_setCurrent(new_current)  # Neuen Strom setzen
-                self.current_set_current = new_current  # Speichere neuen Wert
-                self.prev_error = error  # Update den vorherigen Fehlerwert
+            new_current = np.round(self.current_set_current + correction, 5)  # Anpassung des Stroms
+            new_current = np.clip(new_current, 110, 130)
+            if not self.debug:
+                self.change_dfb_setCurrent(new_current)  # Neuen Strom setzen
+            self.estimator.command_current(new_current - self.current_set_current)
+            self.current_set_current = new_current  # Speichere neuen Wert
+            self.prev_error = error  # Update den vorherigen Fehlerwert
 
-                self.old_wl = wl
-                self.update_wl_current.emit((wl, new_current))
+            self.update_wl_current.emit((wl_estimate, new_current))
 
         except Exception as e:
             self.update_textBox.emit(f"Fehler in der Stabilisierung: {e}")
             self.stop_wl_stabilisation()
 
-    def start_wl_stabilisation(self, wlm, kp, ki, kd, checkBox):
-        """This method starts the wavelength stabilisation.
+    def set_settle_window(self, samples=None, seconds=None):
+        """Changes the window of the settle test of the wavelength stabilisation.
 
         Args:
-            wlm (WavelengthMeter): WLM to measure the wavelength
+            samples (int, optional): Window length in measurements. Defaults to None.
+            seconds (float, optional): Window length in seconds. Defaults to None.
+        """
+        with self.control_lock:
+            self.wl_history.set_window(samples=samples, seconds=seconds)
+
+    def reset_stabilisation(self, kp, ki, kd):
+        """Sets the PID parameters and resets the state of the control loop (see control_wavelength).
+
+        Args:
+            kp, ki, kd (float): PID parameters
         """
         # PID-Parameter
         self.Kp = kp
@@ -320,8 +496,12 @@ class DFB(QtCore.QObject):
         self.Kd = kd
 
         self.temp_step = False
+        self.temp_hold_until = 0.0
         self.wavelength_ready = False
-        self.old_wl = 0
+        self.last_measurement = None
+        self.last_control = None
+        self.spectrum_paused = False
+        self.estimator.reset()
         self.integral = 0
         self.prev_error = 0
         if not self.debug:
@@ -329,25 +509,50 @@ class DFB(QtCore.QObject):
         else:
             self.current_set_current = 125.0
 
-        self.wl_stabil_timer = QtCore.QTimer()
-        self.wl_stabil_timer.timeout.connect(lambda: self.control_wavelength(wlm=wlm, checkBox=checkBox))
-        self.wl_stabil_timer.start(100)
+    def start_wl_stabilisation(self, wlm, kp, ki, kd, checkBox):
+        """This method starts the wavelength stabilisation in a QThread (WorkerDFB).
+
+        Args:
+            wlm (WavelengthMeter): WLM to measure the wavelength
+        """
+        self.reset_stabilisation(kp, ki, kd)
+
+        # Initiate QThread and WorkerDFB class:
+        self.threadDFB = QtCore.QThread()
+        self.workerDFB = WorkerDFB(dfb=self, wlm=wlm, checkBox=checkBox)
+        self.workerDFB.moveToThread(self.threadDFB)
+
+        # Connect different methods to the signals of the thread:
+        self.threadDFB.started.connect(self.workerDFB.stabilise)
+        self.workerDFB.update_timing.connect(self.update_stabil_timing.emit)
+        self.workerDFB.finished.connect(self.threadDFB.quit)
+        self.workerDFB.finished.connect(self.workerDFB.deleteLater)
+        self.threadDFB.finished.connect(self.threadDFB.deleteLater)
+
+        # Start the thread:
+        self.threadDFB.start()
         self.wl_stabil_status.emit(True)
 
     def stop_wl_stabilisation(self):
         """This method stops the wavelength stabilisation and updates the status.
         """
         self.wl_stabil_status.emit(False)
-        self.wl_stabil_timer.stop()
+        if self.workerDFB is not None and self.workerDFB.running:
+            self.workerDFB.stop()
+            self.update_textBox.emit(f"Stabilisierung: {self.workerDFB.timing.summary()}")
 
     def change_target_wavelength(self, delta_wl, checkBox, step_forward=True):
+        with self.control_lock:
+            self._change_target_wavelength(delta_wl, checkBox, step_forward)
+
+    def _change_target_wavelength(self, delta_wl, checkBox, step_forward=True):
         if checkBox:
             self.send_signal_laserBusy.emit()
         elif self.debug:
             self.generate_signal2()
         self.temp_step = False
         self.wavelength_ready = False
-        self.wl_history = []
+        self.wl_history.clear()
         if step_forward:
             self.target_wavelength = self.target_wavelength + delta_wl
         else:
@@ -357,6 +562,11 @@ class DFB(QtCore.QObject):
         self.counter_laser_steps_signal.emit(self.counter_laser_steps)
 
     def change_target_wavelength_advanced(self, delta_wl, checkBox, checkBox_extraction, extractions_counter, laserstep_counter, step_forward=True):
+        with self.control_lock:
+            self._change_target_wavelength_advanced(delta_wl, checkBox, checkBox_extraction, extractions_counter,
+                                                    laserstep_counter, step_forward)
+
+    def _change_target_wavelength_advanced(self, delta_wl, checkBox, checkBox_extraction, extractions_counter, laserstep_counter, step_forward=True):
         if checkBox_extraction:
             self.counter_extractions += 1
             self.counter_extractions_signal.emit(self.counter_extractions)
@@ -371,7 +581,7 @@ class DFB(QtCore.QObject):
                     self.generate_signal2()
                 self.temp_step = False
                 self.wavelength_ready = False
-                self.wl_history = []
+                self.wl_history.clear()
                 if step_forward:
                     self.target_wavelength = self.target_wavelength + delta_wl
                 else:
@@ -0,0 +1,435 @@
+"""
+Simulated DFB laser on a simulated DLC pro, coupled to the simulated wavelength meter.
+
+The wavelength of the laser follows its temperature (with thermal lag) and its
+injection current, plus a slow drift. The DLC pro stand-in has the parameters
+that DFB_functions uses (laser1.dl.tc, laser1.dl.cc, laser1.wide_scan), and the
+simulated wlmData measures the laser on channel 1:
+
+    clock, laser, dlc, wlm = DFB_simulation.simulated_setup(speed=20)
+    dfb.dlc_factory = lambda ip: dlc   # DFB.connect_dfb uses the simulated DLC pro
+
+All parts share a SimulationClock. With speed > 1 the laser and the meter run
+that many times faster than real time; the stabilisation follows when it runs on
+the same clock (dfb.clock = clock), so whole scans and stabilisations can be
+benchmarked in a fraction of their real duration.
+
+    python DFB_simulation.py --speed 50
+    python DFB_simulation.py --speed 20 --stabilise --step 0.01   # Step response, see benchmark_stabilisation
+"""
+
+import argparse
+import datetime
+import math
+import threading
+import time
+import numpy as np
+import WLM_functions
+import WLM_simulation
+
+try:
+    from toptica.lasersdk.decop import DecopError
+except ImportError:
+    class DecopError(Exception):
+        """Stand-in for the error of the DLC pro if the Toptica SDK isn't installed."""
+
+
+class SimulationClock:
+    """Time of the simulation (like time.time()) that runs ``speed`` times faster than real time."""
+
+    def __init__(self, speed=1.0):
+        self.speed = float(speed)
+        self._start = time.time()
+        self._start_monotonic = time.monotonic()
+
+    def time(self):
+        return self._start + (time.monotonic() - self._start_monotonic) * self.speed
+
+    def monotonic(self):
+        """Simulation time for intervals (it never jumps)."""
+        return self.time()
+
+    def sleep(self, seconds):
+        """Sleeps for ``seconds`` of simulation time."""
+        time.sleep(seconds / self.speed)
+
+
+class DfbModel:
+    """Wavelength of a DFB diode as a function of its temperature and current.
+
+    The diode temperature follows the set temperature with a first-order lag; the WideScan
+    ramps the set temperature like the DLC pro. The state is advanced to the time of the
+    clock whenever it is read.
+    """
+
+    def __init__(self, clock=None, wavelength=1030.0, temperature=20.0, current=125.0,
+                 temperature_tuning=1 / 9.33, current_tuning=0.003, thermal_lag=2.0, drift=1e-5, seed=None):
+        """
+        Args:
+            clock (SimulationClock, optional): Time of the simulation. Defaults to None (real time).
+            wavelength (float, optional): Wavelength [nm] at ``temperature`` and ``current``. Defaults to 1030.
+            temperature (float, optional): Diode temperature [°C] at the start. Defaults to 20.
+            current (float, optional): Injection current [mA] at the start. Defaults to 125.
+            temperature_tuning (float, optional): [nm/K]. Defaults to 1 / 9.33 (see DFB.control_wavelength).
+            current_tuning (float, optional): [nm/mA]. Defaults to 0.003.
+            thermal_lag (float, optional): Time constant [s] of the diode temperature. Defaults to 2.
+            drift (float, optional): Random walk [nm/sqrt(s)] of the wavelength. Defaults to 1e-5.
+            seed (int, optional): Seed of the random numbers. Defaults to None.
+        """
+        self.clock = clock if clock is not None else SimulationClock()
+        self.wavelength0 = wavelength
+        self.temperature0 = temperature
+        self.current0 = current
+        self.temperature_tuning = temperature_tuning
+        self.current_tuning = current_tuning
+        self.thermal_lag = thermal_lag
+        self.drift = drift
+
+        self.temp_set = self.temp_act = float(temperature)
+        self.current_set = float(current)
+        self.offset = 0.0  # Drift of the wavelength [nm]
+
+        # WideScan, states like the DLC pro (0 disabled, 1 waiting for start, 2 active, 3 waiting for stop)
+        self.scan_begin = temperature
+        self.scan_end = temperature + 5.0
+        self.scan_speed = 0.1  # K/s
+        self.scan_state = 0
+        self._scan_started = None  # Time the ramp started
+
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.RLock()
+        self._time = self.clock.time()
+
+    def advance(self, timestamp=None):
+        """Advances the state to ``timestamp`` (default: now), in steps of at most 50 ms."""
+        with self._lock:
+            timestamp = self.clock.time() if timestamp is None else timestamp
+            total = timestamp - self._time
+            if total <= 0:
+                return
+            steps = math.ceil(total / 0.05)
+            h = total / steps
+            for _ in range(steps):
+                self._time += h
+                self._step_scan()
+                self.temp_act += (self.temp_set - self.temp_act) * -math.expm1(-h / self.thermal_lag)
+            self.offset += self.drift * math.sqrt(total) * self._rng.standard_normal()
+
+    def _step_scan(self):
+        if self.scan_state == 1 and abs(self.temp_act - self.scan_begin) < 0.05:
+            self.scan_state = 2
+            self._scan_started = self._time
+        elif self.scan_state == 2:
+            direction = 1 if self.scan_end >= self.scan_begin else -1
+            self.temp_set = self.scan_begin + direction * self.scan_speed * (self._time - self._scan_started)
+            if direction * (self.temp_set - self.scan_end) >= 0:
+                self.temp_set = self.scan_end
+                self.scan_state = 3
+        elif self.scan_state == 3 and abs(self.temp_act - self.scan_end) < 0.05:
+            self.scan_state = 0
+
+    def wavelength(self, timestamp=None):
+        """Wavelength [nm] at ``timestamp`` (default: now)."""
+        with self._lock:
+            self.advance(timestamp)
+            return (self.wavelength0 + self.offset
+                    + self.temperature_tuning * (self.temp_act - self.temperature0)
+                    + self.current_tuning * (self.current_set - self.current0))
+
+    def temperature(self):
+        """Diode temperature [°C] now."""
+        with self._lock:
+            self.advance()
+            return self.temp_act
+
+    def set_temperature(self, temperature):
+        with self._lock:
+            self.advance()
+            self.temp_set = float(temperature)
+
+    def set_current(self, current):
+        with self._lock:
+            self.advance()
+            self.current_set = float(current)
+
+    def start_scan(self):
+        with self._lock:
+            self.advance()
+            if self.scan_state != 0:
+                raise DecopError("WideScan is already running")
+            self.scan_state = 1
+            self.temp_set = self.scan_begin
+
+    def stop_scan(self):
+        with self._lock:
+            self.advance()
+            self.scan_state = 0
+
+    def get_scan_state(self):
+        with self._lock:
+            self.advance()
+            return self.scan_state
+
+    def scan_progress(self):
+        """Progress [%] and remaining time [s] of the WideScan."""
+        with self._lock:
+            self.advance()
+            span = abs(self.scan_end - self.scan_begin)
+            duration = span / self.scan_speed if self.scan_speed > 0 else 0.0
+            if self.scan_state == 2 and duration > 0:
+                elapsed = self._time - self._scan_started
+                return int(min(100 * elapsed / duration, 100)), max(duration - elapsed, 0.0)
+            if self.scan_state == 1:
+                return 0, duration
+            return (100, 0.0) if self.scan_state == 3 else (0, 0.0)
+
+
+class _SubscriptionValue:
+    """Value sent to a subscription callback; get() returns it like in the lasersdk."""
+
+    def __init__(self, value):
+        self._value = value
+
+    def get(self):
+        return self._value
+
+
+class _Subscription:
+    """Subscription of a parameter of the simulated DLC pro, see SimulatedDLCpro.poll."""
+
+    def __init__(self, parameter, callback):
+        self.parameter = parameter
+        self.callback = callback
+        self.value = None
+
+    def cancel(self):
+        if self in self.parameter.dlc.subscriptions:
+            self.parameter.dlc.subscriptions.remove(self)
+
+
+class _Parameter:
+    """Read-only parameter of the DLC pro (get(), subscribe(callback))."""
+
+    def __init__(self, dlc, get):
+        self.dlc = dlc
+        self._get = get
+
+    def get(self):
+        return self._get()
+
+    def subscribe(self, callback):
+        subscription = _Subscription(self, callback)
+        self.dlc.subscriptions.append(subscription)
+        return subscription
+
+
+class _SettableParameter(_Parameter):
+    """Parameter of the DLC pro with get() and set(value)."""
+
+    def __init__(self, dlc, get, set):
+        super().__init__(dlc, get)
+        self._set = set
+
+    def set(self, value):
+        self._set(value)
+
+
+class _Node:
+    """Node of the parameter tree (laser1, laser1.dl, ...)."""
+
+    def __init__(self, **children):
+        self.__dict__.update(children)
+
+
+class SimulatedDLCpro:
+    """Stand-in for toptica.lasersdk.dlcpro DLCpro with the parameters of a DfbModel."""
+
+    def __init__(self, model):
+        """
+        Args:
+            model (DfbModel): Simulated laser
+        """
+        self.model = model
+        self.is_open = False
+        self.subscriptions = []
+
+        def setter(name):
+            def set(value):
+                with model._lock:
+                    model.advance()
+                    setattr(model, name, float(value))
+            return set
+
+        def parameter(get, set=None):
+            return _Parameter(self, get) if set is None else _SettableParameter(self, get, set)
+
+        self.laser1 = _Node(
+            dl=_Node(
+                tc=_Node(temp_set=parameter(lambda: model.temp_set, model.set_temperature),
+                         temp_act=parameter(model.temperature)),
+                cc=_Node(current_set=parameter(lambda: model.current_set, model.set_current),
+                         current_act=parameter(lambda: model.current_set)),
+            ),
+            wide_scan=_Node(
+                scan_begin=parameter(lambda: model.scan_begin, setter("scan_begin")),
+                scan_end=parameter(lambda: model.scan_end, setter("scan_end")),
+                speed=parameter(lambda: model.scan_speed, setter("scan_speed")),
+                state=parameter(model.get_scan_state),
+                progress=parameter(lambda: model.scan_progress()[0]),
+                remaining_time=parameter(lambda: model.scan_progress()[1]),
+                start=model.start_scan,
+                stop=model.stop_scan,
+            ),
+        )
+
+    def open(self):
+        self.is_open = True
+
+    def close(self):
+        self.is_open = False
+
+    def poll(self):
+        """Calls the callbacks of the subscriptions whose parameter changed since the last poll
+        (the real DLC pro pushes the changes, the lasersdk delivers them in poll())."""
+        timestamp = datetime.datetime.now()
+        for subscription in list(self.subscriptions):
+            value = subscription.parameter.get()
+            if value != subscription.value:
+                subscription.value = value
+                subscription.callback(subscription, timestamp, _SubscriptionValue(value))
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def simulated_setup(speed=1.0, update_rate=50.0, seed=None, **model_args):
+    """Builds a simulated DFB, DLC pro and wavelength meter (laser on channel 1) on one clock.
+
+    Args:
+        speed (float, optional): Simulation time per real time. Defaults to 1.
+        update_rate (float, optional): Measurements/s of the meter (simulation time). Defaults to 50.
+        seed (int, optional): Seed of the random numbers. Defaults to None.
+        **model_args: Further arguments of DfbModel.
+
+    Returns:
+        (SimulationClock, DfbModel, SimulatedDLCpro, WavelengthMeter)
+    """
+    clock = SimulationClock(speed)
+    model = DfbModel(clock=clock, seed=seed, **model_args)
+    dll = WLM_simulation.SimulatedWlmData(lasers={1: model}, update_rate=update_rate, clock=clock, seed=seed)
+    wlm = WLM_functions.WavelengthMeter(dll=dll, interferometers=dll.interferometers, clock=clock)
+    return clock, model, SimulatedDLCpro(model), wlm
+
+
+def benchmark_stabilisation(speed=10.0, step=0.01, kp=75.0, ki=0.0, kd=0.02, settle=10.0, duration=30.0,
+                            hold=5.0, tolerance=1e-4, seed=0):
+    """Closed-loop benchmark of the wavelength stabilisation (DFB_functions.DFB and its WorkerDFB)
+    on the simulated laser: after ``settle`` s at the start wavelength the target is stepped by ``step``.
+
+    Args:
+        speed (float, optional): Simulation time per real time. Defaults to 10.
+        step (float, optional): Step of the target wavelength [nm]. Defaults to 0.01.
+        kp, ki, kd (float, optional): PID parameters. Defaults to 75, 0, 0.02 (GUI defaults).
+        settle (float, optional): Stabilisation [s] before the step. Defaults to 10.
+        duration (float, optional): Stabilisation [s] after the step. Defaults to 30.
+        hold (float, optional): Final window [s] of the residual. Defaults to 5.
+        tolerance (float, optional): Max. deviation [nm] from the target once settled. Defaults to 1e-4.
+        seed (int, optional): Seed of the random numbers. Defaults to 0.
+
+    Returns:
+        dict: settle_time (simulation time [s] from the step until the wavelength stays within
+            ``tolerance``, nan if it doesn't), residual_mean and residual_std (deviation [nm] of
+            the wavelength from the target in the final ``hold`` s) and timing (LoopTiming.as_dict()
+            of the control steps, in simulation time)
+    """
+    import dlc_mirror
+    import DFB_functions
+
+    clock, model, dlc, wlm = simulated_setup(speed=speed, seed=seed)
+    broker = WLM_functions.WavelengthBroker(wlm, callback=True).start()
+    dfb = DFB_functions.DFB()
+    dfb.clock = clock
+    dfb.dlc = dlc
+    # Polled by the loop below instead of the QTimer of DFB.start_mirror (no event loop here):
+    dfb.mirror = dlc_mirror.DlcParameterMirror(dlc, DFB_functions.DFB.mirrored_parameters).start()
+    dfb.target_wavelength = np.round(model.wavelength(), 6)
+    dfb.reset_stabilisation(kp, ki, kd)
+    worker = DFB_functions.WorkerDFB(dfb=dfb, wlm=broker, checkBox=False)
+    thread = threading.Thread(target=worker.stabilise, name="WorkerDFB", daemon=True)
+    thread.start()
+
+    samples = []  # (simulation time, deviation from the target [nm])
+    try:
+        started = clock.time()
+        while clock.time() < started + settle:
+            dfb.mirror.poll()
+            clock.sleep(dfb.dt / 2)
+        dfb.change_target_wavelength(step, checkBox=False)
+        stepped = clock.time()
+        while (now := clock.time()) < stepped + duration:
+            samples.append((now - stepped, model.wavelength(now) - dfb.target_wavelength))
+            dfb.mirror.poll()
+            clock.sleep(dfb.dt / 2)
+    finally:
+        worker.stop()
+        thread.join()
+        dfb.mirror.stop()
+        broker.stop()
+        wlm.dll.stop()
+
+    times, deviations = np.array(samples).T
+    outside = np.flatnonzero(np.abs(deviations) > tolerance)
+    if not outside.size:
+        settle_time = 0.0
+    elif outside[-1] + 1 < len(times):
+        settle_time = times[outside[-1] + 1]
+    else:
+        settle_time = math.nan
+    final = deviations[times >= times[-1] - hold]
+    return {"settle_time": settle_time, "residual_mean": final.mean(), "residual_std": final.std(),
+            "timing": worker.timing.as_dict()}
+
+
+if __name__ == '__main__':
+    # WideScan of the simulated laser, measured through the wavelength broker
+    # (--stabilise: step response of the wavelength stabilisation instead)
+    parser = argparse.ArgumentParser(description='Runs a WideScan of the simulated DFB laser.')
+    parser.add_argument('--speed', type=float, default=20.0, help='simulation time per real time')
+    parser.add_argument('--span', type=float, default=2.0, help='WideScan span [K]')
+    parser.add_argument('--scan-speed', type=float, default=0.1, help='WideScan speed [K/s]')
+    parser.add_argument('--stabilise', action='store_true', help='benchmark the wavelength stabilisation')
+    parser.add_argument('--step', type=float, default=0.01, help='step of the target wavelength [nm]')
+    parser.add_argument('--pid', type=float, nargs=3, default=(75.0, 0.0, 0.02), metavar=('KP', 'KI', 'KD'),
+                        help='PID parameters of the stabilisation')
+    args = parser.parse_args()
+
+    if args.stabilise:
+        result = benchmark_stabilisation(args.speed, args.step, *args.pid)
+        print(f"Step of {args.step} nm: settled after {result['settle_time']:.2f} s, "
+              f"residual {result['residual_mean'] * 1e6:.1f} +- {result['residual_std'] * 1e6:.1f} fm; "
+              f"control steps: {result['timing']['iterations']}, {result['timing']['overruns']} overruns")
+        raise SystemExit
+
+    clock, model, dlc, wlm = simulated_setup(speed=args.speed, seed=0)
+    broker = WLM_functions.WavelengthBroker(wlm, callback=True).start()
+    subscription = broker.subscribe(queued=True, maxsize=100000)
+    dlc.laser1.wide_scan.scan_end.set(model.scan_begin + args.span)
+    dlc.laser1.wide_scan.speed.set(args.scan_speed)
+
+    started, started_clock = time.monotonic(), clock.time()
+    dlc.laser1.wide_scan.start()
+    while dlc.laser1.wide_scan.state.get() != 0:
+        clock.sleep(0.5)
+    real, simulated = time.monotonic() - started, clock.time() - started_clock
+    broker.stop()
+    wlm.dll.stop()
+
+    wavelengths = []
+    while not subscription.queue.empty():
+        wavelengths.append(subscription.queue.get_nowait().wavelengths[1])
+    print(f"WideScan of {args.span} K: {simulated:.1f} s simulated in {real:.1f} s real time, "
+          f"{len(wavelengths)} readings from {min(wavelengths):.4f} to {max(wavelengths):.4f} nm")
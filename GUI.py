@@ -2,6 +2,8 @@ from PyQt6 import QtWidgets, uic, QtCore, QtGui
 import ASE_functions
 import WLM_functions
 import DFB_functions
+import loop_timing
+import pulse_metrics
 import LBO_functions
 import BBO_functions
 import Powermeter_functions
@@ -77,6 +79,9 @@ class MainWindow(QtWidgets.QMainWindow):
             self.dfb_label_currentWL_uv.setText(f"Wavelength UV: {values[0] / 4}"),
             self.dfb_label_injectionCurrent.setText(f"Injection Current: {values[1]}")
             ))
+        # Timing of the control steps of the running stabilisation (every second), as tooltip:
+        self.dfb.update_stabil_timing.connect(lambda stats: self.dfb_label_injectionCurrent.setToolTip(
+            f"Stabilisation: {loop_timing.format_stats(stats)}"))
         self.dfb.update_target_wavelength.connect(lambda wl: self.dfb_lineEdit_wl_stabil.setValue(wl))
         self.dfb.send_signal_laserBusy.connect(self.bbo.generate_signal2)
         self.dfb.send_signal_nextLaserstep.connect(self.bbo.generate_signal)
@@ -126,6 +131,9 @@ class MainWindow(QtWidgets.QMainWindow):
         self.bbo.autoscan_status_double.connect(lambda: self.bbo_button_stopDiodeVoltage.setDisabled(True))
         self.bbo.autoscan_status_single.connect(self.bbo_button_stopUvScan.setEnabled)
         self.bbo.autoscan_status_double.connect(self.bbo_button_stopUvScan_double.setEnabled)
+        # Pulse metrics of the UV traces (BBO.uv_metric other than "mean"), as tooltip:
+        self.bbo.pulseMetricsUpdated.connect(
+            lambda metrics: self.bbo_label_diodeVoltage.setToolTip(pulse_metrics.summary(metrics)))
         self.bbo.voltageUpdated.connect(lambda value: setattr(self, "data_uv", value))
         self.bbo.voltageUpdated.connect(lambda value: self.status_label_bbo.setText(f"U[V] = {value}"))
         self.bbo.stepsUpdatedFront.connect(lambda value: setattr(self, "data_steps_front", value))
@@ -225,6 +233,10 @@ class MainWindow(QtWidgets.QMainWindow):
                 step_forward=False))
         self.dfb_button_laserBusy.clicked.connect(self.bbo.generate_signal2)
         self.dfb_button_nextLaserstep.clicked.connect(self.bbo.generate_signal)
+        # Pulse signals need the generator presets of the RedPitaya (not with PyRPL):
+        self.bbo.pulse_presets_status.connect(self.enable_pulse_controls)
+        self.dfb_button_connectDfb.clicked.connect(
+            lambda: self.enable_pulse_controls(self.bbo.pulse_presets_available))
         self.dfb_pushButton_resetNumberOfLasersteps.clicked.connect(self.reset_dfb_lasercounter)
         self.dfb_pushButton_resetNumberOfExtractions.clicked.connect(self.reset_extractioncounter)
         self.dfb_button_fakeExtraction.clicked.connect(self.dfb.fake_Extraction)
@@ -514,6 +526,12 @@ class MainWindow(QtWidgets.QMainWindow):
         except AttributeError as e:
             self.update_textBox(f"Covesion oven is not connected: {e}")
 
+    def enable_pulse_controls(self, enabled):
+        """Enables|Disables the controls that send pulse signals with the RedPitaya."""
+        for widget in (self.dfb_button_laserBusy, self.dfb_button_nextLaserstep,
+                       self.dfb_checkBox_activateSignals):
+            widget.setEnabled(enabled and self.dfb._connect_button_is_checked)
+
     def disable_tab_widgets(self, tab_name, disable, excluded_widget=None, ignored_widgets=[]):
         """This method goes through every QWidget in a specified QTabWidget
         and disables (disable=True) or enables (disable=False) every QWidget,
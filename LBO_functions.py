@@ -44,8 +44,7 @@ class WorkerLBO(QtCore.QObject):
             old_wl = 0
             while self.keep_running:
                 wl = np.round(self.wlm.GetWavelength(1), 6)
-                # This sleep timer is important, otherwise the WLM is overloaded
-                # when the ASE filter also measure the wavelength all the time:
+                # The WLM is sampled by the WavelengthBroker, this only sets the pace of the loop:
                 time.sleep(0.1)
 
                 # wl = self.wlm.get_wavelength(channel=1, wait=False)  # PyLabLib
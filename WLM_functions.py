@@ -5,23 +5,106 @@ need some more work.
 """
 
 import argparse
+import math
+import collections
 import ctypes, os, sys, random, time
+import queue
+import threading
+import numpy as np
+import loop_timing
+
+# Constants of wlmData.h for the callback mode:
+cInstNotification = 1
+cNotifyInstallCallback = 0
+cNotifyRemoveCallback = 1
+# Callback modes of the wavelengths: {cmiWavelengthN: channel N}
+cmiWavelengths = {42: 1, 43: 2, 90: 3, 91: 4, 92: 5, 93: 6, 94: 7, 95: 8}
+# Pattern arrays (GetPatternData): fringe patterns of the Fizeau interferometers
+cSignal1Interferometers = 0
+cSignal1WideInterferometer = 1
+# Bytes per item of a pattern array -> NumPy type
+pattern_dtypes = {2: np.int16, 4: np.int32, 8: np.float64}
+
+# void CallbackProc(long Mode, long IntVal, double DblVal), __stdcall on Windows:
+CallbackProc = getattr(ctypes, "WINFUNCTYPE", ctypes.CFUNCTYPE)(None, ctypes.c_long, ctypes.c_long, ctypes.c_double)
 
 class WavelengthMeter:
 
-    def __init__(self, dllpath="C:\Windows\System32\wlmData.dll", debug=False):
+    def __init__(self, dllpath="C:\Windows\System32\wlmData.dll", debug=False, dll=None, interferometers=1,
+                 clock=None):
         """
         Wavelength meter class.
         Argument: Optional path to the dll. Default: "C:\Windows\System32\wlmData.dll"
+        dll: Optional loaded library or stand-in (e.g. WLM_simulation.SimulatedWlmData)
+        that is used instead of loading dllpath.
+        interferometers: Fizeau interferometers whose patterns follow each other in the
+        pattern array cSignal1Interferometers (depends on the WLM model). Default: 1
+        clock: Time of the timestamps (time() and monotonic()), e.g. DFB_simulation.SimulationClock.
+        Default: loop_timing.system_clock (real time)
         """
         self.channels = []
+        self.interferometers = int(interferometers)
+        self.clock = clock if clock is not None else loop_timing.system_clock
         self.dllpath = dllpath
         self.debug = debug
+        self._callback = None
+        self._cache = {}           # {channel: (wavelength, time.time() of the measurement, time.time() of the reading)}
+        self._clock_offset = None  # time.time() minus the timestamps of the driver [s]
+        self._active = (None, 0)   # (active channels, time.time() when they were read)
         if not debug:
-            self.dll = ctypes.WinDLL(dllpath)
+            self.dll = dll if dll is not None else ctypes.WinDLL(dllpath)
             self.dll.GetWavelengthNum.restype = ctypes.c_double
             self.dll.GetFrequencyNum.restype = ctypes.c_double
             self.dll.GetSwitcherMode.restype = ctypes.c_long
+            self.dll.Instantiate.restype = ctypes.c_int64
+            self.dll.Instantiate.argtypes = [ctypes.c_long, ctypes.c_long, ctypes.c_int64, ctypes.c_long]
+            self.dll.GetSwitcherSignalStates.restype = ctypes.c_long
+            self.dll.GetPatternItemCount.restype = ctypes.c_long
+            self.dll.GetPatternItemSize.restype = ctypes.c_long
+            self.dll.GetPatternDataNum.restype = ctypes.c_long
+            self.dll.GetPatternDataNum.argtypes = [ctypes.c_long, ctypes.c_long, ctypes.c_size_t]
+
+    def install_callback(self, handler):
+        """Callback mode: the driver calls handler(channel, wavelength) for every new
+        wavelength, from its own thread, as soon as the meter measured it.
+
+        Returns False if callbacks aren't available (debug mode or the driver refused),
+        then GetWavelength has to be polled instead.
+        """
+        if self.debug:
+            return False
+        self.remove_callback()
+
+        def on_event(mode, int_val, dbl_val):
+            channel = cmiWavelengths.get(mode)
+            if channel is not None:
+                now = self.clock.time()
+                self._cache[channel] = (dbl_val, self._measurement_time(int_val, now), now)
+                handler(channel, dbl_val)
+
+        # The ctypes function must stay referenced as long as it is installed:
+        self._callback = CallbackProc(on_event)
+        address = ctypes.cast(self._callback, ctypes.c_void_p).value
+        if not self.dll.Instantiate(cInstNotification, cNotifyInstallCallback, address, 0):
+            self._callback = None
+            return False
+        return True
+
+    def _measurement_time(self, timestamp, now):
+        """time.time() of a measurement from the timestamp [ms] the driver passes to the callback.
+        The clock offset is the smallest one seen (the callback with the least delay); it's measured
+        again if the timestamps jump (wrap-around, restarted server). Timestamp 0: no timestamp."""
+        if not timestamp:
+            return now
+        offset = now - timestamp * 1e-3
+        if self._clock_offset is None or offset < self._clock_offset or offset - self._clock_offset > 1.0:
+            self._clock_offset = offset
+        return timestamp * 1e-3 + self._clock_offset
+
+    def remove_callback(self):
+        if self._callback is not None:
+            self.dll.Instantiate(cInstNotification, cNotifyRemoveCallback, 0, 0)
+            self._callback = None
 
     def GetExposureMode(self):
         if not self.debug:
@@ -58,9 +141,60 @@ class WavelengthMeter:
             "exposureMode": self.GetExposureMode()
         }
 
+    def active_channels(self, max_age=1.0):
+        """Channels that are measured: the channels used in switcher mode, otherwise channel 1.
+        The switcher states are read again when they are older than max_age [s]."""
+        channels, timestamp = self._active
+        if channels is not None and self.clock.time() - timestamp <= max_age:
+            return channels
+        if self.debug:
+            channels = [1, 2, 3, 4, 5]
+        elif not self.switcher_mode:
+            channels = [1]
+        else:
+            channels = []
+            for channel in range(1, 9):
+                use, show = ctypes.c_long(0), ctypes.c_long(0)
+                self.dll.GetSwitcherSignalStates(ctypes.c_long(channel), ctypes.byref(use), ctypes.byref(show))
+                if use.value:
+                    channels.append(channel)
+        self._active = (channels, self.clock.time())
+        return channels
+
+    def read_wavelengths(self, channels=None, max_age=0.05):
+        """Reads several channels at once. A channel is only read from the DLL if it was last
+        read more than max_age [s] ago; in callback mode the values are pushed by the driver.
+
+        Args:
+            channels (list, optional): Channels to read. Defaults to None (the active channels).
+            max_age (float, optional): Maximum age [s] of a reading. Defaults to 0.05
+                (shorter than a measurement of the meter at the usual exposure times).
+
+        Returns:
+            (ndarray, ndarray): Wavelengths [nm] and time.time() of their measurement. In callback
+                mode that's the timestamp of the driver; a polled value counts as measured when it
+                was first read (the DLL returns the last measurement until the next one).
+        """
+        channels = self.active_channels() if channels is None else list(channels)
+        now = self.clock.time()
+        wavelengths = np.empty(len(channels))
+        timestamps = np.empty(len(channels))
+        for i, channel in enumerate(channels):
+            cached = self._cache.get(channel)
+            if cached is None or now - cached[2] > max_age:
+                wavelength = self.GetWavelength(channel)
+                read = self.clock.time()
+                measured = cached[1] if cached is not None and cached[0] == wavelength else read
+                cached = self._cache[channel] = (wavelength, measured, read)
+            wavelengths[i], timestamps[i] = cached[:2]
+        return wavelengths, timestamps
+
     @property
     def wavelengths(self):
-        return [self.GetWavelength(i+1) for i in range(8)]
+        # Inactive channels are 0 without asking the DLL:
+        channels = self.active_channels()
+        values = dict(zip(channels, self.read_wavelengths(channels)[0].tolist()))
+        return [values.get(i+1, 0) for i in range(8)]
 
     @property
     def wavelength(self):
@@ -80,6 +214,439 @@ class WavelengthMeter:
         else:
             pass
 
+    def enable_pattern(self, index=cSignal1Interferometers, enable=True):
+        """The WLM application only exports the pattern arrays (read_pattern) after they were enabled."""
+        if not self.debug:
+            self.dll.SetPattern(ctypes.c_long(index), ctypes.c_long(int(enable)))
+
+    def read_pattern(self, channel=1, index=cSignal1Interferometers):
+        """Copies a pattern array of the last measurement of a channel into NumPy.
+
+        Args:
+            channel (int, optional): Switcher channel. Defaults to 1.
+            index (int, optional): cSignal1Interferometers (fringe patterns of the interferometers)
+                or cSignal1WideInterferometer. Defaults to cSignal1Interferometers.
+
+        Returns:
+            ndarray: Pattern (int16/int32 per pixel), None in debug mode or if the pattern isn't
+                available (see enable_pattern)
+        """
+        if self.debug:
+            return None
+        count = self.dll.GetPatternItemCount(ctypes.c_long(index))
+        size = self.dll.GetPatternItemSize(ctypes.c_long(index))
+        if count <= 0 or size not in pattern_dtypes:
+            return None
+        pattern = np.empty(count, dtype=pattern_dtypes[size])
+        # The DLL writes directly into the array:
+        self.dll.GetPatternDataNum(ctypes.c_long(channel), ctypes.c_long(index), pattern.ctypes.data)
+        return pattern
+
+WavelengthReading = collections.namedtuple("WavelengthReading", ["timestamp", "wavelengths", "sequence", "measured"])
+WavelengthReading.__doc__ = """One sample of the broker: time.time() of the sample, {channel: wavelength [nm]},
+the number of the sample and {channel: time.time() of the measurement} (see WavelengthMeter.read_wavelengths;
+a poll that finds no new measurement keeps its time)."""
+
+
+class WavelengthSubscription:
+    """Readings of a WavelengthBroker for one consumer, see WavelengthBroker.subscribe."""
+
+    def __init__(self, broker, queued=False, maxsize=100):
+        self.broker = broker
+        self.queued = queued
+        self.queue = queue.Queue(maxsize=maxsize) if queued else None
+        self.dropped = 0   # Queued readings lost because the consumer was too slow
+        self._sequence = -1
+
+    def _publish(self, reading):
+        if not self.queued:
+            return
+        try:
+            self.queue.put_nowait(reading)
+        except queue.Full:
+            # Keep the newest readings:
+            self.dropped += 1
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                pass
+            self.queue.put_nowait(reading)
+
+    def get(self, timeout=None):
+        """Returns the next reading this subscription hasn't seen yet (queued: the oldest one,
+        latest-value: the newest one), waiting for it up to ``timeout`` seconds.
+
+        Raises:
+            TimeoutError: No new reading within the timeout.
+        """
+        if self.queued:
+            try:
+                reading = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                raise TimeoutError("No wavelength reading") from None
+        else:
+            reading = self.broker.wait_for(self._sequence + 1, timeout)
+        self._sequence = reading.sequence
+        return reading
+
+    def latest(self):
+        """Returns the newest reading without waiting (None before the first one)."""
+        return self.broker.latest
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class WavelengthBroker:
+    """Owns the wavelength meter, samples it on its own thread and publishes the
+    readings to all control loops, so the DLL traffic doesn't grow with the number of loops
+    and all loops see the same sample.
+
+    ``GetWavelength(channel)`` returns the latest sampled value, so the broker can be passed
+    to everything that expects a WavelengthMeter. Other attributes are forwarded to the meter.
+    """
+
+    def __init__(self, wlm, rate=20.0, channels=(1,), callback=False, clock=None):
+        """
+        Args:
+            wlm (WavelengthMeter): Wavelength meter
+            rate (float, optional): Samples/s. Defaults to 20.
+            channels (tuple, optional): Channels that are sampled. Defaults to (1,).
+            callback (bool, optional): Publish every measurement of the meter as it arrives
+                (WavelengthMeter.install_callback) instead of polling at ``rate``. Falls back
+                to polling if the driver doesn't support it. Defaults to False.
+            clock (optional): Time of the readings. Defaults to None (the clock of the meter).
+        """
+        self.wlm = wlm
+        self.clock = clock if clock is not None else getattr(wlm, "clock", loop_timing.system_clock)
+        self.rate = float(rate)
+        self.channels = tuple(channels)
+        self.callback = callback
+        self.mode = None  # "callback" or "poll" after start()
+        self.detector = None  # Optional ModeHopDetector, see spectrum_bad
+        self.latest = None
+        self.samples = 0
+        self.errors = 0
+
+        self._subscribers = []
+        self._condition = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Starts sampling. Returns the broker."""
+        self._stop.clear()
+        self.sample()  # GetWavelength works right away
+        if self.callback and self.wlm.install_callback(self._on_wavelength):
+            self.mode = "callback"
+            return self
+        self.mode = "poll"
+        self._thread = threading.Thread(target=self._run, name="WavelengthBroker", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        """Stops sampling and waits for the thread."""
+        self._stop.set()
+        if self.mode == "callback":
+            self.wlm.remove_callback()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def subscribe(self, queued=False, maxsize=100):
+        """Registers a consumer.
+
+        Args:
+            queued (bool, optional): True: every reading is queued (the oldest are dropped
+                when ``maxsize`` is reached). False: only the latest reading counts. Defaults to False.
+            maxsize (int, optional): Length of the queue. Defaults to 100.
+
+        Returns:
+            WavelengthSubscription
+        """
+        subscription = WavelengthSubscription(self, queued, maxsize)
+        with self._condition:
+            self._subscribers.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._condition:
+            if subscription in self._subscribers:
+                self._subscribers.remove(subscription)
+
+    def sample(self):
+        """Reads all channels once and publishes the reading."""
+        wavelengths, measured = self.wlm.read_wavelengths(self.channels)
+        return self._publish(dict(zip(self.channels, wavelengths)), dict(zip(self.channels, measured)))
+
+    def _on_wavelength(self, channel, wavelength):
+        # Callback mode: a new measurement of one channel, the other channels keep their values.
+        # The meter has just cached the value with the measurement time of the driver:
+        if channel in self.channels:
+            _, measured = self.wlm.read_wavelengths([channel], max_age=math.inf)
+            self._publish({**self.latest.wavelengths, channel: wavelength},
+                          {**self.latest.measured, channel: measured[0]})
+
+    def _publish(self, wavelengths, measured):
+        with self._condition:
+            self.latest = WavelengthReading(self.clock.time(), wavelengths, self.samples, measured)
+            self.samples += 1
+            for subscription in self._subscribers:
+                subscription._publish(self.latest)
+            self._condition.notify_all()
+        return self.latest
+
+    def wait_for(self, sequence, timeout=None):
+        """Returns the latest reading once its number is at least ``sequence``.
+
+        Raises:
+            TimeoutError: No such reading within the timeout.
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: self.latest is not None and self.latest.sequence >= sequence,
+                                            timeout):
+                raise TimeoutError("No wavelength reading")
+            return self.latest
+
+    def _run(self):
+        interval = 1 / self.rate
+        next_sample = time.monotonic() + interval
+        while not self._stop.wait(max(next_sample - time.monotonic(), 0)):
+            next_sample = max(next_sample + interval, time.monotonic())
+            try:
+                self.sample()
+            except Exception:
+                # E.g. WLM application closed; keep the last reading and try again
+                self.errors += 1
+
+    def GetWavelength(self, channel):
+        """Latest sampled wavelength [nm] of a channel. Channels that aren't sampled yet
+        are added to the sampled channels."""
+        reading = self.latest
+        if reading is None or channel not in reading.wavelengths:
+            if channel not in self.channels:
+                self.channels += (channel,)
+            reading = self.sample()
+        return reading.wavelengths[channel]
+
+    def read_wavelengths(self, channels=None, max_age=None):
+        """Wavelengths [nm] of the latest reading as an array, with the time.time() of their
+        measurement (same return value as WavelengthMeter.read_wavelengths; max_age is ignored)."""
+        reading = self.latest
+        channels = self.channels if channels is None else channels
+        if reading is None or any(channel not in reading.wavelengths for channel in channels):
+            for channel in channels:
+                self.GetWavelength(channel)
+            reading = self.latest
+        wavelengths = np.array([reading.wavelengths[channel] for channel in channels], dtype=float)
+        return wavelengths, np.array([reading.measured[channel] for channel in channels], dtype=float)
+
+    @property
+    def wavelength(self):
+        return self.GetWavelength(1)
+
+    @property
+    def spectrum_bad(self):
+        """True while the mode-hop detector (if any) considers the laser not single-mode."""
+        return self.detector is not None and self.detector.spectrum_bad
+
+    def __getattr__(self, name):
+        if name == "wlm":
+            raise AttributeError(name)
+        return getattr(self.wlm, name)
+
+
+SpectrumQuality = collections.namedtuple("SpectrumQuality",
+                                         ["timestamp", "purity", "visibility", "contrast", "bad", "sequence"])
+SpectrumQuality.__doc__ = """Score of one pattern: time.time(), purity, visibility and visibility relative to the
+single-mode reference (worst interferometer each), the spectrum_bad flag after this score and the number of the score."""
+
+
+def score_patterns(patterns, dc_bins=3, peak_bins=2, harmonics=3):
+    """Single-mode quality of fringe patterns, one row per interferometer (all rows at once).
+
+    A single-mode laser gives one periodic fringe pattern with full contrast: its spatial
+    spectrum is a single line (and its harmonics). Several modes beat, which lowers the
+    fringe visibility (modes close together) or adds lines to the spectrum (modes far apart).
+
+    Args:
+        patterns (ndarray): Pattern(s), shape (pixels,) or (interferometers, pixels).
+        dc_bins (int, optional): Lowest spatial frequencies (offset, envelope of the beam)
+            that are ignored. Defaults to 3.
+        peak_bins (int, optional): Half width [bins] of a fringe line. Defaults to 2.
+        harmonics (int, optional): Harmonics of the fringe frequency counted as the line
+            (non-sinusoidal fringes). Defaults to 3.
+
+    Returns:
+        (ndarray, ndarray): Purity (share of the spectral power in the fringe line and its
+            harmonics, 0...1) and visibility ((max - min) / (max + min) of the fringes, 0...1)
+            per interferometer
+    """
+    patterns = np.atleast_2d(np.asarray(patterns, dtype=np.float64))
+    low, high = np.percentile(patterns, [1, 99], axis=1)  # Robust against single hot pixels
+    visibility = np.where(high + low > 0, (high - low) / np.maximum(high + low, 1e-12), 0.0)
+
+    fringes = (patterns - patterns.mean(axis=1, keepdims=True)) * np.hanning(patterns.shape[1])
+    power = np.abs(np.fft.rfft(fringes, axis=1)) ** 2
+    power[:, :dc_bins] = 0
+    fundamental = np.maximum(power.argmax(axis=1), 1)[:, None]
+    bins = np.arange(power.shape[1])
+    order = np.rint(bins / fundamental)
+    line = (order >= 1) & (order <= harmonics) & (np.abs(bins - order * fundamental) <= peak_bins)
+    total = power.sum(axis=1)
+    purity = np.where(total > 0, (power * line).sum(axis=1) / np.maximum(total, 1e-300), 0.0)
+    return purity, visibility
+
+
+class ModeHopDetector:
+    """Scores the interferometer patterns of the WLM after every measurement and keeps a
+    ``spectrum_bad`` flag, so control loops can pause while the laser hops or runs multimode
+    (the wavelength alone only shows that once it leaves its range).
+
+    Two modes beat in every interferometer with a phase difference of 2 * thickness * offset / wavelength**2
+    (in periods); their fringes cancel where it's near half a period and add up where it's near a whole one.
+    A single interferometer therefore misses side modes at some offsets, interferometers of different
+    thicknesses don't miss them all at once. The visibility of every interferometer is compared with the
+    best one it showed so far (the single-mode reference).
+
+    The flag is set by the first bad score and cleared after ``good_after`` good scores in a row.
+    """
+
+    def __init__(self, wlm, channel=1, index=cSignal1Interferometers, interferometers=None, rate=20.0,
+                 min_purity=0.6, min_visibility=0.4, min_contrast=0.9, good_after=3):
+        """
+        Args:
+            wlm (WavelengthMeter or WavelengthBroker): Wavelength meter. With a broker the patterns
+                are scored after every reading of the broker, i.e. at the update rate of the meter
+                in callback mode; the broker's spectrum_bad follows the detector.
+            channel (int, optional): Switcher channel of the laser. Defaults to 1.
+            index (int, optional): Pattern array, see WavelengthMeter.read_pattern.
+                Defaults to cSignal1Interferometers.
+            interferometers (int, optional): Patterns of this many interferometers follow each other
+                in the array; all of them are scored. Defaults to None (WavelengthMeter.interferometers).
+            rate (float, optional): Scores/s without a broker. Defaults to 20.
+            min_purity (float, optional): Lower limit of the purity of a good spectrum. Defaults to 0.6.
+            min_visibility (float, optional): Lower limit of the fringe visibility of a good spectrum.
+                Defaults to 0.4.
+            min_contrast (float, optional): Lower limit of the visibility relative to the single-mode
+                reference of the interferometer. Defaults to 0.9.
+            good_after (int, optional): Good scores in a row that clear the flag. Defaults to 3.
+        """
+        self.broker = wlm if isinstance(wlm, WavelengthBroker) else None
+        self.wlm = self.broker.wlm if self.broker is not None else wlm
+        self.channel = channel
+        self.index = index
+        self.interferometers = int(self.wlm.interferometers if interferometers is None else interferometers)
+        self.rate = float(rate)
+        self.min_purity = min_purity
+        self.min_visibility = min_visibility
+        self.min_contrast = min_contrast
+        self.reference = None  # Best visibility of every interferometer so far (single-mode)
+        self.good_after = int(good_after)
+
+        self.spectrum_bad = False
+        self.latest = None   # Last SpectrumQuality
+        self.scores = 0
+        self.errors = 0
+        self.good = threading.Event()  # Set while the spectrum is good, see wait_good
+        self.good.set()
+        self._good_in_row = 0
+        self._handlers = []
+        self._stop = threading.Event()
+        self._thread = None
+        if self.broker is not None:
+            self.broker.detector = self
+
+    def add_handler(self, handler):
+        """handler(bad, quality) is called (from the detector thread) whenever the flag changes."""
+        self._handlers.append(handler)
+
+    def reset_reference(self):
+        """Forgets the single-mode visibilities, e.g. after the WLM was adjusted."""
+        self.reference = None
+
+    def score(self, pattern, timestamp=None):
+        """Scores a pattern array and updates the flag.
+
+        Returns:
+            SpectrumQuality
+        """
+        pattern = np.asarray(pattern)
+        pattern = pattern[:pattern.size - pattern.size % self.interferometers].reshape(self.interferometers, -1)
+        purity, visibility = score_patterns(pattern)
+        self.reference = visibility if self.reference is None else np.maximum(self.reference, visibility)
+        contrast = float(np.min(visibility / np.maximum(self.reference, 1e-12)))
+        purity, visibility = float(purity.min()), float(visibility.min())
+        bad = purity < self.min_purity or visibility < self.min_visibility or contrast < self.min_contrast
+
+        changed = False
+        if bad:
+            self._good_in_row = 0
+            changed = not self.spectrum_bad
+            self.spectrum_bad = True
+            self.good.clear()
+        elif self.spectrum_bad:
+            self._good_in_row += 1
+            if self._good_in_row >= self.good_after:
+                changed = True
+                self.spectrum_bad = False
+                self.good.set()
+
+        self.latest = SpectrumQuality(self.wlm.clock.time() if timestamp is None else timestamp, purity, visibility,
+                                      contrast, self.spectrum_bad, self.scores)
+        self.scores += 1
+        if changed:
+            for handler in self._handlers:
+                handler(self.spectrum_bad, self.latest)
+        return self.latest
+
+    def update(self):
+        """Reads the pattern of the last measurement and scores it (None without a pattern)."""
+        pattern = self.wlm.read_pattern(self.channel, self.index)
+        return self.score(pattern) if pattern is not None else None
+
+    def wait_good(self, timeout=None):
+        """Waits until the spectrum is good. Returns False after the timeout."""
+        return self.good.wait(timeout)
+
+    def start(self):
+        """Enables the pattern export of the WLM and starts scoring. Returns the detector."""
+        self.wlm.enable_pattern(self.index)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="ModeHopDetector", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        subscription = self.broker.subscribe() if self.broker is not None else None
+        interval = 1 / self.rate
+        next_score = time.monotonic()
+        try:
+            while not self._stop.is_set():
+                if subscription is not None:
+                    try:
+                        subscription.get(timeout=0.5)  # Score every new measurement once
+                    except TimeoutError:
+                        continue
+                elif self._stop.wait(max(next_score - time.monotonic(), 0)):
+                    break
+                else:
+                    next_score = max(next_score + interval, time.monotonic())
+                try:
+                    self.update()
+                except Exception:
+                    self.errors += 1
+        finally:
+            if subscription is not None:
+                subscription.close()
+
+
 """if __name__ == '__main__':
 
     # command line arguments parsing
@@ -0,0 +1,250 @@
+"""
+Stand-in for the wlmData library of the HighFinesse wavelength meter, so
+WLM_functions can run without the meter and without Windows:
+
+    wlm = WLM_functions.WavelengthMeter(dll=WLM_simulation.SimulatedWlmData())
+
+The simulated meter measures at ``update_rate`` on its own thread. Installed
+callbacks (Instantiate with cNotifyInstallCallback) are called from that
+thread, like the driver does. The fringe patterns (GetPatternDataNum) of the
+Fizeau interferometers are computed from the modes of the laser, see set_multimode.
+The wavelength of a channel can follow a simulated laser (DFB_simulation.DfbModel),
+and the meter can run on the clock of the simulation (faster than real time).
+"""
+
+import ctypes
+import threading
+import time
+import numpy as np
+import WLM_functions
+
+speed_of_light = 299792458.0  # m/s
+
+
+def _value(arg):
+    # The library is called with ctypes objects (c_long(1)) or plain numbers
+    return getattr(arg, "value", arg)
+
+
+class _Export:
+    """Function of the library. Like ctypes functions it has restype and argtypes
+    (which are ignored). Counts its calls."""
+
+    def __init__(self, function):
+        self.function = function
+        self.restype = None
+        self.argtypes = None
+        self.calls = 0
+
+    def __call__(self, *args):
+        self.calls += 1
+        return self.function(*map(_value, args))
+
+
+class SimulatedWlmData:
+    """Simulated wlmData library: wavelengths with a slow drift and noise."""
+
+    def __init__(self, wavelengths=None, update_rate=50.0, noise=2e-6, drift=1e-5, seed=None,
+                 pattern_pixels=1024, fringe_period=20.0, thicknesses=(10e-3, 3.3e-3, 1.1e-3, 0.36e-3, 0.12e-3),
+                 lasers=None, clock=None):
+        """
+        Args:
+            wavelengths (dict, optional): {channel: wavelength [nm]} at the start.
+                Defaults to None ({1: 1030.0}).
+            update_rate (float, optional): Measurements/s. Defaults to 50.
+            noise (float, optional): Standard deviation [nm] of a measurement. Defaults to 2e-6.
+            drift (float, optional): Random walk [nm/sqrt(s)] of the wavelengths. Defaults to 1e-5.
+            seed (int, optional): Seed of the random numbers. Defaults to None.
+            pattern_pixels (int, optional): Pixels of the pattern of one interferometer. Defaults to 1024.
+            fringe_period (float, optional): Fringe period [pixels] of the main mode. Defaults to 20.
+            thicknesses (tuple, optional): Thicknesses [m] of the Fizeau interferometers, they set the
+                phase difference between modes. The patterns of all interferometers follow each other
+                in the pattern array. Defaults to 10, 3.3, 1.1, 0.36 and 0.12 mm.
+            lasers (dict, optional): {channel: laser} whose wavelength(timestamp) [nm] is measured
+                instead of the random walk, e.g. DFB_simulation.DfbModel. Defaults to None.
+            clock (optional): Time of the simulation with time() and speed, e.g.
+                DFB_simulation.SimulationClock; update_rate counts in its time. Defaults to None (real time).
+        """
+        self.lasers = dict(lasers or {})
+        self.clock = clock
+        self.wavelengths = dict(wavelengths or {1: 1030.0})  # True wavelengths
+        for channel, laser in self.lasers.items():
+            self.wavelengths[channel] = laser.wavelength()
+        self.measured = dict(self.wavelengths)                # Last measured values
+        self.update_rate = float(update_rate)
+        self.noise = noise
+        self.drift = drift
+        self.switcher_mode = 1 if len(self.wavelengths) > 1 else 0
+        self.exposure_mode = 1
+        self.measurements = 0
+        self.modes = {}  # {channel: [(offset [nm], weight), ...]} of the side modes
+        self.pattern_pixels = int(pattern_pixels)
+        self.fringe_period = fringe_period
+        self.thicknesses = tuple(thicknesses)
+        self.pattern_enabled = set()
+
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+        self._callback = None
+        self._started = time.monotonic()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.GetWavelengthNum = _Export(self._get_wavelength)
+        self.GetFrequencyNum = _Export(self._get_frequency)
+        self.GetSwitcherMode = _Export(lambda _: self.switcher_mode)
+        self.SetSwitcherMode = _Export(self._set_switcher_mode)
+        self.GetExposureMode = _Export(lambda _: self.exposure_mode)
+        self.SetExposureMode = _Export(self._set_exposure_mode)
+        self.GetSwitcherSignalStates = _Export(self._get_switcher_signal_states)
+        self.Instantiate = _Export(self._instantiate)
+        self.SetPattern = _Export(self._set_pattern)
+        self.GetPatternItemCount = _Export(lambda index: self.pattern_size if index in self.pattern_enabled else 0)
+        self.GetPatternItemSize = _Export(lambda index: 2 if index in self.pattern_enabled else 0)
+        self.GetPatternDataNum = _Export(self._get_pattern_data)
+
+    def set_wavelength(self, channel, wavelength):
+        """Changes the true wavelength [nm] of a channel, e.g. a laser step."""
+        with self._lock:
+            self.wavelengths[channel] = wavelength
+
+    def set_multimode(self, channel, offset=0.05, weight=1.0):
+        """Adds a side mode at ``offset`` [nm] from the main mode with the relative power ``weight``
+        (e.g. a mode hop in progress); weight 0 makes the channel single-mode again."""
+        with self._lock:
+            if weight:
+                self.modes.setdefault(channel, []).append((offset, weight))
+            else:
+                self.modes.pop(channel, None)
+
+    @property
+    def interferometers(self):
+        """Number of Fizeau interferometers in the pattern array."""
+        return len(self.thicknesses)
+
+    @property
+    def pattern_size(self):
+        """Items of the pattern array (all interferometers)."""
+        return self.pattern_pixels * self.interferometers
+
+    def pattern(self, channel):
+        """Fringe patterns (int16 counts) of the last measurement of a channel, the interferometers
+        one after the other."""
+        with self._lock:
+            wavelength = self.measured.get(channel, 0.0)
+            modes = [(0.0, 1.0)] + self.modes.get(channel, [])
+        x = np.arange(self.pattern_pixels)
+        thickness = np.asarray(self.thicknesses)[:, None]
+        fringes = np.zeros((self.interferometers, self.pattern_pixels))
+        for offset, weight in modes:
+            mode = wavelength + offset
+            if wavelength > 0:
+                # The fringe period of a wedge grows with the wavelength, the phase is 2 * thickness / wavelength
+                period = self.fringe_period * mode / wavelength
+                phase = 2 * thickness / (mode * 1e-9)
+            else:
+                period, phase = self.fringe_period, 0.0
+            fringes += weight * np.cos(2 * np.pi * (x / period + phase))
+        fringes /= sum(weight for _, weight in modes)
+        envelope = np.exp(-((x - x.mean()) / (0.6 * x.size)) ** 2)  # Beam profile
+        counts = envelope * (1200 + 1000 * fringes) + 20 * self._rng.standard_normal(fringes.shape)
+        return np.clip(counts, 0, 4095).astype(np.int16).ravel()
+
+    def measure(self):
+        """One measurement of all channels; calls the installed callback."""
+        with self._lock:
+            dt = 1 / self.update_rate
+            now = self.clock.time() if self.clock is not None else time.time()
+            for channel in self.wavelengths:
+                if channel in self.lasers:
+                    self.wavelengths[channel] = self.lasers[channel].wavelength(now)
+                else:
+                    self.wavelengths[channel] += self.drift * np.sqrt(dt) * self._rng.standard_normal()
+                self.measured[channel] = self.wavelengths[channel] + self.noise * self._rng.standard_normal()
+            self.measurements += 1
+            measured = dict(self.measured)
+            callback = self._callback
+        if callback is not None:
+            timestamp = int((time.monotonic() - self._started) * 1e3 * self.speed)
+            for mode, channel in WLM_functions.cmiWavelengths.items():
+                if channel in measured:
+                    callback(mode, timestamp, measured[channel])
+
+    def start(self):
+        """Starts measuring on a background thread. Returns the library."""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="SimulatedWlm", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    @property
+    def speed(self):
+        """Simulation time per real time."""
+        return self.clock.speed if self.clock is not None else 1.0
+
+    def _run(self):
+        interval = 1 / (self.update_rate * self.speed)
+        next_measurement = time.monotonic()
+        while not self._stop.wait(max(next_measurement - time.monotonic(), 0)):
+            next_measurement += interval
+            self.measure()
+
+    def _get_wavelength(self, channel, default):
+        self.start()
+        with self._lock:
+            return self.measured.get(channel, 0.0)
+
+    def _get_frequency(self, channel, default):
+        wavelength = self._get_wavelength(channel, default)
+        return speed_of_light / wavelength / 1e3 if wavelength > 0 else 0.0  # THz
+
+    def _set_switcher_mode(self, mode):
+        self.switcher_mode = mode
+        return 0
+
+    def _set_exposure_mode(self, mode):
+        self.exposure_mode = int(bool(mode))
+        return 0
+
+    def _get_switcher_signal_states(self, signal, use, show):
+        # use and show are ctypes.byref() pointers to longs
+        use._obj.value = show._obj.value = int(signal in self.wavelengths)
+        return 0
+
+    def _set_pattern(self, index, enable):
+        if enable:
+            self.pattern_enabled.add(index)
+        else:
+            self.pattern_enabled.discard(index)
+        return 0
+
+    def _get_pattern_data(self, channel, index, address):
+        if index not in self.pattern_enabled:
+            return 0
+        self.start()
+        # address points to an int16 array of GetPatternItemCount items, like in the C interface:
+        target = np.ctypeslib.as_array((ctypes.c_int16 * self.pattern_size).from_address(address))
+        target[:] = self.pattern(channel)
+        return 1
+
+    def _instantiate(self, rfc, mode, p1, p2):
+        if rfc != WLM_functions.cInstNotification:
+            return 1
+        if mode == WLM_functions.cNotifyInstallCallback:
+            # p1 is the address of the callback, like in the C interface:
+            with self._lock:
+                self._callback = WLM_functions.CallbackProc(p1)
+            self.start()
+            return 1
+        if mode == WLM_functions.cNotifyRemoveCallback:
+            with self._lock:
+                self._callback = None
+            return 1
+        return 0
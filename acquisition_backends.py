@@ -0,0 +1,286 @@
+"""Acquisition backends for the Red Pitaya inputs.
+
+All backends answer the same questions, so the BBO workers don't need to know how
+the samples are transferred:
+
+    backend = make_backend({"backend": "scpi_binary"}, client=rp)
+    backend.setup(window=24e-6)
+    uv_power = backend.read_mean(1, 24e-6)
+
+Backends: "scpi_ascii" and "scpi_binary" (redpitaya_scpi client or RedPitayaSession),
+"pyrpl" (FPGA scope of PyRPL, optional dependency), "stream" (ring buffer of a
+RedPitayaStream) and "fake" (in-memory, no hardware).
+"""
+
+import abc
+import time
+import numpy as np
+import redpitaya_scpi as scpi
+
+try:
+    from pyrpl import Pyrpl
+except ImportError:
+    Pyrpl = None
+
+
+class AcquisitionBackend(abc.ABC):
+    """Interface of the acquisition backends. Samples are in Volts."""
+    name = None
+    sample_rate = scpi.scpi.sample_rate  # Samples/s of the samples returned by read()
+    _event = None                        # (chan, level, edge) of the armed event
+
+    def setup(self, window=None, dec=None):
+        """Prepares continuous acquisition.
+
+        Args:
+            window (float, optional): Typical integration time [s] of ``read_mean``. If given,
+                decimation and averaging are chosen so a few samples span it. Defaults to None.
+            dec (int, optional): Decimation, e.g. 1 for raw traces at full sample rate, if no
+                window is given. Defaults to None (the decimation is kept).
+        """
+
+    @abc.abstractmethod
+    def read(self, chan, num_samples):
+        """Returns the latest ``num_samples`` samples of an input as a numpy array."""
+
+    def samples_for(self, window):
+        """Number of samples that span ``window`` [s] at the current sample rate."""
+        return int(np.clip(round(window * self.sample_rate), 1, scpi.scpi.buff_size))
+
+    def read_mean(self, chan, window):
+        """Returns the mean voltage of an input over the latest ``window`` [s]."""
+        return float(np.mean(self.read(chan, self.samples_for(window))))
+
+    def arm_event(self, chan, level, edge="NE"):
+        """Watches an input for crossing ``level`` (edge "NE": falling below, "PE": rising above)."""
+        self._event = (chan, level, edge.upper())
+
+    def event_fired(self):
+        """True if the armed event happened. Arm again with ``arm_event`` afterwards."""
+        if self._event is None:
+            return False
+        chan, level, edge = self._event
+        return self._crossed(self.read(chan, scpi.scpi.buff_size))
+
+    def disarm_event(self):
+        """Stops watching for the armed event."""
+        self._event = None
+
+    def _crossed(self, data):
+        chan, level, edge = self._event
+        return bool(np.min(data) < level) if edge == "NE" else bool(np.max(data) > level)
+
+    def read_with_event(self, chan, num_samples):
+        """Returns ``read(chan, num_samples)`` and ``event_fired()``, in one device access
+        where the backend allows it."""
+        return self.read(chan, num_samples), self.event_fired()
+
+    def read_power(self, chan, window):
+        """Returns ``read_mean(chan, window)`` and ``event_fired()``, in one device access
+        where the backend allows it."""
+        trace, fired = self.read_with_event(chan, self.samples_for(window))
+        return float(np.mean(trace)), fired
+
+    def close(self):
+        """Releases the resources of the backend (not the client it was given)."""
+
+
+class ScpiBackend(AcquisitionBackend):
+    """Reads the latest samples with 'ACQ:SOURx:DATA:LAT:N?'. Events use the hardware trigger."""
+    binary = False
+
+    def __init__(self, client, post=64):
+        """
+        Args:
+            client (scpi): redpitaya_scpi client or RedPitayaSession.
+            post (int, optional): Samples acquired after an event before the acquisition stops. Defaults to 64.
+        """
+        self.client = client
+        self.post = post
+
+    def setup(self, window=None, dec=None):
+        if window is not None:
+            self.client.acq_set_power_reading(window)
+        with self.client.transaction() as t:
+            if window is None and dec is not None:
+                t.set(f"ACQ:DEC {dec}")
+            t.set(f"ACQ:DATA:FORMAT {'BIN' if self.binary else 'ASCII'}")
+            t.set("ACQ:DATA:UNITS VOLTS")
+            t.tx_txt("ACQ:START")
+        self.sample_rate = scpi.scpi.sample_rate / int(self.client.get_setting("ACQ:DEC"))
+
+    def _query(self, t, chan, num_samples):
+        if self.binary:
+            t.query(scpi.scpi._acq_data_query(chan, lat=True, num_samples=num_samples), scpi.scpi.rx_arb)
+        else:
+            t.acq_data_array(chan, lat=True, num_samples=num_samples)
+
+    def _decode(self, reply):
+        if self.binary:
+            return np.frombuffer(reply, dtype=scpi.scpi.bin_dtypes["VOLTS"]).astype(np.float32)
+        return reply
+
+    def read(self, chan, num_samples):
+        with self.client.transaction() as t:
+            self._query(t, chan, num_samples)
+        return self._decode(t.replies[0])
+
+    def arm_event(self, chan, level, edge="NE"):
+        super().arm_event(chan, level, edge)
+        self.client.acq_trigger_arm(chan, level, edge, post=self.post)
+
+    def event_fired(self):
+        return self._event is not None and self.client.txrx_txt("ACQ:TRIG:STAT?").strip() == "TD"
+
+    def disarm_event(self):
+        # A fired trigger stops the acquisition, disarming restarts it:
+        super().disarm_event()
+        self.client.acq_trigger_disarm()
+
+    def read_with_event(self, chan, num_samples):
+        # Samples and the trigger state in one round trip:
+        with self.client.transaction() as t:
+            self._query(t, chan, num_samples)
+            if self._event is not None:
+                t.query("ACQ:TRIG:STAT?")
+        fired = self._event is not None and t.replies[1].strip() == "TD"
+        return self._decode(t.replies[0]), fired
+
+
+class ScpiAsciiBackend(ScpiBackend):
+    """SCPI with 'ACQ:DATA:FORMAT ASCII'."""
+    name = "scpi_ascii"
+
+
+class ScpiBinaryBackend(ScpiBackend):
+    """SCPI with 'ACQ:DATA:FORMAT BIN' (float32 blocks)."""
+    name = "scpi_binary"
+    binary = True
+
+
+class PyrplBackend(AcquisitionBackend):
+    """Reads the FPGA scope of PyRPL (see Test.py). PyRPL loads its own FPGA image, so the
+    SCPI server (and with it the generator presets) can't be used at the same time."""
+    name = "pyrpl"
+
+    def __init__(self, host, config="pulsedlaser_acquisition"):
+        """
+        Args:
+            host (str): IP address of the Red Pitaya.
+            config (str, optional): Name of the PyRPL config file. Defaults to "pulsedlaser_acquisition".
+        """
+        if Pyrpl is None:
+            raise ImportError("The pyrpl backend needs PyRPL (pip install pyrpl)")
+        self.pyrpl = Pyrpl(config=config, hostname=host, gui=False)
+        self.scope = self.pyrpl.rp.scope
+        self.scope.input1 = "in1"
+        self.scope.input2 = "in2"
+        self.scope.trigger_source = "immediately"
+
+    def setup(self, window=None, dec=None):
+        if window is not None:
+            self.scope.decimation, _ = scpi.scpi.power_reading_settings(window)
+            self.scope.average = True
+        elif dec is not None:
+            self.scope.decimation = dec
+        self.sample_rate = scpi.scpi.sample_rate / self.scope.decimation
+
+    def read(self, chan, num_samples):
+        return np.asarray(self.scope.single()[chan - 1][-num_samples:])
+
+    def read_with_event(self, chan, num_samples):
+        # Both inputs come from one scope acquisition:
+        curves = self.scope.single()
+        fired = self._event is not None and self._crossed(curves[self._event[0] - 1])
+        return np.asarray(curves[chan - 1][-num_samples:]), fired
+
+
+class StreamBackend(AcquisitionBackend):
+    """Reads the ring buffer of a running RedPitayaStream, without device round trips.
+    Events are found in all samples streamed since they were armed."""
+    name = "stream"
+
+    def __init__(self, stream):
+        """
+        Args:
+            stream (RedPitayaStream): Started stream.
+        """
+        self.stream = stream
+        self._cursor = stream.buffer.total
+
+    @property
+    def sample_rate(self):
+        return self.stream.sample_rate
+
+    def read(self, chan, num_samples):
+        return self.stream.buffer.latest(num_samples)[self.stream.chans.index(chan)]
+
+    def arm_event(self, chan, level, edge="NE"):
+        super().arm_event(chan, level, edge)
+        self._cursor = self.stream.buffer.total
+
+    def event_fired(self):
+        if self._event is None:
+            return False
+        data, self._cursor = self.stream.buffer.read_since(self._cursor)
+        data = data[self.stream.chans.index(self._event[0])]
+        return data.size > 0 and self._crossed(data)
+
+
+class FakeBackend(AcquisitionBackend):
+    """In-memory backend for tests and for running the GUI without a Red Pitaya."""
+    name = "fake"
+
+    def __init__(self, signal=None, noise=0.005, seed=None):
+        """
+        Args:
+            signal (callable, optional): signal(chan, t) returns the voltages of an input at
+                the times t [s]. Defaults to None (0.1 V on input 1, 0 V on input 2).
+            noise (float, optional): Standard deviation [V] of the added noise. Defaults to 0.005.
+            seed (int, optional): Seed of the noise generator. Defaults to None.
+        """
+        self.signal = signal or (lambda chan, t: np.full(t.shape, 0.1 if chan == 1 else 0.0))
+        self.noise = noise
+        self._rng = np.random.default_rng(seed)
+        self._start = time.perf_counter()
+
+    def setup(self, window=None, dec=None):
+        if window is not None:
+            dec, _ = scpi.scpi.power_reading_settings(window)
+        if dec is not None:
+            self.sample_rate = scpi.scpi.sample_rate / dec
+
+    def read(self, chan, num_samples):
+        now = time.perf_counter() - self._start
+        t = now - np.arange(num_samples)[::-1] / self.sample_rate
+        data = self.signal(chan, t) + self._rng.normal(0, self.noise, num_samples)
+        return data.astype(np.float32)
+
+
+backends = {backend.name: backend for backend in
+            (ScpiAsciiBackend, ScpiBinaryBackend, PyrplBackend, StreamBackend, FakeBackend)}
+
+
+def make_backend(config, client=None, host=None, stream=None):
+    """Creates the backend selected in a config.
+
+    Args:
+        config (dict): {"backend": name, ...}, further items are passed to the backend.
+        client (scpi, optional): Client of the SCPI backends. Defaults to None.
+        host (str, optional): IP address for the pyrpl backend. Defaults to None.
+        stream (RedPitayaStream, optional): Stream of the stream backend. Defaults to None.
+
+    Raises:
+        ValueError: Unknown backend name.
+    """
+    options = {key: value for key, value in config.items() if key != "backend"}
+    name = config["backend"]
+    if name not in backends:
+        raise ValueError(f"Unknown acquisition backend '{name}', choose one of {list(backends)}")
+    if name in ("scpi_ascii", "scpi_binary"):
+        return backends[name](client, **options)
+    if name == "pyrpl":
+        return PyrplBackend(host, **options)
+    if name == "stream":
+        return StreamBackend(stream)
+    return FakeBackend(**options)
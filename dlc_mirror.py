@@ -0,0 +1,130 @@
+"""Local mirror of DLC pro parameters.
+
+The mirror subscribes to the parameters (toptica lasersdk subscriptions), so
+the DLC pro sends new values on its own. Reading a mirrored value costs no
+network round trip:
+
+    mirror = DlcParameterMirror(dlc, ["laser1.dl.tc.temp_act", "laser1.wide_scan.state"]).start()
+    mirror.add_handler(lambda changed: print(changed))
+    mirror.poll()                        # Regularly, e.g. from a QTimer
+    mirror.get("laser1.dl.tc.temp_act")
+
+With the synchronous lasersdk client the subscription callbacks only run
+inside ``dlc.poll()``, i.e. in ``mirror.poll()``, so values and handlers are
+updated on the thread that polls (the GUI thread for a QTimer). The client isn't
+thread-safe: other threads that talk to the DLC pro hold ``mirror.lock``
+(``set`` and ``refresh`` do).
+"""
+
+import functools
+import threading
+import time
+
+
+class DlcParameterMirror:
+    """Latest values of subscribed DLC pro parameters."""
+
+    def __init__(self, dlc, names):
+        """
+        Args:
+            dlc (DLCpro): Open connection to the DLC pro (or DFB_simulation.SimulatedDLCpro)
+            names (list): Parameters as paths from the DLC pro, e.g. "laser1.dl.tc.temp_set"
+        """
+        self.dlc = dlc
+        self.names = list(names)
+        self.values = {}       # {name: latest value}
+        self.timestamps = {}   # {name: time.time() of the latest value}
+        self.errors = {}       # {name: last error reported by a subscription}
+        self.updates = 0
+        self.lock = threading.RLock()  # Held during every call to the DLC pro
+        self._subscriptions = []
+        self._handlers = []
+        self._changed = set()
+
+    def parameter(self, name):
+        """The lasersdk parameter object of a path."""
+        return functools.reduce(getattr, name.split("."), self.dlc)
+
+    def start(self):
+        """Reads all parameters once and subscribes to them. Returns the mirror.
+
+        Raises:
+            DecopError, UnavailableError: Reading or subscribing failed; the subscriptions
+                made so far are cancelled.
+        """
+        try:
+            self.refresh()
+            with self.lock:
+                for name in self.names:
+                    self._subscriptions.append(self.parameter(name).subscribe(self._callback(name)))
+        except Exception:
+            self.stop()
+            raise
+        return self
+
+    def stop(self):
+        """Cancels the subscriptions; the last values stay readable."""
+        with self.lock:
+            for subscription in self._subscriptions:
+                subscription.cancel()
+            self._subscriptions = []
+
+    def _callback(self, name):
+        def callback(subscription, timestamp, value):
+            try:
+                value = value.get()  # Raises the error of the DLC pro, if any
+            except Exception as e:
+                self.errors[name] = e
+                return
+            self._store(name, value)
+        return callback
+
+    def _store(self, name, value):
+        if self.values.get(name) != value or name not in self.values:
+            self._changed.add(name)
+        self.values[name] = value
+        self.timestamps[name] = time.time()
+        self.updates += 1
+
+    def refresh(self, *names):
+        """Reads parameters (default: all) from the DLC pro, e.g. right after starting an action."""
+        with self.lock:
+            for name in names or self.names:
+                self._store(name, self.parameter(name).get())
+
+    def get(self, name):
+        """Latest value of a mirrored parameter.
+
+        Raises:
+            KeyError: The parameter isn't mirrored.
+        """
+        return self.values[name]
+
+    def set(self, name, value):
+        """Sets a parameter on the DLC pro and in the mirror (without waiting for its update)."""
+        with self.lock:
+            self.parameter(name).set(value)
+            if name in self.names:
+                self._store(name, value)
+
+    def add_handler(self, handler):
+        """handler(changed) is called from poll() with the set of the parameters that changed."""
+        self._handlers.append(handler)
+
+    def remove_handler(self, handler):
+        if handler in self._handlers:
+            self._handlers.remove(handler)
+
+    def poll(self):
+        """Processes the updates sent by the DLC pro and calls the handlers.
+
+        Returns:
+            set: Names of the parameters that changed since the last poll
+        """
+        with self.lock:
+            self.dlc.poll()
+            changed, self._changed = self._changed, set()
+        if changed:
+            for handler in list(self._handlers):
+                handler(changed)
+        return changed
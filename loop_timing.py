@@ -0,0 +1,136 @@
+"""Timing statistics of a periodic control loop.
+
+The loop reports when each iteration was due, when it started and when it
+ended (time.monotonic()); the statistics cover the whole run:
+
+    timing = LoopTiming(period=0.1)
+    timing.record(due, started, ended)
+    timing.as_dict()["jitter"]
+
+latency: start of an iteration after it was due, jitter: standard deviation of
+the measured periods, overrun: an iteration ended after the next one was due.
+
+The loops read the time from a clock: ``system_clock`` (real time) or the
+DFB_simulation.SimulationClock, which runs faster than real time.
+"""
+
+import math
+import time
+
+
+class SystemClock:
+    """Real time, with the interface of DFB_simulation.SimulationClock."""
+    speed = 1.0  # Clock time per real time
+
+    @staticmethod
+    def time():
+        return time.time()
+
+    @staticmethod
+    def monotonic():
+        return time.monotonic()
+
+    @staticmethod
+    def sleep(seconds):
+        time.sleep(seconds)
+
+
+system_clock = SystemClock()
+
+
+class _RunningStats:
+    """Mean, standard deviation and maximum (Welford); nan without values."""
+
+    def __init__(self):
+        self.n = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self.max = math.nan
+        self.last = math.nan
+
+    def add(self, value):
+        self.n += 1
+        delta = value - self._mean
+        self._mean += delta / self.n
+        self._m2 += delta * (value - self._mean)
+        self.max = value if self.n == 1 else max(self.max, value)
+        self.last = value
+
+    @property
+    def mean(self):
+        return self._mean if self.n else math.nan
+
+    @property
+    def std(self):
+        return math.sqrt(self._m2 / self.n) if self.n else math.nan
+
+
+def format_stats(stats):
+    """One line for the log from LoopTiming.as_dict(); "n/a" for values that need more iterations."""
+    def ms(value):
+        return "n/a" if math.isnan(value) else f"{value * 1e3:.2f} ms"
+    return (f"{stats['iterations']} iterations, latency {ms(stats['latency_mean'])} "
+            f"(max. {ms(stats['latency_max'])}), jitter {ms(stats['jitter'])}, "
+            f"duration {ms(stats['duration_mean'])} (max. {ms(stats['duration_max'])}), "
+            f"{stats['overruns']} overruns")
+
+
+class LoopTiming:
+    """Latency, jitter, duration and overruns of a periodic loop."""
+
+    def __init__(self, period):
+        """
+        Args:
+            period (float): Nominal period [s] of the loop
+        """
+        self.period = period
+        self.reset()
+
+    def reset(self):
+        self.iterations = 0
+        self.overruns = 0   # Iterations that ended after the next one was due
+        self.skipped = 0    # Due times that passed without an iteration (after overruns)
+        self.latency = _RunningStats()
+        self.duration = _RunningStats()
+        self.interval = _RunningStats()  # Measured periods between the starts of the iterations
+        self._last_start = None
+
+    def record(self, due, started, ended):
+        """Adds an iteration (time.monotonic() values).
+
+        Returns:
+            float: When the next iteration is due. After an overrun the missed due times are
+                skipped (no burst of iterations to catch up).
+        """
+        self.iterations += 1
+        self.latency.add(started - due)
+        self.duration.add(ended - started)
+        if self._last_start is not None:
+            self.interval.add(started - self._last_start)
+        self._last_start = started
+
+        next_due = due + self.period
+        if ended > next_due:
+            self.overruns += 1
+            missed = math.floor((ended - next_due) / self.period)
+            self.skipped += missed
+            next_due += (missed + 1) * self.period
+        return next_due
+
+    def as_dict(self):
+        """Statistics in seconds; nan before the first iteration (jitter: before two periods)."""
+        return {
+            "iterations": self.iterations,
+            "overruns": self.overruns,
+            "skipped": self.skipped,
+            "latency_mean": self.latency.mean,
+            "latency_max": self.latency.max,
+            "duration_mean": self.duration.mean,
+            "duration_max": self.duration.max,
+            "period_mean": self.interval.mean,
+            "jitter": self.interval.std if self.interval.n >= 2 else math.nan,
+        }
+
+    def summary(self):
+        """One line for the log (see format_stats)."""
+        return format_stats(self.as_dict())
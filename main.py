@@ -1,9 +1,11 @@
 from PyQt6 import QtWidgets
+import argparse
 import sys
 import pyvisa
 import GUI
 import DFB_functions
 import WLM_functions
+import DFB_simulation
 import LBO_functions
 import BBO_functions
 import ASE_functions
@@ -12,14 +14,36 @@ import Powermeter_functions
 
 
 app = QtWidgets.QApplication(sys.argv)
+# "python main.py --simulate [--speed 10]": simulated DFB, DLC pro and WLM instead of the devices
+# (DFB_simulation), the simulation runs ``speed`` times faster than real time
+parser = argparse.ArgumentParser()
+parser.add_argument("--simulate", action="store_true")
+parser.add_argument("--speed", type=float, default=1.0)
+args, _ = parser.parse_known_args(app.arguments()[1:])
+simulate = args.simulate
+if simulate:
+    clock, _, simulated_dlc, meter = DFB_simulation.simulated_setup(speed=args.speed, seed=0)
+else:
+    meter = WLM_functions.WavelengthMeter(debug=False)
+# The broker samples the WLM once for all control loops (LBO, ASE, DFB, BBO), with the
+# driver callbacks if available, otherwise by polling at 20 Hz:
+wlm = WLM_functions.WavelengthBroker(meter, rate=20, callback=True).start()
+app.aboutToQuit.connect(wlm.stop)
+# Scores the interferometer patterns after every measurement; wlm.spectrum_bad pauses the DFB stabilisation:
+mode_hop_detector = WLM_functions.ModeHopDetector(wlm).start()
+app.aboutToQuit.connect(mode_hop_detector.stop)
 # wlm = HighFinesse.WLM(dll_path="C:\Windows\System32\wlmData.dll", autostart=False)
 # wlm = WLM_functions.WavelengthMeter(debug=False)
 # TODO: Was soll passieren wenn gar kein WLM angeschlossen ist?
 # TODO: pylablib für WLM benutzen
+dfb = DFB_functions.DFB()
+if simulate:
+    dfb.dlc_factory = lambda ip: simulated_dlc
+    dfb.clock = clock
 window = GUI.MainWindow(
     rm=pyvisa.ResourceManager(),
-    wlm=WLM_functions.WavelengthMeter(debug=False),
-    dfb=DFB_functions.DFB(),
+    wlm=wlm,
+    dfb=dfb,
     lbo=LBO_functions.LBO(),
     bbo=BBO_functions.BBO(axis=1, addrFront=2, addrBack=1),
     ase=ASE_functions.ASE(),
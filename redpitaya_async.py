@@ -0,0 +1,192 @@
+"""asyncio access to Red Pitaya.
+
+Counterpart of ``redpitaya_scpi.scpi`` built on ``asyncio.open_connection``.
+Queries are pipelined: several of them can be in flight on one connection and
+the replies are handed to the callers in the order the queries were sent.
+The measurement, the extraction watching and the pulse generation of one or
+more boards can therefore run as coroutines on one event loop, e.g.
+
+    async with AsyncScpi(ip) as rp:
+        uv, extraction = await asyncio.gather(
+            rp.acq_data(1, start=1, num_samples=3000),
+            rp.acq_data(2, start=1, num_samples=100))
+"""
+
+import asyncio
+import numpy as np
+import redpitaya_scpi as scpi
+
+
+class AsyncScpi:
+    """asyncio SCPI client with the same acq_data/acq_set/sour_set surface as ``scpi``."""
+    delimiter = scpi.scpi.delimiter
+    stream_limit = 2**22  # ASCII replies of a whole buffer are larger than the asyncio default
+
+    def __init__(self, host, timeout=None, port=5000):
+        """The connection is opened with ``await open()`` or ``async with``.
+
+        Args:
+            host (str): IP address of the Red Pitaya (SCPI server needs to be turned on)
+            timeout (float, optional): Timeout [s] for connecting and for every reply. Defaults to None.
+            port (int, optional): Port of the SCPI server. Defaults to 5000.
+        """
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+
+        self._reader = None
+        self._writer = None
+        self._replies = None  # Queue of (future, coroutine function that reads the reply)
+        self._reply_task = None
+        self._error = None
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def open(self):
+        """Opens the IP connection and starts the task that receives the replies."""
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port, limit=self.stream_limit), self.timeout)
+        self._error = None
+        self._replies = asyncio.Queue()
+        self._reply_task = asyncio.create_task(self._receive_replies())
+
+    async def close(self):
+        """Closes the IP connection. Queries that are still waiting fail with ConnectionError."""
+        if self._reply_task is not None:
+            self._reply_task.cancel()
+            try:
+                await self._reply_task
+            except asyncio.CancelledError:
+                pass
+            self._reply_task = None
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except ConnectionError:
+                pass
+            self._writer = None
+        if self._replies is not None:
+            self._fail_pending(ConnectionError('SCPI >> connection closed'))
+
+    def _fail_pending(self, error):
+        self._error = error
+        while not self._replies.empty():
+            future, _ = self._replies.get_nowait()
+            if not future.done():
+                future.set_exception(error)
+
+    async def _receive_replies(self):
+        """Reads the replies in the order the queries were sent and hands them to
+        the waiting callers. Replies of callers that gave up (timeout) are still
+        read, so the following replies stay in sync."""
+        while True:
+            future, read = await self._replies.get()
+            try:
+                reply = await read()
+            except asyncio.CancelledError:
+                # close(): the reply in flight is no longer in the queue, fail it here
+                if not future.done():
+                    future.set_exception(ConnectionError('SCPI >> connection closed'))
+                raise
+            except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError) as e:
+                if not future.done():
+                    future.set_exception(e)
+                # The position in the reply stream is unknown now
+                self._fail_pending(ConnectionError(f'SCPI >> reply stream broken: {e}'))
+                return
+            if not future.done():
+                future.set_result(reply)
+
+    async def _read_txt(self):
+        reply = await self._reader.readuntil(self.delimiter.encode('utf-8'))
+        return reply[:-len(self.delimiter)]
+
+    async def _read_arb(self):
+        header = await self._reader.readexactly(2)
+        if header[:1] != b'#':
+            raise ValueError(f"Red Pitaya did not answer with binary data: {header}")
+        numOfBytes = int(await self._reader.readexactly(int(header[1:2])))
+        data = await self._reader.readexactly(numOfBytes)
+        await self._reader.readexactly(len(self.delimiter))
+        return data
+
+    def _write(self, commands):
+        if self._error is not None:
+            raise self._error
+        self._writer.write(''.join(msg + self.delimiter for msg in commands).encode('utf-8'))
+
+    async def _query(self, msg, read):
+        # Writing and queueing happen without an await in between, which keeps the order of the replies
+        future = asyncio.get_running_loop().create_future()
+        self._write([msg])
+        self._replies.put_nowait((future, read))
+        await self._writer.drain()
+        return await asyncio.wait_for(future, self.timeout)
+
+    async def tx_txt(self, msg):
+        """Send text string and append delimiter."""
+        await self.tx_txt_many([msg])
+
+    async def tx_txt_many(self, commands):
+        """Send several commands in one write."""
+        if commands:
+            self._write(commands)
+            await self._writer.drain()
+
+    async def txrx_txt(self, msg):
+        """Send/receive text string."""
+        return (await self._query(msg, self._read_txt)).decode('utf-8')
+
+    async def txrx_arb(self, msg):
+        """Send text string and receive binary data."""
+        return await self._query(msg, self._read_arb)
+
+    async def sour_set(self, *args, **kwargs):
+        """Set the parameters for signal generator on one channel.
+        Same parameters as ``scpi.sour_set``."""
+        await self.tx_txt_many(scpi.scpi._sour_set_commands(*args, **kwargs))
+
+    async def acq_set(self, *args, **kwargs):
+        """Set the parameters for signal acquisition.
+        Same parameters as ``scpi.acq_set``."""
+        await self.tx_txt_many(scpi.scpi._acq_set_commands(*args, **kwargs))
+
+    async def acq_data(self, chan, start=None, end=None, num_samples=None, old=False, lat=False,
+                       binary=False, units=None, input4=False):
+        """Returns the acquired data on a channel as a numpy array.
+        Same read options as ``scpi.acq_data``.
+
+        Args:
+            binary (bool, optional): Set to True if the Red Pitaya sends binary data
+                ('ACQ:DATA:FORMAT BIN'). Defaults to False.
+            units (str, optional): Units of binary data (VOLTS or RAW). If None, they are
+                read from the Red Pitaya. Defaults to None.
+
+        Returns:
+            ndarray: float samples (ASCII), float32 (VOLTS) or int16 (RAW) samples (binary)
+        """
+        query = scpi.scpi._acq_data_query(chan, start, end, num_samples, old, lat, input4)
+
+        if not binary:
+            return scpi.scpi.parse_array(await self._query(query, self._read_txt),
+                                         count=scpi.scpi._acq_data_count(start, end, num_samples, old, lat))
+
+        if units is None:
+            units = await self.txrx_txt('ACQ:DATA:UNITS?')
+        dtype = scpi.scpi.bin_dtypes[units.upper()]
+        data = await self._query(query, self._read_arb)
+        return np.frombuffer(data, dtype=dtype).astype(dtype.newbyteorder('='))
+
+    async def idn_q(self):
+        """Identification Query"""
+        return await self.txrx_txt('*IDN?')
+
+    async def rst(self):
+        """Reset Command"""
+        await self.tx_txt('*RST')
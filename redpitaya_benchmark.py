@@ -0,0 +1,199 @@
+"""
+Throughput benchmark of the Red Pitaya read modes.
+
+Runs every way of reading the acquisition buffer (text and binary, single
+queries, transactions, the shared session and the asyncio client) against a
+Red Pitaya or, by default, against the local emulator and prints the
+acquisitions/s, bytes/s and the p50/p99 round-trip latency of each mode.
+The acquisition backends (see acquisition_backends) are compared the same way,
+for raw reads and for UV power readings:
+
+    python redpitaya_benchmark.py --samples 3000 --iterations 200 --latency 0.0005
+    python redpitaya_benchmark.py --host 169.254.167.128
+"""
+
+import argparse
+import asyncio
+import time
+import numpy as np
+import acquisition_backends
+import redpitaya_async
+import redpitaya_emulator
+import redpitaya_scpi as scpi
+import redpitaya_session
+
+
+def measure(acquire, iterations, count_bytes=None):
+    """Calls ``acquire()`` repeatedly and returns its throughput and latency.
+
+    Args:
+        acquire (callable): Reads once; returns the number of acquisitions it made.
+        iterations (int): Number of calls.
+        count_bytes (callable, optional): Returns the number of bytes received so far.
+            Defaults to None (bytes/s is not reported).
+
+    Returns:
+        dict: acquisitions/s, bytes/s and the p50/p99 latency [s] of one call
+    """
+    acquire()  # Warm up
+    latencies = np.empty(iterations)
+    acquisitions = 0
+    bytes_before = count_bytes() if count_bytes else 0
+    started = time.perf_counter()
+    for i in range(iterations):
+        t = time.perf_counter()
+        acquisitions += acquire()
+        latencies[i] = time.perf_counter() - t
+    elapsed = time.perf_counter() - started
+
+    return {
+        "acq_per_s": acquisitions / elapsed,
+        "bytes_per_s": (count_bytes() - bytes_before) / elapsed if count_bytes else None,
+        "p50": float(np.percentile(latencies, 50)),
+        "p99": float(np.percentile(latencies, 99)),
+    }
+
+
+def read_modes(rp, session, loop, arp, samples):
+    """Returns {name: (data format, acquire)} of all read modes."""
+    def read(chan):
+        return dict(chan=chan, start=0, num_samples=samples)
+
+    def transaction():
+        with rp.transaction() as t:
+            t.acq_data_array(**read(1))
+            t.acq_data_array(**read(2))
+        return 2
+
+    async def gather():
+        await asyncio.gather(arp.acq_data(**read(1), binary=True, units="VOLTS"),
+                             arp.acq_data(**read(2), binary=True, units="VOLTS"))
+        return 2
+
+    return {
+        "acq_data (text, list)": ("ASCII", lambda: len(rp.acq_data(**read(1), convert=True)) and 1),
+        "acq_data_array (text)": ("ASCII", lambda: rp.acq_data_array(**read(1)).size and 1),
+        "acq_data (bin, list)": ("BIN", lambda: len(rp.acq_data(**read(1), binary=True, convert=True)) and 1),
+        "acq_data_bin": ("BIN", lambda: rp.acq_data_bin(**read(1), units="VOLTS").size and 1),
+        "transaction (text, 2 ch)": ("ASCII", transaction),
+        "session (text)": ("ASCII", lambda: session.acq_data_array(**read(1)).size and 1),
+        "async gather (bin, 2 ch)": ("BIN", lambda: loop.run_until_complete(gather())),
+    }
+
+
+def run(host, port, samples=3000, iterations=200, emulator=None):
+    """Runs all read modes and returns {name: result of ``measure``}.
+
+    Args:
+        host (str): IP address of the Red Pitaya or the emulator.
+        port (int): Port of the SCPI server.
+        samples (int, optional): Samples per acquisition. Defaults to 3000.
+        iterations (int, optional): Reads per mode. Defaults to 200.
+        emulator (RedPitayaEmulator, optional): Local emulator, used to count the received bytes.
+    """
+    count_bytes = (lambda: emulator.bytes_sent) if emulator is not None else None
+
+    rp = scpi.scpi(host, port=port)
+    session = redpitaya_session.RedPitayaSession(host, port=port)
+    loop = asyncio.new_event_loop()
+    arp = redpitaya_async.AsyncScpi(host, port=port)
+    loop.run_until_complete(arp.open())
+
+    rp.tx_txt('ACQ:RST')
+    rp.tx_txt('ACQ:DATA:UNITS VOLTS')
+    rp.tx_txt('ACQ:START')
+
+    results = {}
+    try:
+        for name, (data_format, acquire) in read_modes(rp, session, loop, arp, samples).items():
+            rp.tx_txt(f'ACQ:DATA:FORMAT {data_format}')
+            rp.txrx_txt('ACQ:DATA:FORMAT?')  # Make sure the format is set before measuring
+            results[name] = measure(acquire, iterations, count_bytes)
+    finally:
+        rp.tx_txt('ACQ:DATA:FORMAT ASCII')
+        loop.run_until_complete(arp.close())
+        loop.close()
+        session.close()
+        rp.close()
+    return results
+
+
+def reset_acquisition(rp, dec=1):
+    """Resets the acquisition to the same state (decimation, ASCII volts, running, no
+    trigger armed), so no backend inherits the settings of the previous one."""
+    with rp.transaction() as t:
+        t.tx_txt('ACQ:RST')
+        for cmd in scpi.scpi._acq_set_commands(dec=dec, units="VOLTS", sample_format="ASCII"):
+            t.tx_txt(cmd)
+        t.tx_txt('ACQ:START')
+    rp.txrx_txt('ACQ:DEC?')  # Make sure the reset is applied before measuring
+
+
+def compare_backends(host, port, samples=3000, iterations=200, emulator=None, window=3000 / 125e6):
+    """Runs raw reads and power readings of all acquisition backends that are available and
+    returns {name: result of ``measure``}. The pyrpl backend is skipped against the emulator.
+
+    Args:
+        host (str): IP address of the Red Pitaya or the emulator.
+        port (int): Port of the SCPI server.
+        samples (int, optional): Samples per raw read. Defaults to 3000.
+        iterations (int, optional): Reads per backend and kind. Defaults to 200.
+        emulator (RedPitayaEmulator, optional): Local emulator, used to count the received bytes.
+        window (float, optional): Integration time [s] of the power readings. Defaults to 24 us.
+    """
+    count_bytes = (lambda: emulator.bytes_sent) if emulator is not None else None
+    rp = redpitaya_session.RedPitayaSession(host, port=port)
+
+    configs = [{"backend": "scpi_ascii"}, {"backend": "scpi_binary"}, {"backend": "fake", "seed": 0}]
+    if emulator is None and acquisition_backends.Pyrpl is not None:
+        configs.append({"backend": "pyrpl"})
+
+    results = {}
+    try:
+        for config in configs:
+            reset_acquisition(rp)
+            backend = acquisition_backends.make_backend(config, client=rp, host=host)
+            try:
+                backend.setup()
+                results[f"{backend.name} read"] = measure(
+                    lambda: backend.read(1, samples).size and 1, iterations, count_bytes)
+                backend.setup(window)
+                backend.arm_event(2, -0.4)
+                results[f"{backend.name} power"] = measure(
+                    lambda: backend.read_power(1, window) and 1, iterations, count_bytes)
+            finally:
+                backend.disarm_event()
+                backend.close()
+    finally:
+        reset_acquisition(rp)
+        rp.close()
+    return results
+
+
+def print_results(results):
+    print(f"{'read mode':<26}{'acq/s':>10}{'MB/s':>10}{'p50 [ms]':>10}{'p99 [ms]':>10}")
+    for name, r in results.items():
+        mb = f"{r['bytes_per_s'] / 1e6:.2f}" if r["bytes_per_s"] is not None else "n/a"
+        print(f"{name:<26}{r['acq_per_s']:>10.1f}{mb:>10}{r['p50'] * 1e3:>10.3f}{r['p99'] * 1e3:>10.3f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Measures the acquisition throughput of the Red Pitaya read modes.')
+    parser.add_argument('--host', default=None, help='Red Pitaya to measure (default: start the local emulator)')
+    parser.add_argument('--port', type=int, default=5000, help='port of the SCPI server')
+    parser.add_argument('--samples', type=int, default=3000, help='samples per acquisition')
+    parser.add_argument('--iterations', type=int, default=200, help='reads per mode')
+    parser.add_argument('--latency', type=float, default=0.0, help='emulator: delay before every reply [s]')
+    parser.add_argument('--bandwidth', type=float, default=None, help='emulator: bandwidth of the replies [bytes/s]')
+    args = parser.parse_args()
+
+    if args.host is None:
+        with redpitaya_emulator.RedPitayaEmulator(latency=args.latency, bandwidth=args.bandwidth, seed=0) as emulator:
+            host, port = emulator.address
+            print_results(run(host, port, args.samples, args.iterations, emulator))
+            print()
+            print_results(compare_backends(host, port, args.samples, args.iterations, emulator))
+    else:
+        print_results(run(args.host, args.port, args.samples, args.iterations))
+        print()
+        print_results(compare_backends(args.host, args.port, args.samples, args.iterations))
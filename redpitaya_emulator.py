@@ -0,0 +1,444 @@
+"""
+Local emulator of the Red Pitaya SCPI server.
+
+Speaks the subset of SCPI that is used by redpitaya_scpi.scpi and BBO_functions
+(acquisition settings, data queries in ASCII and BIN format, generator and burst
+commands) and answers with synthetic UV diode (input 1) and extraction (input 2)
+traces. Latency and bandwidth of the link can be configured, so acquisition code
+can be measured without the hardware:
+
+    python redpitaya_emulator.py --port 5000 --latency 0.0005 --bandwidth 10e6
+"""
+
+import argparse
+import re
+import socket
+import socketserver
+import threading
+import time
+import numpy as np
+
+
+class RedPitayaEmulator:
+    sample_rate = 125e6     # Samples/s at decimation 1
+    buff_size = 16384
+    lsb = 1 / 8192          # V per LSB of RAW data (LV gain)
+
+    # Settings after ACQ:RST / *RST
+    acq_defaults = {
+        "ACQ:DEC": "1",
+        "ACQ:AVG": "ON",
+        "ACQ:TRIG:DLY": "0",
+        "ACQ:TRIG:DLY:NS": "0",
+        "ACQ:TRIG:LEV": "0",
+        "ACQ:DATA:UNITS": "VOLTS",
+        "ACQ:DATA:FORMAT": "ASCII",
+        "ACQ:SOUR1:GAIN": "LV",
+        "ACQ:SOUR2:GAIN": "LV",
+    }
+
+    axi_start = 0x1000000   # Address of the RAM reserved for the deep-memory acquisition
+
+    _axi_query = re.compile(r"ACQ:AXI:SOUR([12]):(TRIG:FILL|TRIG:POS|WRITE:POS|DATA:START:N)\?")
+    _data_query = re.compile(r"ACQ:SOUR([12]):DATA(:STA:END|:STA:N|:OLD:N|:LAT:N)?\?\s*(.*)")
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, bandwidth=None,
+                 uv_offset=0.05, uv_amplitude=0.5, pulse_rate=50e3, pulse_width=2e-6,
+                 extraction_period=1.0, extraction_width=1e-3, extraction_level=-1.0,
+                 noise=0.005, axi_size=32 * 2**20, seed=None):
+        """Emulated Red Pitaya. The server runs in a background thread after ``start()``.
+
+        Args:
+            host (str, optional): Address to listen on. Defaults to "127.0.0.1".
+            port (int, optional): Port to listen on, 0 picks a free port. Defaults to 0.
+            latency (float, optional): Delay [s] before every reply. Defaults to 0.
+            bandwidth (float, optional): Link bandwidth [bytes/s] for the replies. Defaults to None (unlimited).
+            uv_offset (float, optional): DC level [V] of the UV diode. Defaults to 0.05.
+            uv_amplitude (float, optional): Peak voltage [V] of the UV pulses. Defaults to 0.5.
+            pulse_rate (float, optional): Repetition rate [Hz] of the laser pulses. Defaults to 50e3.
+            pulse_width (float, optional): Decay time [s] of the diode pulses. Defaults to 2e-6.
+            extraction_period (float, optional): Time [s] between two extraction signals. Defaults to 1.
+            extraction_width (float, optional): Length [s] of an extraction signal. Defaults to 1e-3.
+            extraction_level (float, optional): Voltage [V] of an extraction signal. Defaults to -1.
+            noise (float, optional): Standard deviation [V] of the noise on both inputs. Defaults to 0.005.
+            axi_size (int, optional): Bytes of RAM reserved for the deep-memory acquisition. Defaults to 32 MiB.
+            seed (int, optional): Seed of the noise generator. Defaults to None.
+        """
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.uv_offset = uv_offset
+        self.uv_amplitude = uv_amplitude
+        self.pulse_rate = pulse_rate
+        self.pulse_width = pulse_width
+        self.extraction_period = extraction_period
+        self.extraction_width = extraction_width
+        self.extraction_level = extraction_level
+        self.noise = noise
+        self.axi_size = axi_size
+
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.RLock()
+        self._epoch = time.perf_counter()
+
+        self.bytes_sent = 0
+        self.commands_received = 0
+        self.errors = []            # Commands the emulator didn't understand
+        self.pulses = {1: 0, 2: 0}  # Number of internal generator triggers per output
+        self.waveforms = {}         # Payload of the binary arbitrary waveform uploads per output
+
+        self.reset()
+
+        self._server = _Server((host, port), _Handler)
+        self._server.emulator = self
+        self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    @property
+    def address(self):
+        """(host, port) the emulator listens on."""
+        return self._server.server_address
+
+    def start(self):
+        """Starts serving in a background thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever, name="RedPitayaEmulator", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stops the server and closes its socket."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def serve_forever(self):
+        """Serves in the calling thread (used when run as a script)."""
+        self._server.serve_forever()
+
+    # Device state ---------------------------------------------------------------
+
+    def reset(self, generator=True):
+        """Resets the acquisition (ACQ:RST) and optionally the generator (*RST)."""
+        with self._lock:
+            self.settings = {key: value for key, value in getattr(self, "settings", {}).items()
+                             if not key.startswith("ACQ:")}
+            self.settings.update(self.acq_defaults)
+            if generator:
+                self.settings = {key: value for key, value in self.settings.items()
+                                 if not key.startswith(("SOUR", "OUTPUT"))}
+            self.running = False
+            self.trig_source = "DISABLED"
+            self._start_time = None
+            self._stop_index = -1
+            self._trigger_index = None      # Absolute sample index of the trigger event
+            self._trigger_checked = 0       # Samples up to this index were searched for the event
+
+    def axi_channels(self):
+        """Inputs with enabled deep-memory acquisition."""
+        return [chan for chan in (1, 2) if self.settings.get(f"ACQ:AXI:SOUR{chan}:ENABLE") == "ON"]
+
+    def axi_samples(self, chan):
+        """Samples of the RAM buffer of an input (ACQ:AXI:SOURx:SET:BUFFER <address>,<bytes>)."""
+        return int(self.settings[f"ACQ:AXI:SOUR{chan}:SET:BUFFER"].split(",")[1]) // 2
+
+    @property
+    def decimation(self):
+        if self.axi_channels():
+            return int(self.settings.get("ACQ:AXI:DEC", 1))
+        return int(self.settings["ACQ:DEC"])
+
+    @property
+    def trigger_delay(self):
+        """Samples acquired after the trigger event."""
+        if self.axi_channels():
+            return max(int(self.settings.get(f"ACQ:AXI:SOUR{chan}:TRIG:DLY", 0)) for chan in self.axi_channels())
+        return int(self.settings["ACQ:TRIG:DLY"])
+
+    def now(self):
+        """Time [s] since the emulator was created."""
+        return time.perf_counter() - self._epoch
+
+    def latest_index(self):
+        """Absolute index of the newest sample in the buffer (-1 if nothing was acquired).
+        The acquisition stops ``trigger_delay`` samples after a trigger event."""
+        if not self.running:
+            return self._stop_index
+        newest = int((self.now() - self._start_time) * self.sample_rate / self.decimation)
+        self._update_trigger(newest)
+        if self._trigger_index is not None:
+            end = self._trigger_index + self.trigger_delay
+            if newest >= end:
+                self.running = False
+                self._stop_index = end
+                return end
+        return newest
+
+    def _sample_time(self, index):
+        return self._start_time + index * (self.decimation / self.sample_rate)
+
+    def _update_trigger(self, newest):
+        """Searches the samples acquired since the last call for the armed trigger event."""
+        if self._trigger_index is not None or self.trig_source == "DISABLED":
+            return
+        if self.trig_source == "NOW":
+            self._trigger_index = newest
+        else:
+            source = re.fullmatch(r"CH([12])_(PE|NE)", self.trig_source)
+            first = self._trigger_checked
+            if source is None or newest <= first:
+                return
+            # Noise-free trace; long spans are searched on a coarser grid
+            index = np.arange(first, newest + 1, max(1, (newest - first) // 1000000))
+            above = self.signal(int(source.group(1)), self._sample_time(index)) > float(self.settings["ACQ:TRIG:LEV"])
+            if source.group(2) == "PE":
+                crossings = np.flatnonzero(~above[:-1] & above[1:])
+            else:
+                crossings = np.flatnonzero(above[:-1] & ~above[1:])
+            self._trigger_checked = newest
+            if not crossings.size:
+                return
+            self._trigger_index = int(index[crossings[0] + 1])
+        self.trig_source = "DISABLED"
+
+    def write_position(self):
+        return max(self.latest_index(), 0) % self.buff_size
+
+    def signal(self, chan, t):
+        """Noise-free synthetic trace of input 1 (UV diode) or 2 (extraction) at times t [s]."""
+        if chan == 1:
+            since_pulse = np.mod(t, 1 / self.pulse_rate)
+            return self.uv_offset + self.uv_amplitude * np.exp(-since_pulse / self.pulse_width)
+        extraction = np.mod(t, self.extraction_period) < self.extraction_width
+        return np.where(extraction, self.extraction_level, 0.0)
+
+    def samples(self, chan, positions):
+        """Buffer content of an input at the given buffer positions [V]."""
+        newest = self.latest_index()
+        return self.trace(chan, newest - np.mod(newest - np.asarray(positions), self.buff_size))
+
+    def trace(self, chan, index):
+        """Acquired samples of an input at absolute sample indices [V]."""
+        dec = self.decimation
+        t = self._sample_time(index) if self._start_time is not None else index * 0.0
+
+        if self.settings["ACQ:AVG"] == "ON" and dec > 1:
+            # Averaging: mean of the trace over the decimation interval
+            sub = min(dec, 16)
+            offsets = np.arange(sub) * (dec / self.sample_rate / sub)
+            values = self.signal(chan, t[:, None] + offsets[None, :]).mean(axis=1)
+        else:
+            values = self.signal(chan, t)
+        values = values + self._rng.normal(0, self.noise, values.shape)
+        return np.where(index >= 0, values, 0.0)
+
+    # SCPI -------------------------------------------------------------------------
+
+    def execute(self, command, block=None):
+        """Executes one SCPI command and returns the reply (bytes without delimiter) or None.
+        ``block`` is the payload of an IEEE 488.2 block parameter ('#<n><len><data>')."""
+        with self._lock:
+            self.commands_received += 1
+            header, _, value = command.strip().partition(" ")
+            header = header.upper()
+            value = value.strip()
+
+            if block is not None:
+                if re.fullmatch(r"SOUR[12]:TRAC:DATA:DATA", header):
+                    self.waveforms[int(header[4])] = bytes(block)
+                    self.settings[header] = f"#{len(block)}"
+                else:
+                    self.errors.append(f"{header} #<{len(block)} bytes>")
+                return None
+
+            data = self._data_query.fullmatch(header + (" " + value if value else ""))
+            if data:
+                return self._data_reply(int(data.group(1)), data.group(2), data.group(3))
+
+            reply = self._execute(header, value)
+            if reply is None and header.endswith("?"):
+                self.errors.append(command)
+                return b"ERR!"
+            return reply
+
+    def _execute(self, header, value):
+        if header == "*IDN?":
+            return b"REDPITAYA,INSTR2020,EMULATOR,0"
+        if header == "*RST":
+            self.reset(generator=True)
+        elif header == "ACQ:RST":
+            self.reset(generator=False)
+        elif header == "ACQ:START":
+            self.running = True
+            self._start_time = self.now()
+            self._trigger_index = None
+            self._trigger_checked = 0
+        elif header == "ACQ:STOP":
+            self._stop_index = self.latest_index()
+            self.running = False
+        elif header == "ACQ:TRIG":
+            self.trig_source = "DISABLED"
+            self._trigger_index = None
+            self._trigger_checked = max(self.latest_index(), 0)
+            self.trig_source = value.upper()
+        elif header == "ACQ:TRIG:STAT?":
+            self.latest_index()
+            return b"TD" if self._trigger_index is not None else b"WAIT"
+        elif header == "ACQ:TRIG:FILL?":
+            newest = self.latest_index()
+            filled = newest >= self.buff_size - 1 and (self._trigger_index is None or not self.running)
+            return b"1" if filled else b"0"
+        elif header == "ACQ:TPOS?":
+            self.latest_index()
+            return str((self._trigger_index or 0) % self.buff_size).encode()
+        elif header == "ACQ:AXI:START?":
+            return str(self.axi_start).encode()
+        elif header == "ACQ:AXI:SIZE?":
+            return str(self.axi_size).encode()
+        elif self._axi_query.fullmatch(header):
+            axi = self._axi_query.fullmatch(header)
+            return self._axi_reply(int(axi.group(1)), axi.group(2), value)
+        elif header == "ACQ:WPOS?":
+            return str(self.write_position()).encode()
+        elif header == "ACQ:BUF:SIZE?":
+            return str(self.buff_size).encode()
+        elif header in ("SYST:ERR:COUN?", "SYST:ERR:COUNT?"):
+            return str(len(self.errors)).encode()
+        elif re.fullmatch(r"SOUR[12]:TRIG:INT", header):
+            self.pulses[int(header[4])] += 1
+        elif header.endswith("?"):
+            setting = self.settings.get(header[:-1])
+            return setting.encode() if setting is not None else None
+        elif value and header.startswith(("ACQ:", "SOUR", "OUTPUT")):
+            self.settings[header] = value.upper()
+        else:
+            self.errors.append(f"{header} {value}".strip())
+        return None
+
+    def _axi_reply(self, chan, query, args):
+        newest = self.latest_index()
+        samples = self.axi_samples(chan)
+        trigger = self._trigger_index or 0
+        if query == "TRIG:FILL":
+            done = self._trigger_index is not None and newest >= trigger + self.trigger_delay
+            return b"1" if done else b"0"
+        if query == "TRIG:POS":
+            return str(trigger % samples).encode()
+        if query == "WRITE:POS":
+            return str(max(newest, 0) % samples).encode()
+
+        start, n = (int(x) for x in args.split(","))
+        index = trigger + np.mod(start + np.arange(n) - trigger % samples, samples)
+        return self.encode(self.trace(chan, index), self.settings.get("ACQ:AXI:DATA:UNITS", "VOLTS"))
+
+    def _data_reply(self, chan, mode, args):
+        args = [int(x) for x in args.split(",") if x.strip()]
+        newest = self.write_position()
+        if mode is None:
+            positions = newest + 1 + np.arange(self.buff_size)
+        elif mode == ":STA:END":
+            positions = args[0] + np.arange(np.mod(args[1] - args[0], self.buff_size) + 1)
+        elif mode == ":STA:N":
+            positions = args[0] + np.arange(args[1])
+        elif mode == ":OLD:N":
+            positions = newest + 1 + np.arange(args[0])
+        else:
+            positions = newest - args[0] + 1 + np.arange(args[0])
+        return self.encode(self.samples(chan, np.mod(positions, self.buff_size)))
+
+    def encode(self, volts, units=None):
+        """Encodes samples in the current (or the given) units and data format."""
+        raw = (units or self.settings["ACQ:DATA:UNITS"]) == "RAW"
+        if raw:
+            volts = np.clip(np.round(volts / self.lsb), -8192, 8191)
+
+        if self.settings["ACQ:DATA:FORMAT"] == "BIN":
+            payload = volts.astype(">i2" if raw else ">f4").tobytes()
+            length = str(len(payload))
+            return f"#{len(length)}{length}".encode() + payload
+
+        text = ",".join(map("{:.0f}".format if raw else "{:.5f}".format, volts.tolist()))
+        return ("{" + text + "}").encode()
+
+    def send(self, sock, reply):
+        """Sends a reply with the configured latency and bandwidth."""
+        reply += b"\r\n"
+        if self.latency:
+            time.sleep(self.latency)
+        if self.bandwidth:
+            chunk = 65536
+            for i in range(0, len(reply), chunk):
+                sock.sendall(reply[i:i + chunk])
+                time.sleep(len(reply[i:i + chunk]) / self.bandwidth)
+        else:
+            sock.sendall(reply)
+        with self._lock:
+            self.bytes_sent += len(reply)
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    """One client connection. Commands are separated by the SCPI delimiter."""
+
+    def handle(self):
+        emulator = self.server.emulator
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.buffer = bytearray()
+        while True:
+            line, block = self.readline()
+            if line is None:
+                return
+            if not line.strip():
+                continue
+            reply = emulator.execute(line.decode("utf-8", errors="replace"), block)
+            if reply is not None:
+                emulator.send(self.request, reply)
+
+    def readline(self):
+        """Returns the next command and the payload of its block parameter (or None)."""
+        while True:
+            end = self.buffer.find(b"\n")
+            start = self.buffer.find(b" #", 0, end if end >= 0 else len(self.buffer))
+            if start >= 0 and len(self.buffer) >= start + 3:
+                # Binary block, may contain the delimiter: '<header> #<n><len><data>\r\n'
+                n = int(self.buffer[start + 2:start + 3])
+                length = int(self.buffer[start + 3:start + 3 + n] or 0) if len(self.buffer) >= start + 3 + n else None
+                if length is not None:
+                    data_end = start + 3 + n + length
+                    if len(self.buffer) >= data_end + 1 and self.buffer.find(b"\n", data_end) >= 0:
+                        line = bytes(self.buffer[:start])
+                        block = bytes(self.buffer[start + 3 + n:data_end])
+                        del self.buffer[:self.buffer.find(b"\n", data_end) + 1]
+                        return line, block
+            elif end >= 0:
+                line = bytes(self.buffer[:end]).rstrip(b"\r")
+                del self.buffer[:end + 1]
+                return line, None
+            chunk = self.request.recv(65536)
+            if not chunk:
+                return None, None
+            self.buffer += chunk
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Emulates the SCPI server of a Red Pitaya with synthetic UV diode traces.')
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on')
+    parser.add_argument('--port', type=int, default=5000, help='port to listen on')
+    parser.add_argument('--latency', type=float, default=0.0, help='delay before every reply [s]')
+    parser.add_argument('--bandwidth', type=float, default=None, help='bandwidth of the replies [bytes/s]')
+    parser.add_argument('--seed', type=int, default=None, help='seed of the noise generator')
+    args = parser.parse_args()
+
+    emulator = RedPitayaEmulator(host=args.host, port=args.port, latency=args.latency,
+                                 bandwidth=args.bandwidth, seed=args.seed)
+    print(f"Red Pitaya emulator listening on {emulator.address[0]}:{emulator.address[1]}")
+    try:
+        emulator.serve_forever()
+    except KeyboardInterrupt:
+        pass
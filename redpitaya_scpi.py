@@ -1,7 +1,13 @@
 """SCPI access to Red Pitaya."""
 
+import collections
+import functools
+import hashlib
+import re
 import socket
-import struct
+import threading
+import time
+import warnings
 import numpy as np
 
 __author__ = "Luka Golinar, Iztok Jeras, Miha Gjura"
@@ -10,6 +16,23 @@ __copyright__ = "Copyright 2023, Red Pitaya"
 class scpi (object):
     """SCPI class used to access Red Pitaya over an IP network."""
     delimiter = '\r\n'
+    buff_size = 16384
+    sample_rate = 125e6     # Samples/s of the fast analog inputs at decimation 1
+
+    # Big-endian sample types used by the Red Pitaya in 'ACQ:DATA:FORMAT BIN'
+    bin_dtypes = {"VOLTS": np.dtype('>f4'), "RAW": np.dtype('>i2')}
+
+    # Settings that are kept in the client-side mirror (idempotent, read back with '<header>?')
+    mirrored = re.compile(r"ACQ:(DEC|AVG|TRIG:DLY|TRIG:DLY:NS|TRIG:LEV|TRIG:EXT:LEV|DATA:UNITS|DATA:FORMAT"
+                          r"|SOUR\d:GAIN|SOUR\d:COUP)|SOUR\d:(?!TRIG:INT).+|OUTPUT\d:STATE")
+    # Sample types of binary arbitrary waveforms and the number of encoded waveforms that are kept
+    arb_dtypes = {"float32": np.dtype('>f4'), "int16": np.dtype('>i2')}
+    arb_cache_size = 16
+    # Reset commands and the prefixes of the settings they reset
+    resets = {"ACQ:RST": ("ACQ:",), "GEN:RST": ("SOUR", "OUTPUT"), "*RST": ("",)}
+    # Acquisition settings that are restored after a deep-memory capture
+    axi_restored_settings = ("ACQ:DATA:FORMAT", "ACQ:DATA:UNITS", "ACQ:DEC", "ACQ:AVG",
+                             "ACQ:TRIG:LEV", "ACQ:TRIG:DLY")
 
     def __init__(self, host, timeout=None, port=5000):
         """Initialize object and open IP connection.
@@ -19,12 +42,31 @@ class scpi (object):
         self.port    = port
         self.timeout = timeout
 
+        # Receive buffer for binary blocks, reused between acquisitions
+        self._rx_buffer = bytearray(4 * self.buff_size)
+        # Received bytes that belong to the next reply (pipelined queries)
+        self._rx_pending = bytearray()
+        # Client-side mirror of the settings: {header: value}
+        self.mirror = {}
+        # Pulse presets {name: (chan, commands)} and the preset loaded on each output
+        self.presets = {}
+        self.active_preset = {}
+        # Encoded arbitrary waveforms {hash: IEEE block}, least recently used first
+        self._arb_cache = collections.OrderedDict()
+        # Samples per channel in RAM and units of the armed deep-memory capture
+        self.axi_samples = None
+        self.axi_units   = "VOLTS"
+        self.axi_restore = None     # Acquisition settings from before the capture (axi_disarm)
+
         try:
             self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
 
             if timeout is not None:
                 self._socket.settimeout(timeout)
 
+            # Commands are small writes, don't let Nagle's algorithm hold them back
+            self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
             self._socket.connect((host, port))
 
         except socket.error as e:
@@ -41,45 +83,216 @@ class scpi (object):
 
     def rx_txt(self, chunksize = 4096):
         """Receive text string and return it after removing the delimiter."""
-        msg = ''
+        return self.rx_txt_bytes(chunksize).decode('utf-8')
+
+    def rx_txt_bytes(self, chunksize = 4096):
+        """Receive text string as bytes and return it after removing the delimiter.
+        The chunks are collected in one bytearray and not decoded, so long replies
+        (e.g. a whole ASCII buffer) don't get copied on every received chunk.
+        Bytes received after the delimiter belong to the next reply and are kept.
+        """
+        delimiter = self.delimiter.encode('utf-8')
+        msg = self._rx_pending
+        searched = 0
         while 1:
-            chunk = self._socket.recv(chunksize).decode('utf-8') # Receive chunk size of 2^n preferably
-            msg += chunk
-            if (len(msg) and msg[-2:] == self.delimiter):
+            end = msg.find(delimiter, searched)
+            if end >= 0:
                 break
-        return msg[:-2]
+            searched = max(0, len(msg) - len(delimiter) + 1)
+            chunk = self._socket.recv(chunksize) # Receive chunk size of 2^n preferably
+            if not chunk:
+                raise ConnectionError('SCPI >> connection closed by Red Pitaya')
+            msg += chunk
+        reply = msg[:end]
+        del msg[:end + len(delimiter)]
+        return reply
+
+    def rx_array(self, dtype = float, chunksize = 65536, count = None):
+        """Receive an ASCII data reply '{v1,v2,...}' and return it as a numpy array.
+        With ``count`` the reply has to have exactly that many values."""
+        return self.parse_array(self.rx_txt_bytes(chunksize), dtype, count)
+
+    @staticmethod
+    def parse_array(msg, dtype = float, count = None):
+        """Parse an ASCII data reply '{v1,v2,...}' (bytes) into a numpy array.
+        The whole reply is converted by numpy in one call (no Python object per value).
+
+        Raises ValueError if the reply isn't ASCII data, contains a value that
+        isn't a number or (with ``count``) doesn't have ``count`` values.
+        """
+        msg = bytes(msg).strip()
+        if msg[:1] != b'{' or msg[-1:] != b'}':
+            raise ValueError(f"Red Pitaya did not answer with ASCII data: {msg[:32]}")
+        body = msg[1:-1].strip()
+        if not body:
+            data = np.empty(0, dtype=dtype)
+        else:
+            try:
+                with warnings.catch_warnings():
+                    # Older numpy only warns (and stops) at a value that isn't a number
+                    warnings.simplefilter("ignore", DeprecationWarning)
+                    data = np.fromstring(body, dtype=float, sep=',')
+            except ValueError as e:
+                raise ValueError(f"Malformed ASCII data from Red Pitaya: {e}") from e
+            if data.size != body.count(b',') + 1:
+                raise ValueError(f"Malformed ASCII data from Red Pitaya: {msg[:32]}")
+            data = data.astype(dtype, copy=False)
+        if count is not None and data.size != count:
+            raise ValueError(f"Red Pitaya sent {data.size} values instead of {count}")
+        return data
 
-    def rx_arb(self):
-        """ Recieve binary data from scpi server"""
-        numOfBytes = 0
-        data=b''
-        while len(data) != 1:
-            data = self._socket.recv(1)
-        if data != b'#':
+    def _recv_into(self, view):
+        """Fill the writable memoryview completely, first from the bytes that are
+        left over from the last text reply, then from the socket."""
+        if self._rx_pending:
+            pending = min(len(self._rx_pending), len(view))
+            view[:pending] = self._rx_pending[:pending]
+            del self._rx_pending[:pending]
+            view = view[pending:]
+        while len(view):
+            received = self._socket.recv_into(view)
+            if not received:
+                raise ConnectionError('SCPI >> connection closed by Red Pitaya')
+            view = view[received:]
+
+    def rx_arb_into(self, buffer=None):
+        """Receive binary data from scpi server directly into a buffer.
+
+        The block header '#<n><length>' is read with two short reads and the
+        payload is written with ``recv_into`` into ``buffer``, so no
+        intermediate ``bytes`` objects are created. Without ``buffer`` an
+        internal buffer is used that is reused on the next call, so the
+        returned view has to be consumed (or copied) before that.
+
+        Returns a memoryview of the payload or False if the reply is not a
+        binary block.
+        """
+        header = bytearray(2)
+        self._recv_into(memoryview(header))
+        if header[0:1] != b'#':
             return False
-        data=b''
-        while len(data) != 1:
-            data = self._socket.recv(1)
-        numOfNumBytes = int(data)
+        numOfNumBytes = int(bytes(header[1:2]))
         if numOfNumBytes <= 0:
             return False
-        data=b''
-        while len(data) != numOfNumBytes:
-            data += (self._socket.recv(1))
-        numOfBytes = int(data)
-        data=b''
-        while len(data) != numOfBytes:
-            data += (self._socket.recv(4096))
-        return data
+        length = bytearray(numOfNumBytes)
+        self._recv_into(memoryview(length))
+        numOfBytes = int(bytes(length))
+
+        if buffer is None:
+            if len(self._rx_buffer) < numOfBytes:
+                self._rx_buffer = bytearray(numOfBytes)
+            buffer = self._rx_buffer
+        view = memoryview(buffer).cast('B')
+        if len(view) < numOfBytes:
+            raise ValueError(f"Buffer too small for {numOfBytes} bytes of data")
+        view = view[:numOfBytes]
+        self._recv_into(view)
+
+        # The SCPI server terminates every reply, also binary blocks, with the delimiter
+        self._recv_into(memoryview(bytearray(len(self.delimiter))))
+        return view
+
+    def rx_arb(self):
+        """ Recieve binary data from scpi server"""
+        data = self.rx_arb_into()
+        if data is False:
+            return False
+        return bytes(data)
 
     def tx_txt(self, msg):
         """Send text string ending and append delimiter."""
+        self._track(msg)
         return self._socket.sendall((msg + self.delimiter).encode('utf-8')) # was send(().encode('utf-8'))
 
     def txrx_txt(self, msg):
-        """Send/receive text string."""
+        """Send/receive text string. Replies to queries of mirrored settings update the mirror."""
         self.tx_txt(msg)
-        return self.rx_txt()
+        reply = self.rx_txt()
+        header = msg.strip().upper()
+        if header.endswith('?') and self.mirrored.fullmatch(header[:-1]):
+            self.mirror[header[:-1]] = self._mirror_value(reply)
+        return reply
+
+# Settings mirror
+
+    @staticmethod
+    def _split_setting(msg):
+        """Returns (header, value) of a command, header in upper case."""
+        header, _, value = msg.strip().partition(' ')
+        return header.upper(), value.strip()
+
+    @staticmethod
+    def _mirror_value(value):
+        """Numbers are kept as sent, everything else in upper case."""
+        value = value.strip()
+        try:
+            float(value)
+            return value
+        except ValueError:
+            return value.upper()
+
+    @staticmethod
+    def _same_value(a, b):
+        try:
+            return float(a) == float(b)
+        except ValueError:
+            return a == b
+
+    def _track(self, msg):
+        """Applies a sent command to the mirror."""
+        header, value = self._split_setting(msg)
+        if header in self.resets:
+            self.invalidate(*self.resets[header])
+        elif value and self.mirrored.fullmatch(header):
+            self.mirror[header] = self._mirror_value(value)
+
+    def is_set(self, msg):
+        """True if the command is a mirrored setting whose value is already applied."""
+        header, value = self._split_setting(msg)
+        return header in self.mirror and self._same_value(self.mirror[header], self._mirror_value(value))
+
+    def get_setting(self, header):
+        """Returns the value of a setting (e.g. 'ACQ:DATA:UNITS') from the mirror.
+        Settings that are not mirrored yet are read from the Red Pitaya."""
+        header = header.upper()
+        if header in self.mirror:
+            return self.mirror[header]
+        return self.txrx_txt(header + '?')
+
+    def invalidate(self, *prefixes):
+        """Forgets the mirrored settings starting with one of the prefixes (all settings if
+        none are given). Needed if the settings were changed by another client."""
+        prefixes = prefixes or ("",)
+        for header in [h for h in self.mirror if h.startswith(prefixes)]:
+            del self.mirror[header]
+        if "SOUR".startswith(prefixes):
+            self.active_preset.clear()
+
+    def transaction(self):
+        """Returns a new ``Transaction`` to batch commands and queries.
+
+        Example:
+            with rp.transaction() as t:
+                t.tx_txt('SOUR1:FUNC PWM')
+                t.acq_data_array(1, start=1, num_samples=3000)
+                t.query('ACQ:TRIG:STAT?')
+            uv_trace, trig_state = t.replies
+        """
+        return Transaction(self)
+
+    def commit(self, transaction):
+        """Send all buffered commands of a transaction with one ``sendall`` and read
+        back the replies of its queries in order. Settings (``Transaction.set``) whose
+        value is already applied according to the mirror are left out."""
+        commands = []
+        for i, msg in enumerate(transaction.commands):
+            if i in transaction.settings and self.is_set(msg):
+                continue
+            self._track(msg)
+            commands.append(msg)
+        if commands:
+            self._socket.sendall(''.join(msg + self.delimiter for msg in commands).encode('utf-8'))
+        return [reader(self) for reader in transaction.readers]
 
 
 # SCPI command functions
@@ -168,6 +381,33 @@ class scpi (object):
         
         """
 
+        with self.transaction() as t:
+            for cmd in self._sour_set_commands(chan, func, volt, freq, offset, phase, dcyc, data,
+                                               burst, ncyc, nor, period, trig, sdrlab, siglab):
+                t.set(cmd)
+
+    @staticmethod
+    def _sour_set_commands(
+        chan: int,
+        func: str = "sine",
+        volt: float = 1,
+        freq: float = 1000,
+        offset: float = 0,
+        phase: float = 0,
+        dcyc: float = 0.5,
+        data: np.ndarray = None,
+        burst: bool = False,
+        ncyc: int = 1,
+        nor: int = 1,
+        period: int = None,
+        trig: str = "int",
+        sdrlab: bool = False,
+        siglab: bool = False,
+    ) -> list:
+
+        """Checks the parameters of ``sour_set`` and returns the SCPI commands
+        that apply them."""
+
         ### Constants ###
         waveform_list = ["SINE","SQUARE","TRIANGLE","SAWU","SAWD","PWM","ARBITRARY","DC","DC_NEG"]
         trigger_list = ["EXT_PE","EXT_NE","INT","GATED"]
@@ -269,40 +509,181 @@ class scpi (object):
         wf_data = []
 
 
-        ### SEND COMMANDS TO RP ###
-        self.tx_txt(f"SOUR{chan}:FUNC {func.upper()}")
-        self.tx_txt(f"SOUR{chan}:VOLT {volt}")
+        ### COMMANDS FOR RP ###
+        commands = []
+
+        commands.append(f"SOUR{chan}:FUNC {func.upper()}")
+        commands.append(f"SOUR{chan}:VOLT {volt}")
 
         if func.upper() not in waveform_list[7:9]:
-            self.tx_txt(f"SOUR{chan}:FREQ:FIX {freq}")
+            commands.append(f"SOUR{chan}:FREQ:FIX {freq}")
 
-        self.tx_txt(f"SOUR{chan}:VOLT:OFFS {offset}")
-        self.tx_txt(f"SOUR{chan}:PHAS {phase}")
+        commands.append(f"SOUR{chan}:VOLT:OFFS {offset}")
+        commands.append(f"SOUR{chan}:PHAS {phase}")
 
         if func.upper() == "PWM":
-            self.tx_txt(f"SOUR{chan}:DCYC {dcyc}")
+            commands.append(f"SOUR{chan}:DCYC {dcyc}")
 
         if (data is not None) and (func.upper() == "ARBITRARY"):
             for n in data:
                 wf_data.append(f"{n:.5f}")
             cust_wf = ", ".join(map(str, wf_data))
 
-            self.tx_txt(f"SOUR{chan}:TRAC:DATA:DATA {cust_wf}")
+            commands.append(f"SOUR{chan}:TRAC:DATA:DATA {cust_wf}")
 
         if burst:
-            self.tx_txt(f"SOUR{chan}:BURS:STAT BURST")
-            self.tx_txt(f"SOUR{chan}:BURS:NCYC {ncyc}")
-            self.tx_txt(f"SOUR{chan}:BURS:NOR {nor}")
+            commands.append(f"SOUR{chan}:BURS:STAT BURST")
+            commands.append(f"SOUR{chan}:BURS:NCYC {ncyc}")
+            commands.append(f"SOUR{chan}:BURS:NOR {nor}")
 
             if period is not None:
-                self.tx_txt(f"SOUR{chan}:BURS:INT:PER {period}")
+                commands.append(f"SOUR{chan}:BURS:INT:PER {period}")
         else:
-            self.tx_txt(f"SOUR{chan}:BURS:STAT CONTINUOUS")
+            commands.append(f"SOUR{chan}:BURS:STAT CONTINUOUS")
 
-        self.tx_txt(f"SOUR{chan}:TRIG:SOUR {trig.upper()}")
+        commands.append(f"SOUR{chan}:TRIG:SOUR {trig.upper()}")
 
         #print(f"SOUR{chan} set successfully")
 
+        return commands
+
+    def define_preset(
+        self,
+        name: str,
+        chan: int,
+        **kwargs
+    ) -> None:
+        """
+        Defines a named generator preset (e.g. a PWM burst). The settings are checked
+        now, ``load_preset`` uploads them and ``fire_preset`` triggers the output.
+
+        Parameters
+        ----------
+            name (str) :
+                Name of the preset.
+            chan (int) :
+                Output channel (either 1 or 2).
+            kwargs :
+                Generator settings, see ``sour_set``.
+
+        Raises
+        ------
+
+            Raises errors if the input parameters are out of range.
+
+        """
+
+        commands = self._sour_set_commands(chan, **kwargs)
+        self.presets[name] = (chan, commands)
+        if self.active_preset.get(chan) == name:
+            del self.active_preset[chan]
+
+    def load_preset(self, name: str) -> None:
+        """
+        Uploads a preset to its output. Settings that are already applied (settings mirror)
+        are left out. The output stays as it is: it is enabled by the first ``fire_preset``,
+        as some firmware versions send a burst when the output is enabled.
+        """
+
+        chan, commands = self.presets[name]
+        with self.transaction() as t:
+            for cmd in commands:
+                t.set(cmd)
+        self.active_preset[chan] = name
+
+    def fire_preset(self, name: str) -> None:
+        """
+        Triggers a preset. If the preset is loaded on its enabled output and its settings
+        are unchanged, this is the single command 'SOURx:TRig:INT'; otherwise the changed
+        settings (and 'OUTPUTx:STATE ON') are sent in the same packet as the trigger.
+        """
+
+        chan, commands = self.presets[name]
+        commands = commands + [f"OUTPUT{chan}:STATE ON"]
+        if self.active_preset.get(chan) == name and all(self.is_set(cmd) for cmd in commands):
+            self.tx_txt(f"SOUR{chan}:TRig:INT")
+            return
+
+        with self.transaction() as t:
+            for cmd in commands:
+                t.set(cmd)
+            t.tx_txt(f"SOUR{chan}:TRig:INT")
+        self.active_preset[chan] = name
+
+    def sour_arb_upload(
+        self,
+        chan: int,
+        data: np.ndarray,
+        sample_format: str = "float32"
+    ) -> bool:
+        """
+        Uploads an arbitrary waveform as one binary block ('SOURx:TRAC:DATA:DATA #<n><len><data>')
+        instead of formatted text. Waveforms are identified by a hash of their samples:
+        the encoded block of recent waveforms is cached, and uploading the waveform that is
+        already loaded on the output (settings mirror) sends nothing at all.
+        Select it with ``sour_set(chan, func="ARBITRARY", ...)`` (without ``data``).
+
+        Parameters
+        ----------
+            chan (int) :
+                Output channel (either 1 or 2).
+            data (ndarray) :
+                Max 16384 samples. Floats in range {-1,1} (or {-5,5} for SIGNALlab),
+                or int16 DAC codes.
+            sample_format (str, optional) :
+                "float32" or "int16" (floats are scaled by 8191).
+                Defaults to "float32".
+
+        Returns
+        -------
+            True if the waveform was sent, False if it was already loaded.
+
+        Raises
+        ------
+
+            Raises errors if the input parameters are out of range.
+
+        """
+
+        try:
+            assert chan in (1,2)
+        except AssertionError as channel_err:
+            raise ValueError("Channel needs to be either 1 or 2") from channel_err
+
+        try:
+            dtype = self.arb_dtypes[sample_format]
+        except KeyError as format_err:
+            raise ValueError(f"Sample format needs to be one of {list(self.arb_dtypes)}") from format_err
+
+        data = np.asarray(data)
+        try:
+            assert 0 < data.size <= self.buff_size
+        except AssertionError as size_err:
+            raise ValueError(f"Waveform needs 1 to {self.buff_size} samples") from size_err
+
+        if dtype.kind == 'i' and data.dtype.kind == 'f':
+            data = np.round(data * 8191)
+        samples = np.ascontiguousarray(data, dtype=dtype)
+        digest = hashlib.blake2b(samples.tobytes(), digest_size=16, person=sample_format.encode()).hexdigest()
+
+        header = f"SOUR{chan}:TRAC:DATA:DATA"
+        if self.mirror.get(header) == f"#{digest}":
+            return False
+
+        block = self._arb_cache.get(digest)
+        if block is None:
+            payload = samples.tobytes()
+            length = str(len(payload))
+            block = f"#{len(length)}{length}".encode() + payload
+            self._arb_cache[digest] = block
+            while len(self._arb_cache) > self.arb_cache_size:
+                self._arb_cache.popitem(last=False)
+        self._arb_cache.move_to_end(digest)
+
+        self._socket.sendall(b"".join((f"{header} ".encode(), block, self.delimiter.encode())))
+        self.mirror[header] = f"#{digest}"
+        return True
+
     def acq_set(
         self,
         dec: int = 1,
@@ -384,6 +765,30 @@ class scpi (object):
 
         """
 
+        with self.transaction() as t:
+            for cmd in self._acq_set_commands(dec, trig_lvl, trig_delay, trig_delay_ns, units, sample_format,
+                                              averaging, gain, coupling, ext_trig_lvl, siglab, input4):
+                t.set(cmd)
+
+    @staticmethod
+    def _acq_set_commands(
+        dec: int = 1,
+        trig_lvl: float = 0,
+        trig_delay: int = 0,
+        trig_delay_ns: bool = False,
+        units: str = None,
+        sample_format: str = None,
+        averaging: bool = True,
+        gain: list = None,               # 2 channels (double the length if 4-input)
+        coupling: list = None,           # 2 channels
+        ext_trig_lvl: float = 0,
+        siglab: bool = False,
+        input4: bool = False
+    ) -> list:
+
+        """Checks the parameters of ``acq_set`` and returns the SCPI commands
+        that apply them."""
+
         ### Constants ###
         #decimation_list = [1,2,4,8,16,32,64,128,256,512,1024,2048,4096,8192,16384,32768,65536]
         gain_list = ["LV","HV"]
@@ -459,38 +864,100 @@ class scpi (object):
                              "'siglab' and 'input4' cannot be true at the same time.") from board_err
 
 
-        ### SEND COMMANDS TO RP ###
-        self.tx_txt(f"ACQ:DEC {dec}")
+        ### COMMANDS FOR RP ###
+        commands = []
+
+        commands.append(f"ACQ:DEC {dec}")
 
         if averaging:
-            self.tx_txt("ACQ:AVG ON")
+            commands.append("ACQ:AVG ON")
         else:
-            self.tx_txt("ACQ:AVG OFF")
+            commands.append("ACQ:AVG OFF")
 
         if trig_delay_ns:
-            self.tx_txt(f"ACQ:TRIG:DLY:NS {trig_delay}")
+            commands.append(f"ACQ:TRIG:DLY:NS {trig_delay}")
         else:
-            self.tx_txt(f"ACQ:TRIG:DLY {trig_delay}")
+            commands.append(f"ACQ:TRIG:DLY {trig_delay}")
 
         if units is not None:
-            self.tx_txt(f"ACQ:DATA:UNITS {units.upper()}")
+            commands.append(f"ACQ:DATA:UNITS {units.upper()}")
         if sample_format is not None:
-            self.tx_txt(f"ACQ:DATA:FORMAT {sample_format.upper()}")
+            commands.append(f"ACQ:DATA:FORMAT {sample_format.upper()}")
 
         if gain is not None:
             for i in range(n):
-                self.tx_txt(f"ACQ:SOUR{i+1}:GAIN {gain[i].upper()}")
+                commands.append(f"ACQ:SOUR{i+1}:GAIN {gain[i].upper()}")
 
-        self.tx_txt(f"ACQ:TRIG:LEV {trig_lvl}")
+        commands.append(f"ACQ:TRIG:LEV {trig_lvl}")
 
         if siglab and coupling is not None:
             for i in range(n):
-                self.tx_txt(f"ACQ:SOUR{i+1}:COUP {coupling[i].upper()}")
+                commands.append(f"ACQ:SOUR{i+1}:COUP {coupling[i].upper()}")
 
-            self.tx_txt(f"ACQ:TRIG:EXT:LEV {ext_trig_lvl}")
+            commands.append(f"ACQ:TRIG:EXT:LEV {ext_trig_lvl}")
 
         #print("ACQ set successfully")
 
+        return commands
+
+    @classmethod
+    def power_reading_settings(
+        cls,
+        integration_time: float,
+        samples: int = 8
+    ) -> tuple:
+        """
+        Returns the decimation and the number of samples of a power reading:
+        a handful of hardware averaged samples that together span the integration time.
+
+        Parameters
+        ----------
+            integration_time (float) :
+                Time window [s] the reading is averaged over.
+            samples (int, optional) :
+                Approximate number of samples per reading.
+                Defaults to 8.
+
+        Returns
+        -------
+            (dec, num_samples) : Power-of-two decimation {1, 2, 4, ... 65536} and
+            number of samples to read (e.g. with ``lat=True``).
+
+        """
+
+        raw_samples = integration_time * cls.sample_rate
+        dec = 2**int(np.clip(np.ceil(np.log2(max(raw_samples / samples, 1))), 0, 16))
+        num_samples = int(np.clip(round(raw_samples / dec), 1, cls.buff_size))
+        return dec, num_samples
+
+    def acq_set_power_reading(
+        self,
+        integration_time: float,
+        samples: int = 8,
+        **kwargs
+    ) -> int:
+        """
+        Sets decimation and hardware averaging for power readings over ``integration_time``.
+        Instead of transferring every sample at decimation 1 and averaging on the host,
+        the Red Pitaya averages the samples and only ``num_samples`` values are read.
+
+        Parameters
+        ----------
+            integration_time, samples :
+                See ``power_reading_settings``.
+            kwargs :
+                Further settings, passed to ``acq_set``.
+
+        Returns
+        -------
+            num_samples (int) : Number of samples per reading.
+
+        """
+
+        dec, num_samples = self.power_reading_settings(integration_time, samples)
+        self.acq_set(dec=dec, averaging=True, **kwargs)
+        return num_samples
+
     def get_settings(
         self,
         siglab: bool = False,
@@ -630,8 +1097,170 @@ class scpi (object):
         
         """
 
+        # Get data type from the mirror (read from Red Pitaya only if unknown)
+        units = self.get_setting('ACQ:DATA:UNITS')
+        # format = self.txrx_txt("ACQ:DATA:FORMAT?")
+
+        self.tx_txt(self._acq_data_query(chan, start, end, num_samples, old, lat, input4))
+
+        # Convert data
+        if binary:
+            buff_byte = self.rx_arb()
+
+            if convert:
+                buff = np.frombuffer(buff_byte, dtype=self.bin_dtypes[units]).tolist()
+            else:
+                buff = buff_byte
+        else:
+            buff_string = self.rx_txt()
+
+            if convert:
+                buff = self.parse_array(buff_string.encode('utf-8')).tolist()
+            else:
+                buff = buff_string
+
+        return buff
+
+    def acq_data_bin(
+        self,
+        chan: int,
+        start: int = None,
+        end: int = None,
+        num_samples: int = None,
+        old: bool = False,
+        lat: bool = False,
+        units: str = None,
+        raw_scale: float = None,
+        out: np.ndarray = None,
+        input4: bool = False
+    ) -> np.ndarray:
+        """
+        Returns the acquired data on a channel as a numpy array. Same read options
+        as ``acq_data``, but the data format of the Red Pitaya has to be set to
+        binary ('ACQ:DATA:FORMAT BIN').
+
+        The binary block is received straight into a preallocated buffer and
+        converted in one vectorized step, without creating a Python object per sample.
+
+        Parameters
+        ----------
+            chan, start, end, num_samples, old, lat, input4 :
+                See ``acq_data``.
+            units (str, optional) :
+                Units of the acquired data (VOLTS or RAW). If None, the units are
+                read from the Red Pitaya.
+                Defaults to None.
+            raw_scale (float, optional) :
+                Volts per LSB. If given and the units are RAW, the int16 samples are
+                scaled on the host and returned as float32 Volts.
+                Defaults to None.
+            out (ndarray, optional) :
+                Preallocated array the samples are written into. Must be large enough
+                for the requested number of samples.
+                Defaults to None.
+
+        Returns
+        -------
+            ndarray: float32 (VOLTS or scaled RAW) or int16 (RAW) samples in native
+            byte order. A view of ``out`` if it was given.
+
+        Raises
+        ------
+
+            Raises errors if the input parameters do not match one of the options.
+
+        """
+
+        query = self._acq_data_query(chan, start, end, num_samples, old, lat, input4)
+
+        if units is None:
+            units = self.get_setting('ACQ:DATA:UNITS')
+        units = units.upper()
+
+        try:
+            assert units in self.bin_dtypes
+        except AssertionError as unit_err:
+            raise ValueError(f"{units} is not a defined unit") from unit_err
+
+        self.tx_txt(query)
+        payload = self.rx_arb_into()
+        if payload is False:
+            raise ValueError("Red Pitaya did not answer with binary data. Is 'ACQ:DATA:FORMAT BIN' set?")
+
+        data = np.frombuffer(payload, dtype=self.bin_dtypes[units])
+        scale = (raw_scale is not None) and (units == "RAW")
+
+        if out is None:
+            out = np.empty(data.shape, dtype=np.float32 if scale else data.dtype.newbyteorder('='))
+        else:
+            out = out[:data.size]
+
+        if scale:
+            np.multiply(data, np.float32(raw_scale), out=out, casting='unsafe')
+        else:
+            np.copyto(out, data, casting='unsafe')
+
+        return out
+
+    def acq_data_array(
+        self,
+        chan: int,
+        start: int = None,
+        end: int = None,
+        num_samples: int = None,
+        old: bool = False,
+        lat: bool = False,
+        dtype: type = float,
+        input4: bool = False
+    ) -> np.ndarray:
+        """
+        Returns the acquired data on a channel as a numpy array. Same read options
+        as ``acq_data``, for the ASCII data format ('ACQ:DATA:FORMAT ASCII').
+
+        The reply is collected in one bytes buffer and parsed in one vectorized step.
+
+        Parameters
+        ----------
+            chan, start, end, num_samples, old, lat, input4 :
+                See ``acq_data``.
+            dtype (type, optional) :
+                Data type of the returned array.
+                Defaults to float.
+
+        Raises
+        ------
+
+            Raises errors if the input parameters do not match one of the options.
+
+        """
+
+        self.tx_txt(self._acq_data_query(chan, start, end, num_samples, old, lat, input4))
+        return self.rx_array(dtype=dtype, count=self._acq_data_count(start, end, num_samples, old, lat))
+
+    @classmethod
+    def _acq_data_query(
+        cls,
+        chan: int,
+        start: int = None,
+        end: int = None,
+        num_samples: int = None,
+        old: bool = False,
+        lat: bool = False,
+        input4: bool = False
+    ) -> str:
+        """
+        Checks the read options of ``acq_data`` and returns the matching
+        data query (without sending it).
+
+        Raises
+        ------
+
+            Raises errors if the input parameters do not match one of the options.
+
+        """
+
         low_lim = 0
-        up_lim = 16384
+        up_lim = cls.buff_size
 
         # Check input data for errors
         if input4:
@@ -652,64 +1281,477 @@ class scpi (object):
 
         if start is not None:
             try:
-                assert 16384 >= start >= 0
+                assert up_lim >= start >= 0
             except AssertionError as start_err:
                 raise ValueError(f"Start position out of range {low_lim, up_lim}") from start_err
 
         if end is not None:
             try:
-                assert 16384 >= end >= 0
+                assert up_lim >= end >= 0
             except AssertionError as end_err:
                 raise ValueError(f"End position out of range {low_lim, up_lim}") from end_err
 
         if num_samples is not None:
             try:
-                assert 16384 >= num_samples >= 0
+                assert up_lim >= num_samples >= 0
             except AssertionError as sample_err:
                 raise ValueError(f"Sample number out of range {low_lim, up_lim}") from sample_err
 
-        # Get data type from Red Pitaya
-        units = self.txrx_txt('ACQ:DATA:UNITS?')
-        # format = self.txrx_txt("ACQ:DATA:FORMAT?")
-
-
         # Determine the output data
         if(start is not None) and (end is not None):
-            self.tx_txt(f"ACQ:SOUR{chan}:DATA:STA:END? {start},{end}")
+            return f"ACQ:SOUR{chan}:DATA:STA:END? {start},{end}"
 
         elif(start is not None) and (num_samples is not None):
-            self.tx_txt(f"ACQ:SOUR{chan}:DATA:STA:N? {start},{num_samples}")
+            return f"ACQ:SOUR{chan}:DATA:STA:N? {start},{num_samples}"
 
         elif old and (num_samples is not None):
-            self.tx_txt(f"ACQ:SOUR{chan}:DATA:OLD:N? {num_samples}")
+            return f"ACQ:SOUR{chan}:DATA:OLD:N? {num_samples}"
 
         elif lat and (num_samples is not None):
-            self.tx_txt(f"ACQ:SOUR{chan}:DATA:LAT:N? {num_samples}")
+            return f"ACQ:SOUR{chan}:DATA:LAT:N? {num_samples}"
 
         else:
-            self.tx_txt(f"ACQ:SOUR{chan}:DATA?")
+            return f"ACQ:SOUR{chan}:DATA?"
 
-        # Convert data
-        if binary:
-            buff_byte = self.rx_arb()
+    @classmethod
+    def _acq_data_count(
+        cls,
+        start: int = None,
+        end: int = None,
+        num_samples: int = None,
+        old: bool = False,
+        lat: bool = False
+    ) -> int:
+        """
+        Returns the number of samples of the data query that ``_acq_data_query``
+        builds from the same read options.
+        """
 
-            if convert:
-                if units == "VOLTS":
-                    buff = [struct.unpack('!f',bytearray(buff_byte[i:i+4]))[0] for i in range(0, len(buff_byte), 4)]
-                elif units == "RAW":
-                    buff = [struct.unpack('!h',bytearray(buff_byte[i:i+2]))[0] for i in range(0, len(buff_byte), 2)]
-            else:
-                buff = buff_byte
+        if (start is not None) and (end is not None):
+            return (end - start) % cls.buff_size + 1
+        elif (num_samples is not None) and ((start is not None) or old or lat):
+            return num_samples
         else:
-            buff_string = self.rx_txt()
+            return cls.buff_size
 
-            if convert:
-                buff_string = buff_string.strip('{}\n\r').replace("  ", "").split(',')
-                buff = list(map(float, buff_string))
+
+    def acq_trigger_arm(
+        self,
+        chan: int,
+        level: float,
+        edge: str = "PE",
+        post: int = 8192,
+        input4: bool = False
+    ) -> None:
+        """
+        Starts the acquisition and arms a level trigger on a channel. The Red Pitaya
+        keeps acquiring for ``post`` samples after the trigger event and then stops,
+        so the samples around the event stay in the buffer until they are read.
+        Other acquisition settings (decimation, averaging, ...) are kept as set by ``acq_set``.
+
+        Parameters
+        ----------
+            chan (int) :
+                Input channel the trigger listens to (either 1 or 2).
+                (1-4 for STEMlab 125-14 4-Input)
+            level (float) :
+                Trigger level in Volts.
+            edge (str, optional) :
+                PE (positive edge) / NE (negative edge)
+                Defaults to "PE".
+            post (int, optional) :
+                Samples acquired after the trigger event (trigger delay) {0,1,...16384}
+                Defaults to 8192 (trigger event in the middle of the buffer).
+            input4 (bool, optional) :
+                Set to True if operating with STEMlab 125-14 4-Input.
+                Defaults to False.
+
+        Raises
+        ------
+
+            Raises errors if the input parameters are out of range.
+
+        """
+
+        try:
+            assert chan in ((1,2,3,4) if input4 else (1,2))
+        except AssertionError as chanel_err:
+            raise ValueError("Channel needs to be either 1 or 2 (1-4 for 4-Input)") from chanel_err
+
+        try:
+            assert edge.upper() in ("PE", "NE")
+        except AssertionError as edge_err:
+            raise ValueError("Edge needs to be either 'PE' or 'NE'") from edge_err
+
+        try:
+            assert self.buff_size >= post >= 0
+        except AssertionError as post_err:
+            raise ValueError(f"Post trigger samples out of range {0, self.buff_size}") from post_err
+
+        with self.transaction() as t:
+            t.set(f"ACQ:TRIG:LEV {level}")
+            t.set(f"ACQ:TRIG:DLY {post}")
+            t.tx_txt("ACQ:START")
+            t.tx_txt(f"ACQ:TRIG CH{chan}_{edge.upper()}")
+
+    def acq_trigger_disarm(self) -> None:
+        """
+        Disables the trigger armed by ``acq_trigger_arm`` and restarts the acquisition,
+        so the buffer keeps running (also if the trigger had already fired and stopped it).
+        """
+
+        with self.transaction() as t:
+            t.tx_txt("ACQ:START")
+            t.tx_txt("ACQ:TRIG DISABLED")
+
+    def acq_trigger_state(self) -> tuple:
+        """
+        Returns (triggered, filled) in one round trip: whether the armed trigger
+        has fired ('ACQ:TRIG:STAT?' is TD) and whether the buffer is filled ('ACQ:TRIG:FILL?').
+        """
+
+        with self.transaction() as t:
+            t.query("ACQ:TRIG:STAT?")
+            t.query("ACQ:TRIG:FILL?")
+        stat, fill = t.replies
+        return stat.strip() == "TD", fill.strip() == "1"
+
+    def acq_trigger_window(
+        self,
+        pre: int,
+        post: int,
+        chans: tuple = (1, 2),
+        binary: bool = False,
+        units: str = None
+    ) -> tuple:
+        """
+        Reads the samples around the last trigger event.
+
+        Parameters
+        ----------
+            pre (int) :
+                Samples before the trigger event.
+            post (int) :
+                Samples after the trigger event (at most the ``post`` of ``acq_trigger_arm``).
+            chans (tuple, optional) :
+                Channels to read.
+                Defaults to (1, 2).
+            binary (bool, optional) :
+                Set to True if the data format is binary ('ACQ:DATA:FORMAT BIN').
+                Defaults to False.
+            units (str, optional) :
+                Units of binary data, see ``acq_data_bin``.
+                Defaults to None.
+
+        Returns
+        -------
+            (tpos, windows) : Buffer position of the trigger event and a list with
+            one numpy array of ``pre + post`` samples per channel.
+
+        """
+
+        tpos = int(self.txrx_txt("ACQ:TPOS?"))
+        start = (tpos - pre) % self.buff_size
+
+        if binary:
+            if units is None:
+                units = self.get_setting('ACQ:DATA:UNITS')
+            windows = [self.acq_data_bin(chan, start=start, num_samples=pre + post, units=units)
+                       for chan in chans]
+        else:
+            with self.transaction() as t:
+                for chan in chans:
+                    t.acq_data_array(chan, start=start, num_samples=pre + post)
+            windows = t.replies
+        return tpos, windows
+
+    def acq_wait_trigger(
+        self,
+        pre: int,
+        post: int,
+        chans: tuple = (1, 2),
+        timeout: float = None,
+        poll_interval: float = 1e-3,
+        binary: bool = False,
+        units: str = None
+    ) -> tuple:
+        """
+        Blocks until the trigger armed with ``acq_trigger_arm`` has fired and the
+        acquisition is finished, then reads the window around the event.
+        The event is caught by the hardware trigger; the poll interval only
+        delays when it is read, not whether it is seen.
+
+        Parameters
+        ----------
+            pre, post, chans, binary, units :
+                See ``acq_trigger_window``.
+            timeout (float, optional) :
+                Maximum waiting time [s]. None waits forever.
+                Defaults to None.
+            poll_interval (float, optional) :
+                Time [s] between two trigger state queries.
+                Defaults to 1e-3.
+
+        Returns
+        -------
+            (tpos, windows) as ``acq_trigger_window``, or None if the timeout expired.
+
+        """
+
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while True:
+            triggered, filled = self.acq_trigger_state()
+            if triggered and filled:
+                return self.acq_trigger_window(pre, post, chans, binary, units)
+            if deadline is not None and time.perf_counter() >= deadline:
+                return None
+            time.sleep(poll_interval)
+
+    def axi_arm(
+        self,
+        chans: tuple,
+        num_samples: int,
+        dec: int = 1,
+        trig: str = "NOW",
+        level: float = 0,
+        units: str = "VOLTS"
+    ) -> None:
+        """
+        Arms a deep-memory capture (DMA to the board RAM reserved for the AXI acquisition).
+        After the trigger event ``num_samples`` samples per channel are written to RAM,
+        far more than the 16384 samples of the normal buffer. The reserved memory is split
+        equally between the channels. Read the capture with ``axi_read`` or use ``axi_capture``.
+        The data format is switched to binary ('ACQ:DATA:FORMAT BIN'); ``axi_disarm`` restores
+        the acquisition settings from before the capture.
+
+        Parameters
+        ----------
+            chans (tuple) :
+                Input channels to capture, e.g. (1,) or (1, 2).
+            num_samples (int) :
+                Samples per channel after the trigger event.
+            dec (int, optional) :
+                Decimation of the deep-memory acquisition.
+                Defaults to 1 (125 MS/s).
+            trig (str, optional) :
+                Trigger source (NOW, CH1_PE, CH1_NE, CH2_PE, CH2_NE, EXT_PE, EXT_NE).
+                Defaults to "NOW".
+            level (float, optional) :
+                Trigger level in Volts.
+                Defaults to 0.
+            units (str, optional) :
+                VOLTS (float32) or RAW (int16).
+                Defaults to "VOLTS".
+
+        Raises
+        ------
+
+            Raises errors if the capture doesn't fit into the reserved memory.
+
+        """
+
+        start = int(self.txrx_txt('ACQ:AXI:START?'))
+        size = int(self.txrx_txt('ACQ:AXI:SIZE?'))
+        chan_bytes = size // len(chans) // 2 * 2
+        self.axi_samples = chan_bytes // 2     # Samples per channel in RAM (int16)
+
+        try:
+            assert 0 < num_samples <= self.axi_samples
+        except AssertionError as size_err:
+            raise ValueError(f"Sample number out of range {1, self.axi_samples} "
+                             f"for {len(chans)} channel(s)") from size_err
+
+        try:
+            assert units.upper() in self.bin_dtypes
+        except AssertionError as units_err:
+            raise ValueError(f"Units need to be one of {list(self.bin_dtypes)}") from units_err
+
+        self.axi_restore = self._read_settings(self.axi_restored_settings)
+
+        with self.transaction() as t:
+            t.set('ACQ:DATA:FORMAT BIN')
+            t.tx_txt(f'ACQ:AXI:DATA:UNITS {units.upper()}')
+            t.tx_txt(f'ACQ:AXI:DEC {dec}')
+            for i, chan in enumerate(chans):
+                t.tx_txt(f'ACQ:AXI:SOUR{chan}:Trig:Dly {num_samples}')
+                t.tx_txt(f'ACQ:AXI:SOUR{chan}:SET:Buffer {start + i * chan_bytes},{chan_bytes}')
+                t.tx_txt(f'ACQ:AXI:SOUR{chan}:ENable ON')
+            t.set(f'ACQ:TRIG:LEV {level}')
+            t.tx_txt('ACQ:START')
+            t.tx_txt(f'ACQ:TRIG {trig.upper()}')
+        self.axi_units = units.upper()
+
+    def axi_disarm(self, chans: tuple) -> None:
+        """
+        Disables the deep-memory acquisition of the channels and restores the settings saved
+        by ``axi_arm`` (data format and units, decimation, averaging, trigger level and delay)
+        in one transaction. The trigger is disabled and the normal acquisition restarted.
+        """
+
+        with self.transaction() as t:
+            for chan in chans:
+                t.tx_txt(f'ACQ:AXI:SOUR{chan}:ENable OFF')
+            # Sent unconditionally, the deep-memory acquisition can change them behind the mirror
+            for header, value in (self.axi_restore or {}).items():
+                t.tx_txt(f'{header} {value}')
+            t.tx_txt('ACQ:START')
+            t.tx_txt('ACQ:TRIG DISABLED')
+        self.axi_restore = None
+
+    def _read_settings(self, headers):
+        """Returns {header: value} of settings; the ones that are not mirrored yet are
+        read from the Red Pitaya in one transaction."""
+        missing = [header for header in headers if header not in self.mirror]
+        if missing:
+            with self.transaction() as t:
+                for header in missing:
+                    t.query(header + '?')
+            for header, reply in zip(missing, t.replies):
+                self.mirror[header] = self._mirror_value(reply)
+        return {header: self.mirror[header] for header in headers}
+
+    def axi_wait(
+        self,
+        chans: tuple,
+        timeout: float = None,
+        poll_interval: float = 1e-3
+    ) -> bool:
+        """
+        Waits until the trigger of the deep-memory capture has fired and the RAM
+        buffers of all channels are filled, then stops the acquisition.
+        Returns False if the timeout [s] expired.
+        """
+
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while True:
+            with self.transaction() as t:
+                t.query('ACQ:TRIG:STAT?')
+                for chan in chans:
+                    t.query(f'ACQ:AXI:SOUR{chan}:TRIG:FILL?')
+            if t.replies[0].strip() == 'TD' and all(r.strip() == '1' for r in t.replies[1:]):
+                self.tx_txt('ACQ:STOP')
+                return True
+            if deadline is not None and time.perf_counter() >= deadline:
+                return False
+            time.sleep(poll_interval)
+
+    def axi_read(
+        self,
+        chan: int,
+        num_samples: int,
+        out: np.ndarray = None,
+        chunk: int = 2**20,
+        progress = None
+    ) -> np.ndarray:
+        """
+        Reads a deep-memory capture from the trigger position on, in binary chunks.
+
+        Each chunk is received straight into ``out`` (also an ``np.memmap``) and converted
+        to native byte order in place, if ``out`` has the sample type of the units
+        (float32 for VOLTS, int16 for RAW). Otherwise it is converted from a staging buffer.
+
+        Parameters
+        ----------
+            chan (int) :
+                Input channel.
+            num_samples (int) :
+                Number of samples to read.
+            out (ndarray, optional) :
+                Preallocated array (or memmap) of at least ``num_samples`` samples.
+                Defaults to None (a new array is allocated).
+            chunk (int, optional) :
+                Samples per query.
+                Defaults to 2**20.
+            progress (callable, optional) :
+                Called with (samples read, num_samples) after every chunk.
+                Defaults to None.
+
+        """
+
+        dtype = self.bin_dtypes[self.axi_units]
+        native = dtype.newbyteorder('=')
+        if out is None:
+            out = np.empty(num_samples, dtype=native)
+        direct = out.dtype == native and out.flags.c_contiguous
+
+        pos = int(self.txrx_txt(f'ACQ:AXI:SOUR{chan}:Trig:Pos?'))
+        staging = None if direct else bytearray(min(chunk, num_samples) * dtype.itemsize)
+
+        done = 0
+        while done < num_samples:
+            n = min(chunk, num_samples - done)
+            self.tx_txt(f'ACQ:AXI:SOUR{chan}:DATA:Start:N? {(pos + done) % self.axi_samples},{n}')
+            if direct:
+                view = self.rx_arb_into(out[done:done + n])
+                out[done:done + n].byteswap(inplace=True)
             else:
-                buff = buff_string
+                view = self.rx_arb_into(staging)
+                out[done:done + n] = np.frombuffer(view, dtype=dtype)
+            if view is False or len(view) != n * dtype.itemsize:
+                raise ValueError(f"Unexpected reply to the deep-memory query of {n} samples")
+            done += n
+            if progress is not None:
+                progress(done, num_samples)
 
-        return buff
+        return out
+
+    def axi_capture(
+        self,
+        chans: tuple,
+        num_samples: int,
+        dec: int = 1,
+        trig: str = "NOW",
+        level: float = 0,
+        units: str = "VOLTS",
+        out: list = None,
+        chunk: int = 2**20,
+        timeout: float = None,
+        progress = None
+    ) -> list:
+        """
+        Deep-memory capture of ``num_samples`` samples per channel: arms it (``axi_arm``),
+        waits for the trigger and the filled buffers (``axi_wait``), reads every channel
+        (``axi_read``) and disables the deep-memory acquisition again (``axi_disarm``), also
+        if the capture fails or times out.
+
+        Parameters
+        ----------
+            chans, num_samples, dec, trig, level, units :
+                See ``axi_arm``.
+            out (list, optional) :
+                One preallocated array or memmap per channel.
+                Defaults to None.
+            chunk (int, optional) :
+                Samples per query.
+                Defaults to 2**20.
+            timeout (float, optional) :
+                Maximum waiting time [s] for the trigger.
+                Defaults to None (waits forever).
+            progress (callable, optional) :
+                Called with (samples read, total samples of all channels).
+                Defaults to None.
+
+        Returns
+        -------
+            List with one array per channel, or None if the timeout expired.
+
+        """
+
+        self.axi_arm(chans, num_samples, dec, trig, level, units)
+        try:
+            if not self.axi_wait(chans, timeout):
+                return None
+
+            traces = []
+            total = num_samples * len(chans)
+            for i, chan in enumerate(chans):
+                report = None
+                if progress is not None:
+                    report = lambda done, n, offset=i * num_samples: progress(offset + done, total)
+                traces.append(self.axi_read(chan, num_samples, None if out is None else out[i], chunk, report))
+            return traces
+        finally:
+            self.axi_disarm(chans)
 
 
     def uart_set(
@@ -1015,3 +2057,122 @@ class scpi (object):
     def err_n(self):
         """Error next."""
         return self.txrx_txt('SYST:ERR:NEXT?')
+
+
+class Transaction (object):
+    """Batch of SCPI commands and queries that costs one network round trip.
+
+    Commands and queries are only buffered. On ``commit()`` (or at the end of a
+    ``with`` block) they are sent together with one ``sendall`` and the replies
+    of all queries are read back in order into ``replies``.
+    """
+
+    def __init__(self, client):
+        """Client is the ``scpi`` object (or anything with a ``commit`` method)
+        the transaction is sent with."""
+        self.client   = client
+        self.commands = []
+        self.settings = set()   # Indices of the commands that are mirrored settings
+        self.readers  = []
+        self.replies  = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+
+    def tx_txt(self, msg):
+        """Buffer a command without reply."""
+        self.commands.append(msg)
+
+    def set(self, msg):
+        """Buffer a setting; it's left out on commit if the client's mirror shows
+        that the value is already applied."""
+        self.settings.add(len(self.commands))
+        self.commands.append(msg)
+
+    def query(self, msg, reader=None):
+        """Buffer a query and return the index of its reply in ``replies``.
+
+        ``reader`` receives the reply and is called with the ``scpi`` object,
+        e.g. ``scpi.rx_array`` or ``scpi.rx_arb``. Defaults to ``scpi.rx_txt``.
+        Readers that return a view of the internal receive buffer
+        (``scpi.rx_arb_into``) must not be used for more than one query.
+        """
+        self.commands.append(msg)
+        self.readers.append(scpi.rx_txt if reader is None else reader)
+        return len(self.readers) - 1
+
+    def acq_data_array(self, chan, start=None, end=None, num_samples=None,
+                       old=False, lat=False, input4=False):
+        """Buffer a data query like ``scpi.acq_data_array``. The reply is a numpy array."""
+        return self.query(scpi._acq_data_query(chan, start, end, num_samples, old, lat, input4),
+                          functools.partial(scpi.rx_array,
+                                            count=scpi._acq_data_count(start, end, num_samples, old, lat)))
+
+    def commit(self):
+        """Send the buffered commands and read the replies. Returns ``replies``."""
+        self.replies  = self.client.commit(self)
+        self.commands = []
+        self.settings = set()
+        self.readers  = []
+        return self.replies
+
+
+class TriggerWatcher (object):
+    """Callback API of the trigger-armed acquisition.
+
+    A background thread arms the trigger (``scpi.acq_trigger_arm``), polls its state
+    (``scpi.acq_trigger_state``) and calls ``callback(tpos, windows)`` with
+    the window around it. By default the trigger is re-armed after every event.
+    The client can also be a ``RedPitayaSession``; the watcher's queries are then
+    queued with the requests of the other users of the connection.
+    """
+
+    def __init__(self, client, chan, level, callback, edge="PE", pre=0, post=100,
+                 chans=(1, 2), rearm=True, poll_interval=1e-3, binary=False, units=None):
+        """Trigger on ``chan`` at ``level`` and ``edge``; ``pre``/``post`` samples
+        of ``chans`` are passed to the callback. Starts with ``start()``."""
+        self.client        = client
+        self.chan          = chan
+        self.level         = level
+        self.callback      = callback
+        self.edge          = edge
+        self.pre           = pre
+        self.post          = post
+        self.chans         = chans
+        self.rearm         = rearm
+        self.poll_interval = poll_interval
+        self.binary        = binary
+        self.units         = units
+
+        self._stop   = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="TriggerWatcher", daemon=True)
+
+    def start(self):
+        """Arm the trigger and start watching."""
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        """Stop watching (after the current state query) and wait for the thread."""
+        self._stop.set()
+        if threading.current_thread() is not self._thread:
+            self._thread.join(timeout)
+
+    def _run(self):
+        # Every state query is a short request of its own, so a shared session
+        # isn't blocked while waiting for the event:
+        self.client.acq_trigger_arm(self.chan, self.level, self.edge, self.post)
+        while not self._stop.is_set():
+            triggered, filled = self.client.acq_trigger_state()
+            if not (triggered and filled):
+                self._stop.wait(self.poll_interval)
+                continue
+            self.callback(*self.client.acq_trigger_window(self.pre, self.post, self.chans,
+                                                          self.binary, self.units))
+            if not self.rearm:
+                return
+            self.client.acq_trigger_arm(self.chan, self.level, self.edge, self.post)
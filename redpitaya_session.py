@@ -0,0 +1,166 @@
+"""Shared, thread-safe access to one Red Pitaya connection."""
+
+import collections
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import numpy as np
+import redpitaya_scpi as scpi
+
+
+class RedPitayaSession:
+    """Owns the SCPI connection to a Red Pitaya and serializes all access to it.
+
+    Every request is put into one queue and executed by the session thread, so the
+    request/reply pairs of several consumers (e.g. the BBO worker thread and the GUI
+    thread sending pulses) can't interleave on the wire.
+
+    Methods of ``redpitaya_scpi.scpi`` are forwarded, so a session can be used in place
+    of the scpi object: ``session.acq_data_array(1, start=1, num_samples=3000)`` or
+    ``with session.transaction() as t: ...`` each run as one request.
+    """
+
+    _stop = object()  # Sentinel in the request queue
+
+    def __init__(self, host, timeout=None, port=5000, client=None, history=1000):
+        """Opens the connection and starts the session thread.
+
+        Args:
+            host (str): IP address of the Red Pitaya (SCPI server needs to be turned on)
+            timeout (float, optional): Socket timeout [s]. Defaults to None.
+            port (int, optional): Port of the SCPI server. Defaults to 5000.
+            client (scpi, optional): Already opened client to use instead of opening a new one.
+            history (int, optional): Number of requests the wait/service time percentiles
+                are calculated from. Defaults to 1000.
+        """
+        self.host = host
+        self.rp = client if client is not None else scpi.scpi(host, timeout=timeout, port=port)
+
+        self._requests = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._wait_times = collections.deque(maxlen=history)
+        self._service_times = collections.deque(maxlen=history)
+        self.reset_statistics()
+
+        self._thread = threading.Thread(target=self._serve, name=f"RedPitayaSession({host})", daemon=True)
+        self._thread.start()
+
+    def __getattr__(self, name):
+        """Forwards the methods of the scpi client as queued requests."""
+        if name.startswith('_') or not callable(getattr(scpi.scpi, name, None)):
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+
+        def request(*args, **kwargs):
+            return self.call(lambda rp: getattr(rp, name)(*args, **kwargs))
+        request.__name__ = name
+        request.__doc__ = getattr(scpi.scpi, name).__doc__
+        return request
+
+    def _serve(self):
+        """Executes the queued requests one after another."""
+        while True:
+            item = self._requests.get()
+            if item is self._stop:
+                return
+            future, function, enqueued = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            started = time.perf_counter()
+            try:
+                result = function(self.rp)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+            finished = time.perf_counter()
+
+            with self._stats_lock:
+                self._wait_times.append(started - enqueued)
+                self._service_times.append(finished - started)
+                self._completed += 1
+                self._max_wait = max(self._max_wait, started - enqueued)
+
+    def submit(self, function):
+        """Queues ``function(rp)`` and returns a ``concurrent.futures.Future`` of its result.
+
+        Args:
+            function (callable): Gets called with the scpi client on the session thread.
+        """
+        future = Future()
+        if threading.current_thread() is self._thread:
+            # Nested request from the session thread itself, queueing it would deadlock
+            future.set_result(function(self.rp))
+            return future
+        if not self._thread.is_alive():
+            raise ConnectionError("Red Pitaya session is closed")
+
+        self._requests.put((future, function, time.perf_counter()))
+        with self._stats_lock:
+            self._submitted += 1
+            self._max_depth = max(self._max_depth, self._requests.qsize())
+        return future
+
+    def call(self, function, timeout=None):
+        """Queues ``function(rp)``, waits for it and returns its result (or raises its exception)."""
+        return self.submit(function).result(timeout)
+
+    def transaction(self):
+        """Returns a ``Transaction`` that gets committed as one request of this session."""
+        return scpi.Transaction(self)
+
+    def commit(self, transaction):
+        """Sends a transaction and reads its replies as one request."""
+        return self.call(lambda rp: rp.commit(transaction))
+
+    @property
+    def queue_depth(self):
+        """Number of requests that are waiting to be executed."""
+        return self._requests.qsize()
+
+    def statistics(self):
+        """Returns the contention statistics of the session.
+
+        Returns:
+            dict: Number of submitted and completed requests, current and maximum
+            queue depth, and the mean/p50/p99/max wait time and mean/p99 service time [s]
+            of the last requests.
+        """
+        with self._stats_lock:
+            waits = np.array(self._wait_times)
+            services = np.array(self._service_times)
+            stats = {
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "queue_depth": self._requests.qsize(),
+                "max_queue_depth": self._max_depth,
+                "max_wait": self._max_wait,
+            }
+        if waits.size:
+            stats.update({
+                "mean_wait": float(np.mean(waits)),
+                "p50_wait": float(np.percentile(waits, 50)),
+                "p99_wait": float(np.percentile(waits, 99)),
+                "mean_service": float(np.mean(services)),
+                "p99_service": float(np.percentile(services, 99)),
+            })
+        return stats
+
+    def reset_statistics(self):
+        """Resets all counters and the recorded wait/service times."""
+        with self._stats_lock:
+            self._submitted = 0
+            self._completed = 0
+            self._max_depth = 0
+            self._max_wait = 0.0
+            self._wait_times.clear()
+            self._service_times.clear()
+
+    def close(self):
+        """Executes the requests that are still queued, stops the session thread and
+        closes the connection."""
+        if self._thread.is_alive():
+            self._requests.put(self._stop)
+            if threading.current_thread() is not self._thread:
+                self._thread.join()
+        self.rp.close()
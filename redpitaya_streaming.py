@@ -0,0 +1,177 @@
+"""Gap-free streaming of Red Pitaya inputs into a NumPy ring buffer.
+
+The acquisition of the Red Pitaya runs continuously (ACQ:START without a trigger)
+and its 16384-sample buffer is read back-to-back over SCPI: every round trip reads
+the samples up to the write position ('ACQ:WPOS?') reported by the previous one
+and queries the new write position. As long as two consecutive reads finish within
+one buffer length (16384 * decimation / 125 MS/s, e.g. 67 ms at decimation 512) no
+sample is lost; otherwise the loss is counted in ``overruns``. Consumers read windows from the ring buffer without device
+round trips:
+
+    stream = RedPitayaStream(rp, chans=(1, 2)).start()
+    uv, extraction = stream.buffer.latest(6)
+"""
+
+import threading
+import time
+import numpy as np
+import redpitaya_scpi as scpi
+
+
+class RingBuffer:
+    """Fixed-size ring buffer of multi-channel samples with an absolute sample count.
+
+    Samples are addressed by their absolute index (0 is the first sample ever written),
+    windows are returned as copies of shape (channels, n).
+    """
+
+    def __init__(self, capacity, channels=1, dtype=np.float32):
+        """
+        Args:
+            capacity (int): Number of samples per channel that are kept.
+            channels (int, optional): Number of channels. Defaults to 1.
+            dtype (dtype, optional): Sample type. Defaults to np.float32.
+        """
+        self.capacity = int(capacity)
+        self.data = np.zeros((channels, self.capacity), dtype=dtype)
+        self.total = 0  # Number of samples written so far
+        self._lock = threading.Lock()
+
+    def write(self, block):
+        """Appends a block of shape (channels, n)."""
+        block = np.asarray(block)
+        n = block.shape[1]
+        with self._lock:
+            if n > self.capacity:
+                self.total += n - self.capacity
+                block, n = block[:, -self.capacity:], self.capacity
+            i = self.total % self.capacity
+            first = min(n, self.capacity - i)
+            self.data[:, i:i + first] = block[:, :first]
+            self.data[:, :n - first] = block[:, first:]
+            self.total += n
+
+    def read(self, start, n):
+        """Returns the samples with absolute indices start to start + n - 1.
+
+        Raises:
+            IndexError: Part of the window was already overwritten or isn't written yet.
+        """
+        with self._lock:
+            if start < self.total - self.capacity or start + n > self.total:
+                raise IndexError(f"Samples {start}..{start + n - 1} not in the ring buffer "
+                                 f"({max(self.total - self.capacity, 0)}..{self.total - 1})")
+            return self._read(start, n)
+
+    def _read(self, start, n):
+        i = start % self.capacity
+        if i + n <= self.capacity:
+            return self.data[:, i:i + n].copy()
+        return np.concatenate((self.data[:, i:], self.data[:, :i + n - self.capacity]), axis=1)
+
+    def latest(self, n):
+        """Returns the newest n samples (fewer if less were written)."""
+        with self._lock:
+            n = min(n, self.total, self.capacity)
+            return self._read(self.total - n, n)
+
+    def read_since(self, cursor):
+        """Returns the samples written since ``cursor`` (an absolute index, e.g. 0 or the
+        cursor of the previous call) and the new cursor. Samples that were already
+        overwritten are skipped."""
+        with self._lock:
+            start = max(cursor, self.total - self.capacity)
+            return self._read(start, self.total - start), self.total
+
+
+class RedPitayaStream:
+    """Streams inputs of a Red Pitaya into a ``RingBuffer`` in a background thread."""
+
+    def __init__(self, client, chans=(1, 2), capacity=2**20, binary=False, units="VOLTS", poll_interval=None):
+        """The acquisition has to be started (ACQ:START, no trigger armed) before ``start()``.
+
+        Args:
+            client (scpi): scpi client or RedPitayaSession.
+            chans (tuple, optional): Inputs to stream. Defaults to (1, 2).
+            capacity (int, optional): Samples per channel kept in the ring buffer. Defaults to 2**20.
+            binary (bool, optional): Set to True if the data format is binary
+                ('ACQ:DATA:FORMAT BIN'). Defaults to False.
+            units (str, optional): Units of binary data. Defaults to "VOLTS".
+            poll_interval (float, optional): Time [s] between two reads. Defaults to None
+                (an eighth of the buffer length).
+        """
+        self.client = client
+        self.chans = tuple(chans)
+        self.buffer = RingBuffer(capacity, len(self.chans))
+        self.binary = binary
+        self.dtype = scpi.scpi.bin_dtypes[units.upper()]
+        self.poll_interval = poll_interval
+
+        self.sample_rate = None  # Samples/s, known after start()
+        self.reads = 0
+        self.overruns = 0        # Number of times samples were lost
+        self.gaps = []           # Absolute sample index in the ring buffer after each loss
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Starts streaming."""
+        dec = int(self.client.get_setting('ACQ:DEC'))
+        self.sample_rate = scpi.scpi.sample_rate / dec
+        if self.poll_interval is None:
+            self.poll_interval = scpi.scpi.buff_size / self.sample_rate / 8
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="RedPitayaStream", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        """Stops streaming and waits for the thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _read_chunk(self, t, start, n):
+        """Buffers the data queries of one chunk in the transaction."""
+        for chan in self.chans:
+            if self.binary:
+                t.query(scpi.scpi._acq_data_query(chan, start=start, num_samples=n), scpi.scpi.rx_arb)
+            else:
+                t.acq_data_array(chan, start=start, num_samples=n)
+
+    def _run(self):
+        buffer_time = scpi.scpi.buff_size / self.sample_rate
+        last = int(self.client.txrx_txt('ACQ:WPOS?'))
+        wpos, observed = last, time.perf_counter()  # Write position and when it was read
+        last_observed = observed
+
+        while not self._stop.is_set():
+            started = time.perf_counter()
+            n = (wpos - last) % scpi.scpi.buff_size
+            with self.client.transaction() as t:
+                if n:
+                    self._read_chunk(t, last, n)
+                t.query('ACQ:WPOS?')
+            now = time.perf_counter()
+            self.reads += 1
+
+            if now - last_observed < buffer_time:
+                if n:
+                    block = t.replies[:-1]
+                    if self.binary:
+                        block = [np.frombuffer(data, dtype=self.dtype) for data in block]
+                    self.buffer.write(np.array(block))
+            else:
+                # The oldest samples of the chunk were overwritten before they were read
+                self.overruns += 1
+                self.gaps.append(self.buffer.total)
+
+            last, last_observed = wpos, observed
+            wpos, observed = int(t.replies[-1]), now
+            self._stop.wait(max(self.poll_interval - (time.perf_counter() - started), 0))
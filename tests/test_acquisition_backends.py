@@ -0,0 +1,73 @@
+import time
+
+import pytest
+
+import acquisition_backends
+import redpitaya_emulator
+import redpitaya_scpi
+
+
+@pytest.fixture
+def emulator():
+    with redpitaya_emulator.RedPitayaEmulator(seed=0) as emulator:
+        yield emulator
+
+
+@pytest.fixture
+def rp(emulator):
+    host, port = emulator.address
+    client = redpitaya_scpi.scpi(host, port=port)
+    yield client
+    client.close()
+
+
+@pytest.mark.parametrize("name", ["scpi_ascii", "scpi_binary"])
+def test_disarm_restarts_acquisition_after_event(emulator, rp, name):
+    backend = acquisition_backends.make_backend({"backend": name, "post": 16}, client=rp)
+    backend.setup(window=24e-6)
+    backend.arm_event(2, -10)
+    rp.tx_txt("ACQ:TRIG NOW")  # Fires the armed trigger
+    time.sleep(0.01)
+    assert backend.event_fired()
+    time.sleep(0.01)  # Post trigger samples
+    frozen = emulator.latest_index()
+    time.sleep(0.01)
+    assert emulator.latest_index() == frozen  # The acquisition stopped after the event
+
+    backend.disarm_event()
+    assert not backend.event_fired()
+    assert rp.txrx_txt("ACQ:TRIG:STAT?").strip() == "WAIT"  # Also waits for the disarm
+    assert emulator.trig_source == "DISABLED"
+    first = emulator.latest_index()
+    time.sleep(0.01)
+    assert emulator.latest_index() > first
+
+
+def test_backend_interface_is_abstract():
+    with pytest.raises(TypeError):
+        acquisition_backends.AcquisitionBackend()
+
+
+def test_compare_backends_resets_acquisition(emulator):
+    import redpitaya_benchmark
+
+    host, port = emulator.address
+    results = redpitaya_benchmark.compare_backends(host, port, samples=100, iterations=3, emulator=emulator)
+    assert "scpi_ascii power" in results and "scpi_binary read" in results
+    assert emulator.trig_source == "DISABLED"
+    assert emulator.settings["ACQ:DATA:FORMAT"] == "ASCII"
+    assert int(emulator.settings["ACQ:DEC"]) == 1
+
+
+@pytest.mark.parametrize("name", ["scpi_ascii", "scpi_binary"])
+def test_raw_trace_with_event_in_one_transaction(emulator, rp, name):
+    backend = acquisition_backends.make_backend({"backend": name}, client=rp)
+    backend.setup(window=24e-6)
+    assert backend.sample_rate < 125e6
+    backend.setup(dec=1)
+    assert backend.sample_rate == 125e6
+    backend.arm_event(2, -10)
+    trace, fired = backend.read_with_event(1, backend.samples_for(24e-6))
+    assert trace.size == 3000
+    assert not fired
+    assert int(emulator.settings["ACQ:DEC"]) == 1
@@ -0,0 +1,23 @@
+import math
+import pytest
+
+pytest.importorskip("PyQt6")
+pytest.importorskip("toptica.lasersdk")
+
+import DFB_simulation
+import loop_timing
+
+
+def test_step_response_settles_on_the_simulation_clock():
+    result = DFB_simulation.benchmark_stabilisation(speed=10, step=0.01, settle=5.0, duration=20.0)
+    assert math.isfinite(result["settle_time"]) and result["settle_time"] < 15.0
+    assert abs(result["residual_mean"]) < 1e-4
+    assert result["residual_std"] < 1e-4
+    # 10 control steps per second of simulation time, not of real time (due times after overruns are skipped)
+    timing = result["timing"]
+    assert timing["iterations"] + timing["skipped"] == pytest.approx(250, rel=0.1)
+
+
+def test_dfb_defaults_to_real_time():
+    import DFB_functions
+    assert DFB_functions.DFB().clock is loop_timing.system_clock
@@ -0,0 +1,92 @@
+import pytest
+
+import DFB_simulation
+import dlc_mirror
+
+NAMES = ["laser1.dl.tc.temp_set", "laser1.dl.cc.current_set", "laser1.wide_scan.scan_end"]
+
+
+@pytest.fixture
+def dlc():
+    model = DFB_simulation.DfbModel(clock=DFB_simulation.SimulationClock(), seed=0)
+    with DFB_simulation.SimulatedDLCpro(model) as dlc:
+        yield dlc
+
+
+@pytest.fixture
+def mirror(dlc):
+    mirror = dlc_mirror.DlcParameterMirror(dlc, NAMES).start()
+    mirror.poll()  # The initial values count as changed
+    yield mirror
+    mirror.stop()
+
+
+def test_start_reads_and_subscribes(dlc):
+    mirror = dlc_mirror.DlcParameterMirror(dlc, NAMES).start()
+    assert mirror.poll() == set(NAMES)
+    assert mirror.get("laser1.dl.tc.temp_set") == dlc.laser1.dl.tc.temp_set.get()
+    assert mirror.get("laser1.wide_scan.scan_end") == dlc.model.scan_end
+    assert len(dlc.subscriptions) == len(NAMES)
+    with pytest.raises(KeyError):
+        mirror.get("laser1.dl.tc.temp_act")
+
+
+def test_poll_calls_handlers_with_the_changed_parameters(dlc, mirror):
+    calls = []
+    mirror.add_handler(calls.append)
+    assert mirror.poll() == set()
+    assert calls == []
+
+    dlc.laser1.dl.tc.temp_set.set(21.5)  # Not through the mirror: arrives with the subscription
+    assert mirror.get("laser1.dl.tc.temp_set") == 20.0
+    assert mirror.poll() == {"laser1.dl.tc.temp_set"}
+    assert calls == [{"laser1.dl.tc.temp_set"}]
+    assert mirror.get("laser1.dl.tc.temp_set") == 21.5
+
+    mirror.remove_handler(calls.append)
+    dlc.laser1.wide_scan.scan_end.set(30.0)
+    assert mirror.poll() == {"laser1.wide_scan.scan_end"}
+    assert len(calls) == 1
+
+
+def test_set_writes_through(dlc, mirror):
+    mirror.set("laser1.dl.cc.current_set", 120.0)
+    assert dlc.model.current_set == 120.0
+    assert mirror.get("laser1.dl.cc.current_set") == 120.0  # Without waiting for the update
+    assert mirror.poll() == {"laser1.dl.cc.current_set"}
+    assert mirror.poll() == set()
+
+
+def test_stop_cancels_the_subscriptions_and_keeps_the_values(dlc, mirror):
+    mirror.stop()
+    assert dlc.subscriptions == []
+    dlc.laser1.dl.tc.temp_set.set(22.0)
+    assert mirror.poll() == set()
+    assert mirror.get("laser1.dl.tc.temp_set") == 20.0
+
+
+def test_failed_start_cancels_the_subscriptions(dlc):
+    def unavailable():
+        raise DFB_simulation.DecopError("parameter unavailable")
+    dlc.laser1.wide_scan.scan_end.get = unavailable
+    with pytest.raises(DFB_simulation.DecopError):
+        dlc_mirror.DlcParameterMirror(dlc, NAMES).start()
+    assert dlc.subscriptions == []
+
+
+def test_connect_dfb_closes_the_dlc_if_the_mirror_fails(dlc):
+    pytest.importorskip("PyQt6")
+    pytest.importorskip("toptica.lasersdk")
+    import DFB_functions
+
+    def busy():
+        raise DFB_simulation.DecopError("busy")
+    dlc.laser1.wide_scan.scan_end.get = busy
+    dfb = DFB_functions.DFB()
+    dfb.dlc_factory = lambda ip: dlc
+    messages = []
+    dfb.update_textBox.connect(messages.append)
+    dfb.connect_dfb("simulated")
+    assert not dlc.is_open
+    assert dfb.mirror is None
+    assert "connection closed" in messages[-1]
@@ -0,0 +1,50 @@
+import math
+import pytest
+
+import loop_timing
+
+
+def test_iterations_on_time():
+    timing = loop_timing.LoopTiming(period=0.1)
+    due = 0.0
+    for i in range(5):
+        started = due + 0.001 * i
+        due = timing.record(due, started, started + 0.01)
+    assert due == pytest.approx(0.5)
+    stats = timing.as_dict()
+    assert (stats["iterations"], stats["overruns"], stats["skipped"]) == (5, 0, 0)
+    assert stats["latency_max"] == pytest.approx(0.004)
+    assert stats["duration_mean"] == pytest.approx(0.01)
+    assert stats["period_mean"] == pytest.approx(0.101)
+    assert stats["jitter"] == pytest.approx(0.0, abs=1e-12)
+
+
+def test_overrun_skips_the_missed_due_times():
+    timing = loop_timing.LoopTiming(period=0.1)
+    # Ends at 0.35: the iterations due at 0.1, 0.2 and 0.3 are skipped, not caught up
+    assert timing.record(0.0, 0.0, 0.35) == pytest.approx(0.4)
+    assert (timing.overruns, timing.skipped) == (1, 2)
+    # Ends just after the next due time: one overrun, nothing skipped
+    assert timing.record(0.4, 0.4, 0.55) == pytest.approx(0.6)
+    assert (timing.overruns, timing.skipped) == (2, 2)
+
+
+@pytest.mark.parametrize("iterations", [0, 1, 2])
+def test_summary_without_enough_iterations(iterations):
+    timing = loop_timing.LoopTiming(period=0.1)
+    for i in range(iterations):
+        timing.record(0.1 * i, 0.1 * i, 0.1 * i + 0.01)
+    summary = timing.summary()
+    assert "nan" not in summary
+    assert summary.startswith(f"{iterations} iterations")
+    assert ("jitter n/a" in summary) == (iterations < 3)  # Two periods need three iterations
+    assert ("latency n/a" in summary) == (iterations == 0)
+    assert math.isnan(timing.as_dict()["jitter"]) == (iterations < 3)
+
+
+def test_reset():
+    timing = loop_timing.LoopTiming(period=0.1)
+    timing.record(0.0, 0.0, 0.25)
+    timing.reset()
+    assert timing.as_dict()["iterations"] == 0
+    assert math.isnan(timing.as_dict()["latency_mean"])
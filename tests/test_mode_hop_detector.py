@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+import WLM_functions
+import WLM_simulation
+
+
+@pytest.fixture
+def detector():
+    dll = WLM_simulation.SimulatedWlmData(noise=0, drift=0, seed=0)
+    wlm = WLM_functions.WavelengthMeter(dll=dll, interferometers=dll.interferometers)
+    detector = WLM_functions.ModeHopDetector(wlm, good_after=1)
+    wlm.enable_pattern()
+    yield dll, detector
+    dll.stop()
+
+
+def test_all_interferometers_are_scored(detector):
+    dll, detector = detector
+    assert detector.interferometers == dll.interferometers == 5
+    assert detector.update().contrast == pytest.approx(1.0)
+    assert detector.reference.size == 5
+
+
+def test_single_mode_stays_good_while_tuning(detector):
+    dll, detector = detector
+    for wavelength in np.linspace(1029, 1031, 50):
+        dll.measured[1] = wavelength
+        assert not detector.score(dll.pattern(1)).bad
+
+
+@pytest.mark.parametrize("weight", [1.0, 0.5])
+def test_side_modes_are_flagged_at_all_offsets(detector, weight):
+    dll, detector = detector
+    for wavelength in np.linspace(1029.5, 1030.5, 10):  # Single-mode reference
+        dll.measured[1] = wavelength
+        detector.score(dll.pattern(1))
+    dll.measured[1] = 1030.0
+    for offset in np.linspace(0.03, 1.0, 98):
+        dll.set_multimode(1, offset, weight)
+        assert detector.update().bad, f"side mode at {offset:.3f} nm not flagged"
+        dll.set_multimode(1, weight=0)
+        assert not detector.update().bad
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+import pulse_metrics
+
+
+def pulse_train(n=3000, period=300, width=10, amplitude=0.5, noise=0.005, seed=0):
+    rng = np.random.default_rng(seed)
+    trace = rng.normal(0.02, noise, n)
+    for start in range(50, n - width, period):
+        trace[start:start + width] += amplitude
+    return trace
+
+
+def test_pulses_are_found():
+    metrics = pulse_metrics.analyze_trace(pulse_train())
+    assert metrics["count"] == 10
+    np.testing.assert_array_equal(metrics["starts"], np.arange(50, 3000, 300))
+    assert metrics["mean_peak"] == pytest.approx(0.52, abs=0.02)
+    assert metrics["mean_width"] == pytest.approx(10 / 125e6)
+    assert metrics["mean_integral"] == pytest.approx(0.5 * 10 / 125e6, rel=0.05)
+
+
+def test_noise_only_trace_has_no_pulses():
+    metrics = pulse_metrics.analyze_trace(pulse_train(amplitude=0))
+    assert metrics["count"] == 0
+    assert metrics["threshold"] >= metrics["baseline"] + 5 * metrics["noise"]
+    assert pulse_metrics.optimizer_value(metrics, "mean_integral") == 0.0
+
+
+def test_explicit_threshold_is_kept_above_the_noise():
+    metrics = pulse_metrics.analyze_trace(pulse_train(amplitude=0), threshold=0.0)
+    assert metrics["count"] == 0
+    assert pulse_metrics.analyze_trace(pulse_train(amplitude=0), threshold=0.0, noise_factor=0)["count"] > 0
+
+
+@pytest.mark.parametrize("trace", [[], np.empty(0, dtype=np.float32)])
+def test_empty_trace(trace):
+    metrics = pulse_metrics.analyze_trace(trace)
+    assert metrics["count"] == 0
+    assert metrics["starts"].size == 0
+    assert np.isnan(metrics["mean"]) and np.isnan(metrics["mean_peak"])
+    assert pulse_metrics.optimizer_value(metrics, "mean_peak") == 0.0
+    pulse_metrics.summary(metrics)
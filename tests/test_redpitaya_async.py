@@ -0,0 +1,67 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+import redpitaya_async
+import redpitaya_emulator
+
+
+@pytest.fixture
+def emulator():
+    with redpitaya_emulator.RedPitayaEmulator(seed=0) as emulator:
+        yield emulator
+
+
+def run(coroutine):
+    return asyncio.run(asyncio.wait_for(coroutine, 5))
+
+
+def test_pipelined_queries_keep_their_order(emulator):
+    async def main():
+        async with redpitaya_async.AsyncScpi(emulator.address[0], port=emulator.address[1]) as rp:
+            await rp.tx_txt_many(["ACQ:RST", "ACQ:DEC 4", "ACQ:START"])
+            return await asyncio.gather(
+                rp.txrx_txt("ACQ:DEC?"),
+                rp.acq_data(1, start=1, num_samples=3000),
+                rp.idn_q(),
+                rp.acq_data(2, start=1, num_samples=100))
+    dec, uv, idn, extraction = run(main())
+    assert dec == "4"
+    assert idn.startswith("REDPITAYA")
+    assert uv.shape == (3000,) and extraction.shape == (100,)
+
+
+def test_binary_data(emulator):
+    async def main():
+        async with redpitaya_async.AsyncScpi(emulator.address[0], port=emulator.address[1]) as rp:
+            await rp.acq_set(dec=1, units="RAW", sample_format="BIN")
+            await rp.tx_txt("ACQ:START")
+            return await rp.acq_data(1, start=1, num_samples=500, binary=True)
+    data = run(main())
+    assert data.dtype == np.int16 and data.shape == (500,)
+
+
+def test_close_fails_the_query_in_flight(emulator):
+    emulator.latency = 0.5
+
+    async def main():
+        rp = redpitaya_async.AsyncScpi(emulator.address[0], port=emulator.address[1])
+        await rp.open()
+        in_flight = asyncio.create_task(rp.txrx_txt("*IDN?"))
+        queued = asyncio.create_task(rp.txrx_txt("ACQ:DEC?"))
+        await asyncio.sleep(0.1)  # The reply task waits for the reply of *IDN?
+        await rp.close()
+        return await asyncio.gather(in_flight, queued, return_exceptions=True)
+    results = run(main())
+    assert all(isinstance(result, ConnectionError) for result in results)
+
+
+def test_query_after_close_fails(emulator):
+    async def main():
+        rp = redpitaya_async.AsyncScpi(emulator.address[0], port=emulator.address[1])
+        await rp.open()
+        await rp.close()
+        await rp.txrx_txt("*IDN?")
+    with pytest.raises(ConnectionError):
+        run(main())
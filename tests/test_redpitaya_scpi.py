@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+
+import redpitaya_emulator
+import redpitaya_scpi
+
+
+@pytest.fixture
+def emulator():
+    with redpitaya_emulator.RedPitayaEmulator(seed=0) as emulator:
+        yield emulator
+
+
+@pytest.fixture
+def rp(emulator):
+    host, port = emulator.address
+    client = redpitaya_scpi.scpi(host, port=port)
+    yield client
+    client.close()
+
+
+def test_parse_array():
+    data = redpitaya_scpi.scpi.parse_array(b"{1.5,-2e-3, 3}\r\n")
+    np.testing.assert_array_equal(data, [1.5, -2e-3, 3])
+    assert redpitaya_scpi.scpi.parse_array(b"{}").size == 0
+    assert redpitaya_scpi.scpi.parse_array(b"{1,2}", dtype=np.int16).dtype == np.int16
+
+
+@pytest.mark.parametrize("reply", [b"{1.5,,3}", b"{1.5,abc}", b"#2101234567890", b"ERR!"])
+def test_parse_array_rejects_malformed_replies(reply):
+    with pytest.raises(ValueError):
+        redpitaya_scpi.scpi.parse_array(reply)
+
+
+def test_parse_array_checks_count():
+    assert redpitaya_scpi.scpi.parse_array(b"{1,2,3}", count=3).size == 3
+    with pytest.raises(ValueError, match="2 values instead of 3"):
+        redpitaya_scpi.scpi.parse_array(b"{1,2}", count=3)
+
+
+def test_acq_data_array(rp):
+    rp.tx_txt("ACQ:START")
+    data = rp.acq_data_array(1, lat=True, num_samples=1000)
+    assert data.shape == (1000,) and data.dtype == float
+
+
+@pytest.mark.parametrize("options, size", [
+    ({"num_samples": 100}, 16384),                           # Whole buffer, N isn't sent
+    ({"start": 10, "end": 109, "num_samples": 5}, 100),      # STA:END
+    ({"start": 16000, "end": 99}, 484),                      # STA:END across the end of the buffer
+    ({"start": 10, "num_samples": 300}, 300),
+    ({"old": True, "num_samples": 300}, 300),
+])
+def test_acq_data_array_read_options(rp, options, size):
+    rp.tx_txt("ACQ:START")
+    assert rp.acq_data_array(1, **options).size == size
+    with rp.transaction() as t:
+        t.acq_data_array(2, **options)
+    assert t.replies[0].size == size
+
+
+def test_transaction_acq_data_array(rp):
+    rp.tx_txt("ACQ:START")
+    with rp.transaction() as t:
+        t.acq_data_array(1, lat=True, num_samples=500)
+        t.acq_data_array(2, lat=True, num_samples=200)
+        t.query("ACQ:TRIG:STAT?")
+    uv, extraction, state = t.replies
+    assert uv.size == 500 and extraction.size == 200 and state
+
+
+@pytest.mark.parametrize("timeout", [None, 0.0])
+def test_axi_capture_restores_acquisition(emulator, rp, timeout):
+    rp.acq_set(dec=64, trig_lvl=0.2, trig_delay=100, units="VOLTS", sample_format="ASCII")
+    trig = "NOW" if timeout is None else "CH1_PE"
+    traces = rp.axi_capture((1,), 1000, trig=trig, level=5.0, timeout=timeout)
+    assert (traces is None) == (timeout is not None)
+
+    assert rp.acq_data_array(1, lat=True, num_samples=100).size == 100  # Also waits for the restore
+    assert emulator.settings["ACQ:DATA:FORMAT"] == "ASCII"
+    assert emulator.settings["ACQ:AXI:SOUR1:ENABLE"] == "OFF"
+    assert int(emulator.settings["ACQ:DEC"]) == 64
+    assert int(emulator.settings["ACQ:TRIG:DLY"]) == 100
+    assert float(emulator.settings["ACQ:TRIG:LEV"]) == 0.2
+    assert emulator.trig_source == "DISABLED"
+
+
+def test_preset_output_stays_off_until_the_first_fire(emulator, rp):
+    rp.define_preset("pulse", chan=1, func="pwm", volt=0.5, freq=1, offset=0.5, dcyc=0.0005,
+                     burst=True, ncyc=1, nor=1)
+    rp.load_preset("pulse")
+    rp.txrx_txt("*IDN?")  # Waits until the commands are processed
+    assert emulator.settings.get("OUTPUT1:STATE") != "ON"
+    assert emulator.pulses[1] == 0
+
+    rp.fire_preset("pulse")
+    rp.fire_preset("pulse")  # Only the trigger
+    rp.txrx_txt("*IDN?")
+    assert emulator.settings["OUTPUT1:STATE"] == "ON"
+    assert emulator.pulses[1] == 2
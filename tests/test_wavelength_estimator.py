@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from wavelength_estimator import WavelengthEstimator
+
+
+def test_predicts_before_first_reading_as_nan():
+    estimator = WavelengthEstimator()
+    assert np.isnan(estimator.predict(0.0)[0])
+    assert not estimator.settled(1030, 1e-4, 0.0)
+
+
+def test_tracks_drift():
+    rng = np.random.default_rng(0)
+    estimator = WavelengthEstimator(measurement_noise=2e-5)
+    drift = 2e-4  # nm/s
+    for i in range(200):
+        t = i * 0.1
+        assert estimator.update(1030 + drift * t + 2e-5 * rng.standard_normal(), t)
+    wavelength, estimated_drift, std = estimator.predict(20.0)
+    assert estimated_drift == pytest.approx(drift, rel=0.2)
+    assert wavelength == pytest.approx(1030 + drift * 20.0, abs=3e-5)
+    assert std < 2e-5
+
+
+def test_commands_shift_the_prediction():
+    estimator = WavelengthEstimator()
+    estimator.update(1030.0, 0.0)
+    estimator.command_current(+1.0)
+    assert estimator.predict(0.0)[0] == pytest.approx(1030.003)
+    estimator.command_temperature(-0.5)
+    assert estimator.predict(0.0)[0] == pytest.approx(1030.003 - 0.5 / 9.33)
+
+
+def test_outlier_is_rejected_and_jump_is_accepted_after_three():
+    estimator = WavelengthEstimator()
+    for i in range(10):
+        estimator.update(1030.0, i * 0.1)
+    assert not estimator.update(1030.01, 1.0)
+    assert estimator.predict(1.0)[0] == pytest.approx(1030.0, abs=1e-6)
+    assert not estimator.update(1030.01, 1.1)
+    assert estimator.update(1030.01, 1.2)  # Third reading in a row: mode hop, restarted
+    assert estimator.predict(1.2)[0] == pytest.approx(1030.01)
+    assert estimator.rejected == 3
+
+
+def test_settled():
+    estimator = WavelengthEstimator()
+    for i in range(50):
+        estimator.update(1030.0, i * 0.1)
+    assert estimator.settled(1030.0, 1e-4, 5.0)
+    assert not estimator.settled(1030.001, 1e-4, 5.0)
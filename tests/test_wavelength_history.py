@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+from wavelength_history import WavelengthHistory
+
+
+def samples(n, seed=0, rate=100.0):
+    rng = np.random.default_rng(seed)
+    t = 1.7e9 + np.arange(n) / rate
+    wl = 1030 + 1e-4 * np.arange(n) / rate + 1e-5 * rng.standard_normal(n)
+    return t, wl
+
+
+def assert_window_statistics(history, t, wl):
+    assert history.count == wl.size
+    np.testing.assert_array_equal(history.window()[1], wl)
+    assert history.mean == pytest.approx(wl.mean(), abs=1e-9)
+    assert history.std == pytest.approx(wl.std(), rel=1e-6, abs=1e-12)
+    assert history.min == wl.min() and history.max == wl.max()
+    assert history.slope == pytest.approx(np.polyfit(t - t[0], wl, 1)[0], rel=1e-6)
+
+
+def test_sample_window_matches_numpy():
+    t, wl = samples(1000)
+    history = WavelengthHistory(capacity=256, samples=100)
+    for i in range(t.size):
+        history.append(wl[i], t[i])
+        if i in (0, 5, 99, 100, 255, 256, 511, 999):
+            start = max(i + 1 - 100, 0)
+            if i:
+                assert_window_statistics(history, t[start:i + 1], wl[start:i + 1])
+    assert history.full
+    assert history.latest == wl[-1]
+
+
+def test_ring_wraps_without_window():
+    t, wl = samples(1000, seed=1)
+    history = WavelengthHistory(capacity=300)
+    for ti, wli in zip(t, wl):
+        history.append(wli, ti)
+    assert_window_statistics(history, t[-300:], wl[-300:])
+    assert history.evicted == 700
+
+
+def test_seconds_window():
+    t, wl = samples(500, seed=2, rate=100.0)
+    history = WavelengthHistory(capacity=1000, seconds=0.5)
+    for ti, wli in zip(t, wl):
+        history.append(wli, ti)
+    assert_window_statistics(history, t[-51:], wl[-51:])
+    assert history.full
+
+
+def test_set_window_recomputes():
+    t, wl = samples(200, seed=3)
+    history = WavelengthHistory(capacity=256, samples=20)
+    for ti, wli in zip(t, wl):
+        history.append(wli, ti)
+    history.set_window(samples=150)
+    assert_window_statistics(history, t[-150:], wl[-150:])
+
+
+def test_empty_and_settled():
+    history = WavelengthHistory(samples=3)
+    assert np.isnan(history.mean) and np.isnan(history.latest) and np.isnan(history.slope)
+    assert not history.settled(1030, 1e-4, 1e-5)
+    for i in range(3):
+        history.append(1030 + 1e-6 * i, float(i))
+    assert history.settled(1030, 1e-4, 1e-5)
+    assert not history.settled(1031, 1e-4, 1e-5)
+
+
+def test_seconds_window_is_full_after_a_window_change_only_once_it_spans_it():
+    t, wl = samples(800)  # 8 s at 100 Hz
+    history = WavelengthHistory(capacity=4096, seconds=1.0)
+    for i in range(200):
+        history.append(wl[i], t[i])
+    assert history.full
+
+    history.set_window(seconds=5.0)  # 2 s in the buffer
+    assert not history.full
+    assert history.count == 200
+    for i in range(200, 600):
+        history.append(wl[i], t[i])
+        assert history.full == (t[i] - t[0] > 5.0)
+    start = 600 - history.count
+    assert t[599] - t[start] <= 5.0 < t[599] - t[start - 1]
+    assert_window_statistics(history, t[start:600], wl[start:600])
+
+    history.set_window(seconds=0.5)  # Shorter than the buffered span
+    assert history.full
@@ -0,0 +1,93 @@
+import time
+
+import pytest
+
+import WLM_functions
+import WLM_simulation
+
+
+@pytest.fixture
+def dll():
+    dll = WLM_simulation.SimulatedWlmData(update_rate=50, seed=0)
+    yield dll
+    dll.stop()
+
+
+def test_polled_reads_are_cached(dll):
+    wlm = WLM_functions.WavelengthMeter(dll=dll)
+    wavelengths, timestamps = wlm.read_wavelengths([1])
+    assert wlm.read_wavelengths([1], max_age=10)[1][0] == timestamps[0]
+    assert wavelengths[0] == pytest.approx(1030, abs=1e-3)
+
+
+def test_unchanged_value_keeps_measurement_time():
+    dll = WLM_simulation.SimulatedWlmData(update_rate=0.1, seed=0).start()  # One measurement in 10 s
+    wlm = WLM_functions.WavelengthMeter(dll=dll)
+    try:
+        time.sleep(0.05)  # The first measurement is taken at the start
+        _, first = wlm.read_wavelengths([1], max_age=0)
+        time.sleep(0.01)
+        _, second = wlm.read_wavelengths([1], max_age=0)
+    finally:
+        dll.stop()
+    assert second[0] == first[0]
+
+
+def test_callback_uses_driver_timestamps(dll):
+    wlm = WLM_functions.WavelengthMeter(dll=dll)
+    received = []
+    assert wlm.install_callback(lambda channel, wavelength: received.append(time.time()))
+    try:
+        time.sleep(0.2)
+        wavelengths, timestamps = wlm.read_wavelengths([1])
+    finally:
+        wlm.remove_callback()
+    assert len(received) >= 5
+    assert wlm._clock_offset is not None
+    # Measured with the driver clock, at most the delay of the callback before it arrived:
+    assert received[-1] - 0.05 <= timestamps[0] <= received[-1] + 1e-3
+    assert wavelengths[0] == dll.measured[1]
+
+
+def test_measurement_time_follows_the_smallest_clock_offset():
+    wlm = WLM_functions.WavelengthMeter(debug=True)
+    assert wlm._measurement_time(1000, 100.5) == pytest.approx(100.5)
+    assert wlm._measurement_time(1100, 100.7) == pytest.approx(100.6)  # Delayed callback
+    assert wlm._measurement_time(1200, 100.65) == pytest.approx(100.65)  # Smaller offset
+    assert wlm._measurement_time(10, 200.0) == pytest.approx(200.0)  # Wrap-around
+    assert wlm._measurement_time(0, 300.0) == 300.0
+
+
+def test_polling_broker_keeps_the_measurement_times():
+    dll = WLM_simulation.SimulatedWlmData(update_rate=1, seed=0).start()  # Slower than the broker
+    wlm = WLM_functions.WavelengthMeter(dll=dll)
+    broker = WLM_functions.WavelengthBroker(wlm, rate=20)
+    try:
+        time.sleep(0.05)
+        broker.start()
+        readings = []
+        for _ in range(10):
+            time.sleep(0.05)
+            readings.append(broker.read_wavelengths([1]))
+    finally:
+        broker.stop()
+        dll.stop()
+    assert broker.samples >= 5
+    wavelengths = {float(wl[0]) for wl, _ in readings}
+    timestamps = {float(t[0]) for _, t in readings}
+    assert len(timestamps) == len(wavelengths) <= 2
+    assert broker.latest.measured[1] < broker.latest.timestamp
+
+
+def test_callback_broker_uses_driver_timestamps(dll):
+    wlm = WLM_functions.WavelengthMeter(dll=dll)
+    broker = WLM_functions.WavelengthBroker(wlm, callback=True).start()
+    subscription = broker.subscribe(queued=True)
+    try:
+        readings = [subscription.get(timeout=1) for _ in range(5)]
+    finally:
+        broker.stop()
+    assert broker.mode == "callback"
+    measured = [reading.measured[1] for reading in readings]
+    assert all(a < b for a, b in zip(measured, measured[1:]))  # One reading per measurement
+    assert all(reading.measured[1] <= reading.timestamp for reading in readings)
@@ -0,0 +1,176 @@
+"""Compressed archive of raw UV diode traces.
+
+Traces are appended with their timestamp, wavelength and motor position. A
+background thread collects them into chunks of ``chunk_traces`` traces, each
+written as a compressed .npz file, and keeps an index (index.npy) with one
+record per trace:
+
+    archive = TraceArchive("D:/Strahlzeit/uv_traces", every=10)
+    archive.append(trace, wavelength=1030.12, position=-1520)
+    archive.close()
+
+    reader = TraceArchiveReader("D:/Strahlzeit/uv_traces")
+    trace = reader[1234]
+    reader.index["wavelength"]
+
+``append`` only puts the trace into a bounded queue, so the acquisition thread
+never waits for the disk; if the writer falls behind, traces are dropped and counted.
+"""
+
+import collections
+import os
+import queue
+import threading
+import time
+import numpy as np
+
+index_dtype = np.dtype([
+    ("timestamp", "f8"),   # time.time() of the acquisition
+    ("wavelength", "f8"),  # [nm]
+    ("position", "i8"),    # Motor position [steps]
+    ("chunk", "i4"),       # Number of the chunk file
+    ("offset", "i8"),      # First sample of the trace in the chunk
+    ("length", "i4"),      # Number of samples
+])
+
+
+def chunk_path(path, chunk):
+    return os.path.join(path, f"chunk_{chunk:06d}.npz")
+
+
+class TraceArchive:
+    """Appends traces to an archive folder in a background thread."""
+
+    def __init__(self, path, every=1, chunk_traces=256, queue_size=256, dtype=np.float32):
+        """An existing archive in the folder is continued.
+
+        Args:
+            path (str): Folder of the archive, created if needed.
+            every (int, optional): Only every Nth appended trace is stored. Defaults to 1.
+            chunk_traces (int, optional): Traces per chunk file. Defaults to 256.
+            queue_size (int, optional): Traces that can wait for the writer before new ones
+                are dropped. Defaults to 256.
+            dtype (dtype, optional): Sample type in the archive. Defaults to np.float32.
+        """
+        self.path = path
+        self.every = int(every)
+        self.chunk_traces = int(chunk_traces)
+        self.dtype = dtype
+        os.makedirs(path, exist_ok=True)
+
+        index_file = os.path.join(path, "index.npy")
+        self.index = np.load(index_file) if os.path.exists(index_file) else np.empty(0, dtype=index_dtype)
+        self.chunk = int(self.index["chunk"].max()) + 1 if self.index.size else 0
+
+        self.appended = 0  # Calls of append()
+        self.written = 0   # Traces written by this instance
+        self.dropped = 0   # Traces lost because the queue was full
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._run, name="TraceArchive", daemon=True)
+        self._thread.start()
+
+    def append(self, trace, wavelength=np.nan, position=0, timestamp=None):
+        """Queues a trace for the archive. Doesn't block.
+
+        Returns:
+            bool: False if the trace was skipped (``every``) or dropped (queue full)
+        """
+        self.appended += 1
+        if (self.appended - 1) % self.every:
+            return False
+        timestamp = time.time() if timestamp is None else timestamp
+        try:
+            self._queue.put_nowait((np.asarray(trace, dtype=self.dtype), timestamp, wavelength, position))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def close(self):
+        """Writes the queued traces and stops the writer thread."""
+        self._queue.put(None)
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _run(self):
+        traces, records = [], []
+        while True:
+            item = self._queue.get()
+            if item is not None:
+                trace, timestamp, wavelength, position = item
+                records.append((timestamp, wavelength, position, self.chunk, 0, trace.size))
+                traces.append(trace)
+            if len(traces) >= self.chunk_traces or (item is None and traces):
+                self._write_chunk(traces, records)
+                traces, records = [], []
+            if item is None:
+                return
+
+    def _write_chunk(self, traces, records):
+        records = np.array(records, dtype=index_dtype)
+        records["offset"] = np.cumsum(records["length"]) - records["length"]
+        # Write to temporary files first, so a crash never leaves a broken chunk or index:
+        tmp = os.path.join(self.path, "chunk.tmp.npz")
+        np.savez_compressed(tmp, samples=np.concatenate(traces))
+        os.replace(tmp, chunk_path(self.path, self.chunk))
+
+        self.index = np.concatenate((self.index, records))
+        tmp = os.path.join(self.path, "index.tmp.npy")
+        np.save(tmp, self.index)
+        os.replace(tmp, os.path.join(self.path, "index.npy"))
+        self.written += len(traces)
+        self.chunk += 1
+
+
+class TraceArchiveReader:
+    """Random access to the traces of an archive folder."""
+
+    def __init__(self, path, cache_chunks=4):
+        """
+        Args:
+            path (str): Folder of the archive.
+            cache_chunks (int, optional): Decompressed chunks kept in memory. Defaults to 4.
+        """
+        self.path = path
+        self.cache_chunks = cache_chunks
+        self._cache = collections.OrderedDict()
+        self.reload()
+
+    def reload(self):
+        """Reads the index again, e.g. to see the chunks written since."""
+        self.index = np.load(os.path.join(self.path, "index.npy"))
+
+    def __len__(self):
+        return self.index.size
+
+    def _chunk(self, chunk):
+        if chunk in self._cache:
+            self._cache.move_to_end(chunk)
+        else:
+            with np.load(chunk_path(self.path, chunk)) as data:
+                self._cache[chunk] = data["samples"]
+            if len(self._cache) > self.cache_chunks:
+                self._cache.popitem(last=False)
+        return self._cache[chunk]
+
+    def __getitem__(self, i):
+        """Returns trace number i (negative numbers count from the end)."""
+        record = self.index[i]
+        samples = self._chunk(int(record["chunk"]))
+        return samples[record["offset"]:record["offset"] + record["length"]]
+
+    def select(self, start_time=None, end_time=None):
+        """Numbers of the traces acquired between two time.time() timestamps."""
+        t = self.index["timestamp"]
+        keep = np.ones(t.size, dtype=bool)
+        if start_time is not None:
+            keep &= t >= start_time
+        if end_time is not None:
+            keep &= t < end_time
+        return np.flatnonzero(keep)
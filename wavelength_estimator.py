@@ -0,0 +1,132 @@
+"""Kalman filter of the laser wavelength for the control loops.
+
+The state is (wavelength [nm], drift [nm/s]). Between WLM readings the state is
+propagated with a constant drift whose changes are modelled as white noise;
+commands to the DFB (current, temperature) shift the wavelength by their
+expected tuning, with an uncertainty proportional to the step. Readings that
+don't fit the prediction at all (e.g. mode hops, WLM errors) are rejected:
+
+    estimator = WavelengthEstimator()
+    estimator.update(wl, timestamp)
+    estimator.command_current(+0.05)
+    wl, drift, std = estimator.predict(time.time())
+
+Timestamps are time.time() values, like the WLM readings of WLM_functions.
+"""
+
+import numpy as np
+
+
+class WavelengthEstimator:
+    """Kalman filter with a wavelength/drift state."""
+
+    def __init__(self, measurement_noise=2e-5, drift_noise=1e-5, current_tuning=0.003, temperature_tuning=1 / 9.33,
+                 command_uncertainty=0.5, gate=6.0):
+        """
+        Args:
+            measurement_noise (float, optional): Standard deviation [nm] of a WLM reading. Defaults to 2e-5.
+            drift_noise (float, optional): Change [nm/s/sqrt(s)] of the drift (random walk). Defaults to 1e-5.
+            current_tuning (float, optional): Wavelength change [nm/mA] per DFB current step. Defaults to 0.003.
+            temperature_tuning (float, optional): Wavelength change [nm/°C] per DFB temperature step.
+                Defaults to 1 / 9.33 (see DFB.control_wavelength).
+            command_uncertainty (float, optional): Relative uncertainty of the tuning of a command.
+                Defaults to 0.5.
+            gate (float, optional): Readings further than gate standard deviations from the prediction
+                are rejected. Defaults to 6.
+        """
+        self.measurement_noise = measurement_noise
+        self.drift_noise = drift_noise
+        self.current_tuning = current_tuning
+        self.temperature_tuning = temperature_tuning
+        self.command_uncertainty = command_uncertainty
+        self.gate = gate
+        self.reset()
+
+    def reset(self):
+        """Forgets the state; the next reading initializes it."""
+        self.x = np.zeros(2)   # Wavelength [nm], drift [nm/s]
+        self.P = np.zeros((2, 2))
+        self.timestamp = None  # Time of the state
+        self.updates = 0
+        self.rejected = 0      # Readings rejected by the gate
+        self._rejected_in_row = 0
+
+    @property
+    def initialized(self):
+        return self.timestamp is not None
+
+    def _propagate(self, timestamp):
+        """State and covariance at ``timestamp`` (not stored)."""
+        dt = max(timestamp - self.timestamp, 0.0)
+        F = np.array([[1.0, dt], [0.0, 1.0]])
+        q = self.drift_noise ** 2
+        Q = q * np.array([[dt ** 3 / 3, dt ** 2 / 2], [dt ** 2 / 2, dt]])
+        return F @ self.x, F @ self.P @ F.T + Q
+
+    def predict(self, timestamp):
+        """Estimated wavelength [nm], drift [nm/s] and standard deviation [nm] of the wavelength
+        at any time. Returns nans before the first reading."""
+        if not self.initialized:
+            return np.nan, np.nan, np.nan
+        x, P = self._propagate(timestamp)
+        return x[0], x[1], np.sqrt(P[0, 0])
+
+    def update(self, wavelength, timestamp):
+        """Adds a WLM reading.
+
+        Returns:
+            bool: False if the reading was rejected
+        """
+        R = self.measurement_noise ** 2
+        if not self.initialized:
+            self.x = np.array([wavelength, 0.0])
+            self.P = np.diag([R, (10 * self.measurement_noise) ** 2])
+            self.timestamp = timestamp
+            self.updates += 1
+            return True
+
+        x, P = self._propagate(timestamp)
+        innovation = wavelength - x[0]
+        S = P[0, 0] + R
+        if innovation ** 2 > self.gate ** 2 * S:
+            self.rejected += 1
+            self._rejected_in_row += 1
+            if self._rejected_in_row >= 3:
+                # The wavelength really jumped (e.g. mode hop): start again from the readings
+                rejected = self.rejected
+                self.reset()
+                self.rejected = rejected
+                return self.update(wavelength, timestamp)
+            return False
+
+        K = P[:, 0] / S
+        self.x = x + K * innovation
+        self.P = P - np.outer(K, P[0, :])
+        self.timestamp = timestamp
+        self.updates += 1
+        self._rejected_in_row = 0
+        return True
+
+    def _command(self, shift):
+        if not self.initialized:
+            return
+        self.x[0] += shift
+        self.P[0, 0] += (self.command_uncertainty * shift) ** 2
+
+    def command_current(self, delta):
+        """The DFB current was changed by ``delta`` [mA]."""
+        self._command(self.current_tuning * delta)
+
+    def command_temperature(self, delta):
+        """The DFB temperature was changed by ``delta`` [°C]."""
+        self._command(self.temperature_tuning * delta)
+
+    def settled(self, target, tolerance, timestamp, max_drift=None, confidence=2.0):
+        """True if the wavelength is within ``tolerance`` [nm] of ``target`` with the given
+        confidence (in standard deviations) and drifts by less than ``max_drift`` [nm/s]
+        (default: tolerance per second)."""
+        wavelength, drift, std = self.predict(timestamp)
+        if np.isnan(wavelength):
+            return False
+        max_drift = tolerance if max_drift is None else max_drift
+        return abs(target - wavelength) + confidence * std <= tolerance and abs(drift) <= max_drift
@@ -0,0 +1,200 @@
+"""Timestamped wavelength history with rolling statistics.
+
+A fixed-size NumPy ring buffer of (timestamp, wavelength). Mean, standard
+deviation, slope, minimum and maximum over a sliding window are updated with
+every sample in O(1) (Welford updates for adding and removing a sample,
+monotonic deques for min/max), so settle tests can use long windows at high
+rates:
+
+    history = WavelengthHistory(seconds=2.0)
+    history.append(wlm.GetWavelength(1))
+    if history.full and history.std < 5e-5: ...
+
+The window is given in samples, in seconds or both (the shorter one counts);
+it never exceeds the capacity of the buffer.
+"""
+
+import collections
+import time
+import numpy as np
+
+
+class WavelengthHistory:
+    """Ring buffer of (timestamp, wavelength) with rolling window statistics."""
+
+    def __init__(self, capacity=4096, samples=None, seconds=None):
+        """
+        Args:
+            capacity (int, optional): Samples kept in the buffer. Defaults to 4096.
+            samples (int, optional): Window length in samples. Defaults to None.
+            seconds (float, optional): Window length in seconds. Defaults to None.
+                Without samples and seconds the window is the whole buffer.
+        """
+        self.capacity = int(capacity)
+        self.timestamps = np.zeros(self.capacity)
+        self.wavelengths = np.zeros(self.capacity)
+        self.clear()
+        self.set_window(samples, seconds)
+
+    def clear(self):
+        """Removes all samples."""
+        self.total = 0    # Samples appended so far (absolute index of the next sample)
+        self.start = 0    # Absolute index of the oldest sample in the window
+        self.evicted = 0  # Samples that left the window
+        self._t0 = None   # Origins of time and wavelength in the statistics (precision)
+        self._wl0 = 0.0
+        self._n = 0
+        self._mean_t = self._mean_wl = 0.0
+        self._m2_t = self._m2_wl = self._c_twl = 0.0
+        self._min = collections.deque()  # Absolute indices with increasing wavelengths
+        self._max = collections.deque()  # Absolute indices with decreasing wavelengths
+
+    def set_window(self, samples=None, seconds=None):
+        """Changes the window length (in samples and/or seconds) and recomputes the statistics."""
+        self.window_samples = min(int(samples), self.capacity) if samples is not None else self.capacity
+        self.window_seconds = seconds
+        self.start = max(self.total - self.capacity, 0)  # Samples still in the buffer can rejoin the window
+        self.evicted = 0  # Counts for the new window only (see full)
+        self._resync(extrema=True)
+        self._evict()
+
+    def append(self, wavelength, timestamp=None):
+        """Adds a sample; timestamp defaults to time.time()."""
+        timestamp = time.time() if timestamp is None else timestamp
+        if self._t0 is None:
+            self._t0, self._wl0 = timestamp, wavelength
+        if self.total - self.start >= self.capacity:
+            self._pop_oldest()  # Its slot is overwritten now
+        i = self.total % self.capacity
+        self.timestamps[i] = timestamp
+        self.wavelengths[i] = wavelength
+        self._add(timestamp - self._t0, wavelength - self._wl0)
+
+        while self._min and self.wavelengths[self._min[-1] % self.capacity] >= wavelength:
+            self._min.pop()
+        self._min.append(self.total)
+        while self._max and self.wavelengths[self._max[-1] % self.capacity] <= wavelength:
+            self._max.pop()
+        self._max.append(self.total)
+        self.total += 1
+        self._evict()
+
+        # Rounding errors of the add/remove updates add up; start again from the exact values now and then:
+        if self.total % self.capacity == 0:
+            self._resync()
+
+    def _evict(self):
+        if self.total == 0:
+            return
+        newest = self.timestamps[(self.total - 1) % self.capacity]
+        while self._n > 0 and (self._n > self.window_samples or (
+                self.window_seconds is not None and newest - self.timestamps[self.start % self.capacity]
+                > self.window_seconds)):
+            self._pop_oldest()
+
+    def _pop_oldest(self):
+        i = self.start % self.capacity
+        self._remove(self.timestamps[i] - self._t0, self.wavelengths[i] - self._wl0)
+        self.start += 1
+        self.evicted += 1
+        while self._min and self._min[0] < self.start:
+            self._min.popleft()
+        while self._max and self._max[0] < self.start:
+            self._max.popleft()
+
+    def _add(self, t, wl):
+        self._n += 1
+        dt = t - self._mean_t
+        dwl = wl - self._mean_wl
+        self._mean_t += dt / self._n
+        self._mean_wl += dwl / self._n
+        self._m2_t += dt * (t - self._mean_t)
+        self._m2_wl += dwl * (wl - self._mean_wl)
+        self._c_twl += dt * (wl - self._mean_wl)
+
+    def _remove(self, t, wl):
+        if self._n == 1:
+            self._n = 0
+            self._mean_t = self._mean_wl = self._m2_t = self._m2_wl = self._c_twl = 0.0
+            return
+        self._n -= 1
+        dt = t - self._mean_t
+        dwl = wl - self._mean_wl
+        self._mean_t -= dt / self._n
+        self._mean_wl -= dwl / self._n
+        self._m2_t -= dt * (t - self._mean_t)
+        self._m2_wl -= dwl * (wl - self._mean_wl)
+        self._c_twl -= dt * (wl - self._mean_wl)
+
+    def _resync(self, extrema=False):
+        """Recomputes the statistics of the window from the buffer (and the min/max deques,
+        which have no rounding errors, if extrema is True)."""
+        if self.total == 0:
+            return
+        t, wl = self.window()
+        if extrema:
+            self._min.clear()
+            self._max.clear()
+            for index, value in zip(range(self.start, self.total), wl):
+                while self._min and self.wavelengths[self._min[-1] % self.capacity] >= value:
+                    self._min.pop()
+                self._min.append(index)
+                while self._max and self.wavelengths[self._max[-1] % self.capacity] <= value:
+                    self._max.pop()
+                self._max.append(index)
+        t = t - self._t0
+        wl = wl - self._wl0
+        self._n = t.size
+        self._mean_t, self._mean_wl = t.mean(), wl.mean()
+        self._m2_t = float(np.sum((t - self._mean_t) ** 2))
+        self._m2_wl = float(np.sum((wl - self._mean_wl) ** 2))
+        self._c_twl = float(np.sum((t - self._mean_t) * (wl - self._mean_wl)))
+
+    def window(self):
+        """Returns copies of the timestamps and wavelengths in the window (oldest first)."""
+        indices = np.arange(self.start, self.total) % self.capacity
+        return self.timestamps[indices], self.wavelengths[indices]
+
+    @property
+    def count(self):
+        """Samples in the window."""
+        return self._n
+
+    @property
+    def full(self):
+        """True once the window is filled (samples window) or spans its full length (seconds window)."""
+        if self.window_seconds is not None and self.evicted > 0:
+            return True
+        return self._n >= self.window_samples
+
+    @property
+    def latest(self):
+        """Newest wavelength (nan if empty)."""
+        return self.wavelengths[(self.total - 1) % self.capacity] if self.total else np.nan
+
+    @property
+    def mean(self):
+        return self._wl0 + self._mean_wl if self._n else np.nan
+
+    @property
+    def std(self):
+        """Standard deviation of the wavelengths in the window (like np.std)."""
+        return np.sqrt(max(self._m2_wl, 0.0) / self._n) if self._n else np.nan
+
+    @property
+    def slope(self):
+        """Slope [nm/s] of a linear fit over the window (nan with less than two different timestamps)."""
+        return self._c_twl / self._m2_t if self._n > 1 and self._m2_t > 0 else np.nan
+
+    @property
+    def min(self):
+        return self.wavelengths[self._min[0] % self.capacity] if self._min else np.nan
+
+    @property
+    def max(self):
+        return self.wavelengths[self._max[0] % self.capacity] if self._max else np.nan
+
+    def settled(self, target, max_error, max_std):
+        """True if the window is full, the newest wavelength is within max_error of target
+        and the standard deviation over the window is at most max_std."""
+        return self.full and abs(target - self.latest) <= max_error and self.std <= max_std